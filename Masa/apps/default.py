@@ -1,10 +1,14 @@
 from PySide2 import QtWidgets as qtw, QtCore as qtc, QtGui as qtg
 from Masa.gui.widgets.video_player import VideoPlayer
 from Masa.gui.widgets.session_visualizer import SessionVisualizer
+from Masa.gui.widgets.change_log import ChangeLog
 from Masa.models.datahandler import DataHandler
+from Masa.models.session import BBSession
 
 class ImageExtractorApp(qtw.QMainWindow):
-    def __init__(self, root_dataid, parent=None):
+    def __init__(self, root_dataid, parent=None, data_handler_cls=DataHandler):
+        """`data_handler_cls` is the `DataHandler` class the annotations are
+        loaded with, e.g. `WindowedDataHandler` for the large ones."""
         super().__init__()
 
         video_path = list((root_dataid / "data").glob("*.mp4"))
@@ -14,12 +18,18 @@ class ImageExtractorApp(qtw.QMainWindow):
             raise ValueError("Do not support multiple videos")
         video_path = str(video_path[0])
 
-        dh_path = (root_dataid / "annotations" / "annotations.csv")
-        data_handler = DataHandler(dh_path)
+        dh_path = (root_dataid / "annotations" / "annotations.masa")
+        if not dh_path.exists():
+            dh_path = dh_path.with_suffix(".csv")
+        data_handler = data_handler_cls(dh_path)
+        self.data_handler = data_handler
 
         self.video_player = VideoPlayer(video_path, data_handler, width=640)
         self.setCentralWidget(self.video_player)
 
+        self.bb_session = BBSession(data_handler)
+        self.video_player.buff.add_session(self.bb_session)
+
         self.session_vis = SessionVisualizer()
         dock = qtw.QDockWidget("Show")
         dock.setWidget(self.session_vis)
@@ -44,13 +54,16 @@ class ImageExtractorApp(qtw.QMainWindow):
 
         self.session_vis.init_data(data_handler)
 
-        self.debugger = qtw.QTextEdit(readOnly=True)
-        data_handler.print_data.connect(self._update_data)
+        self.change_log = ChangeLog()
+        data_handler.change_logged.connect(self.change_log.log_change_sl)
+        self.change_log.req_page.connect(data_handler.get_page_sl)
+        data_handler.pass_page.connect(self.change_log.set_page_sl)
 
         self.btn_save = qtw.QPushButton("Save",
                                         clicked=lambda: data_handler.save(True))
         # XXX: Not really a good way...
         self.video_player.view.layout.addWidget(self.btn_save, 2, 4, 1, 1)
+        data_handler.save_failed.connect(self.save_failed_sl)
 
         self.set_shortcuts()
 
@@ -84,10 +97,28 @@ class ImageExtractorApp(qtw.QMainWindow):
         back1f.setShortcut(qtg.QKeySequence("z"))
         back1f.triggered.connect(self.video_player.backward_one)
 
+        trajectories = qtw.QAction("Show Trajectories", self, checkable=True)
+        trajectories.setShortcut(qtg.QKeySequence("t"))
+        trajectories.triggered.connect(self.video_player.view.view.toggle_trajectories)
+
         save = qtw.QAction("Save", self)
         save.setShortcut(qtg.QKeySequence("C-s"))
         save.triggered.connect(self.btn_save.click)
 
+        undo = qtw.QAction("Undo", self)
+        undo.setShortcut(qtg.QKeySequence.Undo)
+        undo.triggered.connect(self.data_handler.undo)
+
+        redo = qtw.QAction("Redo", self)
+        redo.setShortcut(qtg.QKeySequence.Redo)
+        redo.triggered.connect(self.data_handler.redo)
+
+        interpolate = qtw.QAction("Interpolate tracks", self)
+        interpolate.triggered.connect(lambda: self.data_handler.interpolate())
+
+        propagate = qtw.QAction("Propagate box", self)
+        propagate.triggered.connect(self.propagate_selected)
+
 
         menubar = self.menuBar()
         vid_menu = menubar.addMenu("Video")
@@ -97,11 +128,44 @@ class ImageExtractorApp(qtw.QMainWindow):
         vid_menu.addAction(reset)
         vid_menu.addAction(forw1f)
         vid_menu.addAction(back1f)
+        vid_menu.addAction(trajectories)
+        edit_menu = menubar.addMenu("Edit")
+        edit_menu.addAction(undo)
+        edit_menu.addAction(redo)
+        edit_menu.addAction(interpolate)
+        edit_menu.addAction(propagate)
+
+    def save_failed_sl(self, packet):
+        qtw.QMessageBox.warning(
+            self, "Save failed",
+            f"{self.data_handler.input_file} could not be saved, the edits are "
+            f"still in the journal.\n\n{packet.data}"
+        )
 
-    def _update_data(self, packet):
-        self.debugger.setText(packet.data)
+    def propagate_selected(self):
+        """Propose the boxes of the selected box in the next frames."""
+        view = self.video_player.view.view
+        if view.selected is None or view.curr_frame is None:
+            return
+        track_id, instance_id = view.selected
+        self.bb_session.propagate(self.data_handler[track_id][instance_id],
+                                  view.curr_frame)
+
+        # Matched now rather than when played to.
+        buff = self.video_player.buff
+        step = -1 if self.bb_session.backward else 1
+        idxs = [view.frame_id + step * i
+                for i in range(1, self.bb_session.n_frames + 1)]
+        for idx, frame in buff.get_frames([i for i in idxs if 0 <= i < buff.n_frames]):
+            if frame is not None:
+                self.bb_session(frame, idx)
 
     def show(self):
         super().show()
-        self.debugger.show()
+        self.change_log.show()
+
+    def closeEvent(self, event):
+        # Write the journaled edits into the annotations file.
+        self.data_handler.close()
+        super().closeEvent(event)
 
@@ -1,2 +1,2 @@
-from .data import TrackedObject, Instance
+from .data import TrackedObject, Instance, TrackOrder
 from .data_wrapper import FrameData
@@ -1,11 +1,103 @@
-from collections import defaultdict
-from dataclasses import dataclass, field
-from typing import List, Union, Optional, Dict, Tuple
+from collections.abc import Mapping, MutableMapping
+from dataclasses import dataclass
+from typing import List, Union, Optional, Dict, Tuple, Iterable, Sequence
+
+
+class Tags(MutableMapping):
+    """Tags of an `Instance`, behaving as a `dict`.
+
+    Keys and values are kept as two tuples interned in a pool shared by every
+    `Tags`, so the millions of instances of a dataset only reference a handful
+    of tuples. Setting or deleting a tag interns new tuples, the shared ones
+    are never mutated.
+    """
+    __slots__ = ("_keys", "_values")
+    _pool: Dict[Tuple[tuple, tuple], tuple] = {}
+
+    def __init__(self, tags: Optional[Union[dict, Iterable[Tuple[str, str]]]] = None):
+        items = dict(tags or {})
+        self._set(tuple(items), tuple(items.values()))
+
+    @classmethod
+    def _intern(cls, items: tuple) -> tuple:
+        # Typed key, `(1,)` and `(True,)` must not share a tuple.
+        return cls._pool.setdefault((items, tuple(map(type, items))), items)
+
+    @classmethod
+    def many(cls, keys: Sequence[str], values: Iterable[tuple]) -> List["Tags"]:
+        """`Tags` of every tuple of `values`, all with the same `keys`.
+
+        Faster than building them one by one from a `dict`.
+        """
+        keys = cls._intern(tuple(keys))
+        interned = {}
+        ret = []
+        for vals in values:
+            tags = cls.__new__(cls)
+            tags._keys = keys
+            tags._values = interned.get(vals) or interned.setdefault(vals, cls._intern(vals))
+            ret.append(tags)
+
+        return ret
+
+    def _set(self, keys: tuple, values: tuple):
+        self._keys = self._intern(keys)
+        self._values = self._intern(values)
+
+    def __getitem__(self, key):
+        try:
+            return self._values[self._keys.index(key)]
+        except ValueError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        if key in self._keys:
+            idx = self._keys.index(key)
+            self._set(self._keys, self._values[:idx] + (value,) + self._values[idx + 1:])
+        else:
+            self._set(self._keys + (key,), self._values + (value,))
+
+    def __delitem__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+        idx = self._keys.index(key)
+        self._set(self._keys[:idx] + self._keys[idx + 1:],
+                  self._values[:idx] + self._values[idx + 1:])
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def __eq__(self, other):
+        # Same interned tuples for the same tags, in the same order.
+        if (isinstance(other, Tags) and self._keys is other._keys
+                and self._values is other._values):
+            return True
+        return super().__eq__(other)
+
+    def copy(self) -> "Tags":
+        # The tuples are never mutated, they can be shared.
+        tags = Tags.__new__(Tags)
+        tags._keys, tags._values = self._keys, self._values
+        return tags
 
 
 @dataclass(order=True)
 class Instance:
-    """Instance of tracked object."""
+    """Instance of tracked object.
+
+    `tags` is converted to `Tags`. Once added to a `TrackedObject`, the
+    `track_id` of the instance is the one of the `TrackedObject`, read
+    through a reference: renumbering a track does not touch its instances.
+    Setting `track_id` detaches it. Copies are always detached.
+    """
+    __slots__ = ("_track", "object_class", "instance_id", "x1", "y1", "x2",
+                 "y2", "frame_id", "tags")
     track_id: int
     object_class: str
     instance_id: int
@@ -14,9 +106,31 @@ class Instance:
     x2: Union[int, float]
     y2: Union[int, float]
     frame_id: int
-    tags: Dict[str, List[str]]
+    tags: Dict[str, Optional[str]]
     # parent: Optional[TrackedObject] = None
 
+    def __post_init__(self):
+        if not isinstance(self.tags, Tags):
+            self.tags = Tags(self.tags)
+
+    def __reduce__(self):
+        return (self.__class__, (self.track_id, self.object_class, self.instance_id,
+                                 self.x1, self.y1, self.x2, self.y2, self.frame_id,
+                                 self.tags))
+
+
+def _get_instance_track_id(instance: Instance) -> int:
+    track = instance._track
+    return track.track_id if isinstance(track, TrackedObject) else track
+
+
+def _set_instance_track_id(instance: Instance, track_id: int):
+    instance._track = track_id
+
+
+# Set after `dataclass` made `track_id` a field.
+Instance.track_id = property(_get_instance_track_id, _set_instance_track_id)
+
 
 def default_tags():
     return {"view": ["small", "middle", "large"]}
@@ -26,28 +140,84 @@ def fixed_fields():
     return tuple("track_id object_class".split())
 
 
-@dataclass
 class TrackedObject:
     """Represents a single tracked object.
 
     A single object might have multiple instances.
+
+    In a `TrackOrder` (as in `DataHandler`), `track_id` is the position of
+    the object, computed when read, and cannot be set. `uid` is then a stable
+    id, never reused by the `TrackOrder`.
     """
+    __slots__ = ("_track_id", "object_class", "instances", "_tag_keys", "uid",
+                 "_order")
+    _fixed: Tuple[str, ...] = fixed_fields()
+
     # TODO: Rename `track_id` to `object_id`
-    track_id: int
-    object_class: str
-    instance: Union[dict, Instance] = field(repr=False)
-    _fixed: List[str] = field(default_factory=fixed_fields)
-    instances: List[dict] = field(default_factory=list, init=False)
-    _tags: dict = field(init=False, default_factory=lambda: defaultdict(set))
+    def __init__(self, track_id: int, object_class: str,
+                 instance: Union[dict, Instance]):
+        self._order: Optional[TrackOrder] = None
+        self.uid: Optional[int] = None
+        self.track_id = track_id
+        self.object_class = object_class
+        self.instances: List[Instance] = []
+        # Every tag key seen, new instances get the missing ones as `None`.
+        self._tag_keys: Tuple[str, ...] = ()
+        self.add_instance(instance)
 
-    def __post_init__(self):
-        self.add_instance(self.instance)
+    @classmethod
+    def from_instances(cls, track_id: int, object_class: str,
+                       instances: List[Instance]) -> "TrackedObject":
+        """Build from `instances` already in order and with the same tag keys.
+
+        Skips the per instance bookkeeping of `add_instance`.
+        """
+        tobj = cls.__new__(cls)
+        tobj._order = tobj.uid = None
+        tobj._track_id = track_id
+        tobj.object_class = object_class
+        tobj.instances = list(instances)
+        for instance in tobj.instances:
+            instance._track = tobj
+        tobj._tag_keys = tuple(instances[0].tags)
+        return tobj
+
+    @property
+    def track_id(self) -> int:
+        if self._order is not None and self._track_id >= self._order.n_valid:
+            self._order.refresh()
+        return self._track_id
+
+    @track_id.setter
+    def track_id(self, track_id: int):
+        if self._order is not None:
+            raise AttributeError("`track_id` is the position in the `TrackOrder`.")
+        self._track_id = track_id
+
+    def __reduce__(self):
+        # Detached copy, instances included.
+        return (_restore_tracked_object,
+                (self.__class__, self.track_id, self.object_class, self.instances,
+                 self._tag_keys))
+
+    def __repr__(self):
+        return (f"{self.__class__.__name__}(track_id={self.track_id!r}, "
+                f"object_class={self.object_class!r}, instances={self.instances!r})")
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return ((self.track_id, self.object_class, self.instances)
+                == (other.track_id, other.object_class, other.instances))
+
+    __hash__ = None
 
     def add_instance(self, instance: Union[dict, Instance], update=True):
         if isinstance(instance, dict):
             instance = self._dict_to_instance(instance)
 
         self._update_tags(instance)
+        instance._track = self
 
         if instance.instance_id > len(self.instances) or instance.instance_id == -1:
             instance.instance_id = len(self.instances)
@@ -61,19 +231,19 @@ class TrackedObject:
 
     def _update_tags(self, instance: Instance):
         # Update `Instance` tags.
-        ins_tags = list(instance.tags.keys())
-        for tag in self._tags.keys():
-            if tag not in ins_tags:
+        for tag in self._tag_keys:
+            if tag not in instance.tags:
                 instance.tags[tag] = None
 
         # Update `TrackedObject` tags.
-        tobj_tags = list(self._tags.keys())
-        for tag, value in instance.tags.items():
-            self._tags[tag].add(value)
+        new_keys = tuple(tag for tag in instance.tags if tag not in self._tag_keys)
+        if new_keys:
+            self._tag_keys += new_keys
 
     @property
     def tags(self):
-        return {tag: list(vals) for tag, vals in self._tags.items()}
+        return {tag: list({ins.tags.get(tag) for ins in self.instances})
+                for tag in self._tag_keys}
 
     def _update(self):
         # self.instances.sort(key=lambda i: i.frame_id)
@@ -89,9 +259,8 @@ class TrackedObject:
         return instance
 
     def change_track_id(self, track_id):
+        # The instances read it from `self`.
         self.track_id = track_id
-        for instance in self.instances:
-            instance.track_id = self.track_id
         return self
 
     def delete(self, idx, update=True):
@@ -104,22 +273,77 @@ class TrackedObject:
         return self.instances[index]
 
     def __iter__(self):
-        self._iter = iter(self.instances)
-        self._iter_idx = None
-        return self
+        return iter(self.instances)
 
-    def __next__(self):
-        if self._iter_idx is None:
-            self._iter_idx = 0
-        else:
-            self._iter_idx += 1
+    def __len__(self):
+        return len(self.instances)
 
-        try:
-            val = self.__getitem__(self._iter_idx)
-        except IndexError:
-            raise StopIteration
 
-        return val
+def _restore_tracked_object(cls, track_id, object_class, instances, tag_keys):
+    tobj = cls.from_instances(track_id, object_class, instances)
+    tobj._tag_keys = tag_keys
+    return tobj
+
+
+class TrackOrder(Mapping):
+    """`TrackedObject` in order, as a read-only `track_id -> TrackedObject`.
+
+    The `track_id` of an object is its position, each object caches it and
+    the caches after an insertion or a deletion are only refreshed when one
+    of them is read. Inserting or deleting a track does not touch any other
+    object nor any instance. Every object added gets a new `uid`, unless
+    given the one it had (undoing its deletion).
+    """
+    def __init__(self, tobjs: Iterable[TrackedObject] = ()):
+        self.tracks: List[TrackedObject] = []
+        self.by_uid: Dict[int, TrackedObject] = {}
+        # The cached `track_id` of `tracks[:n_valid]` are up to date.
+        self.n_valid = 0
+        self._next_uid = 0
+        for tobj in tobjs:
+            self.insert(len(self.tracks), tobj)
+
+    def __getitem__(self, track_id) -> TrackedObject:
+        if not isinstance(track_id, int) or not 0 <= track_id < len(self.tracks):
+            raise KeyError(track_id)
+        return self.tracks[track_id]
+
+    def __iter__(self):
+        return iter(range(len(self.tracks)))
 
     def __len__(self):
-        return len(self.instances)
+        return len(self.tracks)
+
+    def refresh(self):
+        tracks = self.tracks
+        for i in range(self.n_valid, len(tracks)):
+            tracks[i]._track_id = i
+        self.n_valid = len(tracks)
+
+    def insert(self, track_id: int, tobj: TrackedObject, uid: Optional[int] = None):
+        if tobj._order is not None:
+            raise ValueError(f"{tobj} is already in a `TrackOrder`.")
+        if uid in self.by_uid:
+            raise ValueError(f"`uid`={uid} is already in the `TrackOrder`.")
+        self.tracks.insert(track_id, tobj)
+        tobj._order = self
+        tobj._track_id = track_id
+        if uid is None:
+            uid = self._next_uid
+        tobj.uid = uid
+        self._next_uid = max(self._next_uid, uid + 1)
+        self.by_uid[tobj.uid] = tobj
+        if self.n_valid == track_id == len(self.tracks) - 1:
+            self.n_valid += 1
+        else:
+            self.n_valid = min(self.n_valid, track_id)
+
+    def pop(self, track_id: int) -> TrackedObject:
+        """Remove the object at `track_id`, it keeps it as `track_id`."""
+        tobj = self[track_id]
+        del self.tracks[track_id]
+        del self.by_uid[tobj.uid]
+        tobj._order = None
+        tobj._track_id = track_id
+        self.n_valid = min(self.n_valid, track_id)
+        return tobj
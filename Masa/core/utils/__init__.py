@@ -1 +1,2 @@
 from .utils import *
+from .spatial_index import GridIndex
@@ -0,0 +1,179 @@
+"""A small uniform grid for box hit-testing.
+
+Crowded frames hold hundreds of boxes. Walking all of them on every mouse move
+is what made hovering sluggish, so boxes are bucketed into fixed size cells and
+only the boxes sharing a cell with the query are checked.
+"""
+
+from collections import defaultdict
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+
+Box = Tuple[float, float, float, float]
+
+
+def iou(a: Box, b: Box) -> float:
+    """Intersection over union of two `(x1, y1, x2, y2)` boxes."""
+    w = min(a[2], b[2]) - max(a[0], b[0])
+    h = min(a[3], b[3]) - max(a[1], b[1])
+    if w <= 0 or h <= 0:
+        return 0.0
+
+    inter = w * h
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union
+
+
+def auto_cell_size(boxes: np.ndarray) -> float:
+    """Twice the median side of `boxes`, a box then spans a few cells at most.
+
+    Boxes can be in pixels or normalised, so the size is not a constant.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    sides = np.abs(boxes[:, 2:] - boxes[:, :2])
+    size = 2 * float(np.median(sides)) if len(boxes) else 0.0
+    return size if size > 0 else 1.0
+
+
+class GridIndex:
+    """Uniform grid over `(x1, y1, x2, y2)` boxes.
+
+    Every box is registered in all of the cells it overlaps. Keys can be any
+    hashable (row index, `(track_id, instance_id)`, ...).
+
+    Parameters
+    ----------
+    cell_size
+        Width and height of a single cell, in the same unit as the boxes.
+    """
+    def __init__(self, cell_size: float = 32.0):
+        if cell_size <= 0:
+            raise ValueError(f"`cell_size` must be positive, got {cell_size}")
+
+        self.cell_size = cell_size
+        self._boxes: Dict[Hashable, Box] = {}
+        self._cells: Dict[Tuple[int, int], Set[Hashable]] = defaultdict(set)
+
+    @classmethod
+    def from_boxes(cls, boxes: np.ndarray, keys: Optional[Iterable] = None,
+                   cell_size: float = 32.0):
+        """Build an index from an `(n, 4)` array of boxes.
+
+        If `keys` is not passed, the row index of each box is used.
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        if keys is None:
+            keys = range(len(boxes))
+
+        index = cls(cell_size)
+        for key, box in zip(keys, boxes.tolist()):
+            index.insert(key, *box)
+
+        return index
+
+    def _cell_range(self, x1, y1, x2, y2):
+        if x1 > x2:
+            x1, x2 = x2, x1
+        if y1 > y2:
+            y1, y2 = y2, y1
+        s = self.cell_size
+        return (int(x1 // s), int(y1 // s), int(x2 // s), int(y2 // s))
+
+    def _cells_of(self, x1, y1, x2, y2):
+        cx1, cy1, cx2, cy2 = self._cell_range(x1, y1, x2, y2)
+        for cx in range(cx1, cx2 + 1):
+            for cy in range(cy1, cy2 + 1):
+                yield cx, cy
+
+    def insert(self, key: Hashable, x1, y1, x2, y2):
+        """Add a box. An already registered `key` is moved."""
+        if key in self._boxes:
+            self.remove(key)
+
+        self._boxes[key] = (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+        for cell in self._cells_of(x1, y1, x2, y2):
+            self._cells[cell].add(key)
+
+    def remove(self, key: Hashable):
+        try:
+            box = self._boxes.pop(key)
+        except KeyError:
+            raise ValueError(f"Key {key} is not indexed")
+
+        for cell in self._cells_of(*box):
+            keys = self._cells[cell]
+            keys.discard(key)
+            if not keys:
+                del self._cells[cell]
+
+    def box(self, key: Hashable) -> Box:
+        return self._boxes[key]
+
+    def query_point(self, x, y) -> List[Hashable]:
+        """Return keys of every box containing the point `(x, y)`."""
+        cell = (int(x // self.cell_size), int(y // self.cell_size))
+        ret = []
+        for key in self._cells.get(cell, ()):
+            x1, y1, x2, y2 = self._boxes[key]
+            if x1 <= x <= x2 and y1 <= y <= y2:
+                ret.append(key)
+
+        return ret
+
+    def query_rect(self, x1, y1, x2, y2) -> List[Hashable]:
+        """Return keys of every box intersecting the rectangle."""
+        x1, x2 = min(x1, x2), max(x1, x2)
+        y1, y2 = min(y1, y2), max(y1, y2)
+
+        cx1, cy1, cx2, cy2 = self._cell_range(x1, y1, x2, y2)
+        if (cx2 - cx1 + 1) * (cy2 - cy1 + 1) > len(self._cells):
+            # Large rectangle, fewer occupied cells than cells it covers.
+            cells = [cell for cell in self._cells
+                     if cx1 <= cell[0] <= cx2 and cy1 <= cell[1] <= cy2]
+        else:
+            cells = self._cells_of(x1, y1, x2, y2)
+        candidates = set()
+        for cell in cells:
+            candidates |= self._cells.get(cell, set())
+
+        ret = []
+        for key in candidates:
+            bx1, by1, bx2, by2 = self._boxes[key]
+            if bx1 <= x2 and x1 <= bx2 and by1 <= y2 and y1 <= by2:
+                ret.append(key)
+
+        return ret
+
+    def query_iou(self, x1, y1, x2, y2, min_iou: float
+                  ) -> List[Tuple[Hashable, float]]:
+        """Return `(key, iou)` of every box with an IoU of at least `min_iou`
+        with the rectangle."""
+        box = (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+        ret = []
+        for key in self.query_rect(*box):
+            overlap = iou(box, self._boxes[key])
+            if overlap >= min_iou:
+                ret.append((key, overlap))
+
+        return ret
+
+    def overlaps(self, min_iou: float) -> List[Tuple[Hashable, Hashable, float]]:
+        """Return `(key, other_key, iou)` of every pair of boxes with an IoU of
+        at least `min_iou`, e.g. duplicated boxes. Each pair is returned once,
+        `key` being the one inserted first."""
+        order = {key: i for i, key in enumerate(self._boxes)}
+        ret = []
+        for key, box in self._boxes.items():
+            for other, overlap in self.query_iou(*box, min_iou):
+                if order[other] > order[key]:
+                    ret.append((key, other, overlap))
+
+        return ret
+
+    def __contains__(self, key):
+        return key in self._boxes
+
+    def __len__(self):
+        return len(self._boxes)
@@ -8,8 +8,9 @@ import cv2
 
 
 SignalPacket = namedtuple("SignalPacket", "sender data")
-DataUpdateInfo = namedtuple("DataUpdateInfo", "added deleted replaced moved")
-DataUpdateInfo.__new__.__defaults__ = (None, None, None, None)
+# `batch` is a list of `DataUpdateInfo`, applied in order.
+DataUpdateInfo = namedtuple("DataUpdateInfo", "added deleted replaced moved batch")
+DataUpdateInfo.__new__.__defaults__ = (None, None, None, None, None)
 FrameData = namedtuple("FrameData", "frame index data")
 DataInfo = namedtuple("DataInfo", "tobj instance obj_classes tags")
 DataInfo.__new__.__defaults__ = (None, None, None, None)
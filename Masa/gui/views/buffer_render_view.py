@@ -7,6 +7,8 @@ import numpy as np
 
 from Masa.core.utils import convert_np, SignalPacket
 from Masa.gui.widgets.graphics_rect_item import GraphicsRectItem
+from Masa.gui.widgets.boxes_overlay_item import BoxesOverlayItem
+from Masa.gui.widgets.trajectories_item import TrajectoriesItem
 from Masa.gui.dialog.instance_editor_dialog import InstanceEditorDialog
 from Masa.core.data import Instance
 from Masa.core.utils import BoundingBoxConverter as bbc
@@ -35,11 +37,20 @@ class BufferRenderView(qtw.QGraphicsView):
         self.bb_top_left = None
         self.bb_bottom_right = None
         self.curr_frame = None
+        self.frame_id = None
         self.draw_box = False
         self.repair_box = False
         self.current_selection = None
+        # `(track_id, instance_id)` of the box promoted to `GraphicsRectItem`.
+        self.selected = None
+        self.curr_data = []
         self.brush_current = qtg.QBrush(qtg.QColor(10, 10, 100, 120))
 
+        # Trajectory overlay ##################################################
+        self.trajectories = None
+        self.show_trajectories = False
+        self.trajectory_window = (30, 30)  # frames (before, after)
+
         self.class_name = []
         self.video_player = video_player
         # self.menu = TextInputMenu(self.class_name, parent=self)
@@ -69,17 +80,54 @@ class BufferRenderView(qtw.QGraphicsView):
         curr_frame = convert_np(self.curr_frame, to="qpixmapitem")
         self.scene().addItem(curr_frame)
 
+    def set_trajectories(self, trajectories):
+        """Set the `Trajectories` drawn when `show_trajectories` is on."""
+        self.trajectories = trajectories
+
+    def toggle_trajectories(self):
+        self.show_trajectories = not self.show_trajectories
+        if self.curr_frame is not None:
+            self.update_frame()
+
+    def _draw_trajectories(self):
+        before, after = self.trajectory_window
+        paths = self.trajectories.window(self.frame_id, before, after)
+        self.scene().addItem(
+            TrajectoriesItem(paths, self.frame_id, self.width, self.height)
+        )
+
     def set_data(self):
+        if self.show_trajectories and self.trajectories is not None:
+            self._draw_trajectories()
+
+        overlay = BoxesOverlayItem(self.width, self.height)
+        overlay.box_selected.connect(self._select_box_sl, qtc.Qt.QueuedConnection)
+
+        batched = []
         for d in self.curr_data:
-            self._draw_data(d)
+            if (d.track_id, d.instance_id) == self.selected:
+                edited = d
+            else:
+                batched.append(d)
+        overlay.set_instances(batched)
+        self.scene().addItem(overlay)
+
+        if len(batched) != len(self.curr_data):
+            self._draw_data(edited).setSelected(True)
+
+    def _select_box_sl(self, packet: SignalPacket):
+        if packet.data == self.selected:
+            return
+
+        self.selected = packet.data
+        self.update_frame()
 
     def _draw_data(self, data: Instance):
-        width = data.x2 - data.x1
-        height = data.y2 - data.y1
-        self.scene().addItem(GraphicsRectItem(data.x1, data.y1, data.x2, data.y2,
-                                              self.width, self.height,
-                                              data.track_id, data.instance_id,
-        ))
+        item = GraphicsRectItem(data.x1, data.y1, data.x2, data.y2,
+                                self.width, self.height,
+                                data.track_id, data.instance_id)
+        self.scene().addItem(item)
+        return item
 
     def update_frame(self):
         """Update frames during Box Selection."""
@@ -194,6 +242,9 @@ class BufferRenderView(qtw.QGraphicsView):
         framedata = packet.data
         self.scene().clear()
 
+        if framedata.index != self.frame_id:
+            # A selection only makes sense within its own frame.
+            self.selected = None
         self.set_frame(framedata.frame, framedata.index)
 
         self.curr_data = []
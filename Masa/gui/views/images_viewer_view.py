@@ -1,72 +1,128 @@
 from collections import defaultdict
-from copy import deepcopy
 from typing import Dict, List, Tuple, Union, Optional
 import numpy as np
-import uuid
-import cv2
 
 from PySide2 import (QtWidgets as qtw, QtCore as qtc, QtGui as qtg)
 from Masa.core.data import Instance, TrackedObject
-from Masa.core.utils import convert_np, resize, SignalPacket, DataUpdateInfo
-from ..widgets.image_button import ImageButton
+from Masa.core.utils import SignalPacket, DataUpdateInfo
+from .thumbnails_model import Thumbnail, ThumbnailsModel
+from .thumbnail_cache import ThumbnailCache
+from ..widgets.thumbnail_delegate import ThumbnailDelegate
 
 
 # TODO: Can this be considered as `View`?
-# TODO: Do not store data here!
 class ImagesViewerView(qtw.QWidget):
     """A simple view container for images.
 
     TrackID - Images.
+
+    The grid is a `QTableView` over a `ThumbnailsModel`, painted by a
+    `ThumbnailDelegate`. No widget is created per instance and only the
+    thumbnails of visible cells are requested through `req_frames`.
+
+    Thumbnails are indexed by `frame_id` so a delivered frame only touches the
+    thumbnails cropped from it. `frames_changed` reports the frame ids that
+    enter or leave the index as `(added, removed)`.
+
+    Pixmaps are kept in `cache`, which can be shared between viewers.
     """
     req_frames = qtc.Signal(SignalPacket)
+    frames_changed = qtc.Signal(SignalPacket)
     jump_to_frame = qtc.Signal(SignalPacket)
     update_data = qtc.Signal(SignalPacket)
     req_instance = qtc.Signal(SignalPacket)
 
-    def __init__(self, name, parent=None):
+    def __init__(self, name, parent=None, cache: Optional[ThumbnailCache] = None):
         super().__init__(parent)
 
         self.name = name
+        self.cache = cache if cache is not None else ThumbnailCache()
+        # Frames asked by the delegate, waiting to be requested.
+        self._pending_frames = set()
+        # Frames already requested, waiting to be delivered.
+        self._requested_frames = set()
+        # frame_id -> thumbnails cropped from that frame.
+        self._frame_index: Dict[int, List[Thumbnail]] = {}
+
         self._set_widgets()
         self._optimize_widgets()
         self._set_layouts()
         self._init()
 
-        self._grid_map: Dict[dict] = {}
-
     def _set_widgets(self):
         self.name_label = qtw.QLabel(f"Class: {self.name}")
-        self.scroll = qtw.QScrollArea()
-        self.grid_widget = qtw.QWidget()
+        self.model = ThumbnailsModel(self.cache, self)
+        self.delegate = ThumbnailDelegate(self.cache.edge, self)
+        self.table = qtw.QTableView()
+        self.req_timer = qtc.QTimer(self)
 
     def _optimize_widgets(self):
-        self.scroll.setHorizontalScrollBarPolicy(qtc.Qt.ScrollBarAsNeeded)
-        self.scroll.setVerticalScrollBarPolicy(qtc.Qt.ScrollBarAsNeeded)
+        self.table.setModel(self.model)
+        self.table.setItemDelegate(self.delegate)
+        self.table.setShowGrid(False)
+        self.table.setSelectionMode(qtw.QAbstractItemView.SingleSelection)
+        self.table.setHorizontalScrollMode(qtw.QAbstractItemView.ScrollPerPixel)
+        self.table.setVerticalScrollMode(qtw.QAbstractItemView.ScrollPerPixel)
+        self.table.setContextMenuPolicy(qtc.Qt.CustomContextMenu)
+        self.table.horizontalHeader().hide()
+
+        # Every cell has the same size, no need to ask the delegate.
+        size = self.delegate.sizeHint(self.table.viewOptions(), qtc.QModelIndex())
+        for header, length in [(self.table.horizontalHeader(), size.width()),
+                               (self.table.verticalHeader(), size.height())]:
+            header.setSectionResizeMode(qtw.QHeaderView.Fixed)
+            header.setDefaultSectionSize(length)
+        # At least two thumbnails next to the "label / Track ID" header.
+        self.table.setMinimumWidth(2 * size.width() + 100)
+
+        # Coalesce the requests of a whole paint pass into one.
+        self.req_timer.setSingleShot(True)
+        self.req_timer.setInterval(30)
 
     def _set_layouts(self):
         self.layout_main = qtw.QVBoxLayout()
-        self.layout_grid = qtw.QBoxLayout(qtw.QBoxLayout.TopToBottom)
-        # self.layout_col = qtw.QVBoxLayout()
 
     def _init(self):
-        # put layout in each widget
-        self.grid_widget.setLayout(self.layout_grid)
-        self.scroll.setWidget(self.grid_widget)
-
-        # 'connect' each widget
-        self.scroll.setWidgetResizable(True)
         self.layout_main.addWidget(self.name_label)
-        self.layout_main.addWidget(self.scroll)
+        self.layout_main.addWidget(self.table)
         self.setLayout(self.layout_main)
 
+        self.table.clicked.connect(self._jump_to_frame_sl)
+        self.table.customContextMenuRequested.connect(self._request_instance_sl)
+        self.delegate.thumbnail_needed.connect(self._thumbnail_needed_sl)
+        self.req_timer.timeout.connect(self._request_pending_frames)
+
     @property
     def frame_ids(self):
-        frame_ids = set()
-        for row in self._grid_map.values():
-            for img_btn in row["image_buttons"]:
-                frame_ids.add(img_btn.frame_id)
+        return list(self._frame_index)
+
+    def _index(self, thumbs: List[Thumbnail]):
+        added = []
+        for thumb in thumbs:
+            indexed = self._frame_index.get(thumb.frame_id)
+            if indexed is None:
+                indexed = self._frame_index[thumb.frame_id] = []
+                added.append(thumb.frame_id)
+            indexed.append(thumb)
+
+        if added:
+            self.frames_changed.emit(
+                SignalPacket(sender=[self.__class__.__name__], data=(added, []))
+            )
 
-        return list(frame_ids)
+    def _unindex(self, thumbs: List[Thumbnail]):
+        removed = []
+        for thumb in thumbs:
+            indexed = self._frame_index[thumb.frame_id]
+            indexed.remove(thumb)
+            if not indexed:
+                del self._frame_index[thumb.frame_id]
+                removed.append(thumb.frame_id)
+
+        if removed:
+            self.frames_changed.emit(
+                SignalPacket(sender=[self.__class__.__name__], data=([], removed))
+            )
 
     def set_frames_sl(self, packet: SignalPacket):
         self.set_frames(packet.data)
@@ -75,58 +131,96 @@ class ImagesViewerView(qtw.QWidget):
         for tobj in tobjs:
             self._add(tobj)
 
+    def add_track(self, track_id: int, instances: List[Instance]):
+        """Add a row of `instances`, as `_add` does for a `TrackedObject`."""
+        label = self.model.insert_label(track_id)
+        thumbs = [Thumbnail.from_instance(ins) for ins in instances]
+        self._add_tobj(label, track_id, thumbs)
+
     def request_frames(self):
         self.req_frames.emit(
             SignalPacket(sender=[self.__class__.__name__], data=self.frame_ids)
         )
 
+    def _thumbnail_needed_sl(self, frame_id):
+        if frame_id in self._requested_frames:
+            return
+
+        self._pending_frames.add(frame_id)
+        if not self.req_timer.isActive():
+            self.req_timer.start()
+
+    def _request_pending_frames(self):
+        frame_ids = sorted(self._pending_frames)
+        self._pending_frames.clear()
+        self._requested_frames.update(frame_ids)
+        self.req_frames.emit(
+            SignalPacket(sender=[self.__class__.__name__], data=frame_ids)
+        )
+
     @property
     def tags(self):
         tags = defaultdict(set)
-        for row_info in self._grid_map.values():
-            for img_btn in row_info["image_buttons"]:
-                for tag_key, tag_value in img_btn.meta.items():
+        for row in self.model.rows:
+            for thumb in row["thumbnails"]:
+                for tag_key, tag_value in thumb.meta.items():
                     tags[tag_key].add(tag_value)
 
         return {k: list(v) for k, v in tags.items()}
 
     def __len__(self):
-        return len(self._grid_map.keys())
+        return self.model.rowCount()
+
+    def _request_instance_sl(self, pos: qtc.QPoint):
+        index = self.table.indexAt(pos)
+        if index.data(ThumbnailsModel.ThumbnailRole) is None:
+            return
 
-    def _request_instance_sl(self, packet: SignalPacket):
         self.req_instance.emit(
-            SignalPacket(sender=[*packet.sender, self.__class__.__name__],
-                         data=packet.data)
+            SignalPacket(sender=[self.__class__.__name__],
+                         data=(self.model.track_id(index.row()), index.column()))
         )
 
+    def _crop(self, frame: np.ndarray, thumb: Thumbnail) -> np.ndarray:
+        height, width = frame.shape[:2]
+        x1, y1, x2, y2 = thumb.x1, thumb.y1, thumb.x2, thumb.y2
+        if isinstance(x1, float):
+            if x1 < 1:
+                x1 = int(x1 * width)
+                y1 = int(y1 * height)
+                x2 = int(x2 * width)
+                y2 = int(y2 * height)
+            else:
+                x1 = int(x1)
+                y1 = int(y1)
+                x2 = int(x2)
+                y2 = int(y2)
+
+        return frame[y1:y2 + 1, x1:x2 + 1]
+
+    def frame_cached(self, frame_id) -> bool:
+        """Whether every thumbnail of `frame_id` is in the cache."""
+        return all(thumb.key in self.cache
+                   for thumb in self._frame_index.get(frame_id, ()))
+
     def set_frames(self, frames: List[Tuple[int, np.ndarray]]):
+        changed = False
         for idx, frame in frames:
-            height, width = frame.shape[:2]
-            for label, row_info in self._grid_map.items():
-                for img_btn in row_info["image_buttons"]:
-                    if img_btn.frame_id == idx:
-                        x1 = img_btn.x1
-                        y1 = img_btn.y1
-                        x2 = img_btn.x2
-                        y2 = img_btn.y2
-                        if isinstance(x1, float):
-                            if x1 < 1:
-                                x1 = int(x1 * width)
-                                y1 = int(y1 * height)
-                                x2 = int(x2 * width)
-                                y2 = int(y2 * height)
-                            else:
-                                x1 = int(x1)
-                                y1 = int(y1)
-                                x2 = int(x2)
-                                y2 = int(y2)
-                        crop = frame[y1:y2 + 1, x1: x2 + 1]
-                        img_btn.set_np(crop)
+            self._requested_frames.discard(idx)
+            for thumb in self._frame_index.get(idx, ()):
+                # An empty crop is kept by the cache as a placeholder, already
+                # painted.
+                if thumb.key not in self.cache \
+                        and self.cache.put(thumb.key, self._crop(frame, thumb)) is not None:
+                    changed = True
+
+        if changed:
+            self.model.thumbnails_changed()
 
     def __getitem__(self, idx):
         try:
-            return self._grid_map[idx]
-        except KeyError:
+            return self.model.row(idx)
+        except IndexError:
             raise IndexError(f"Label of {idx} is not created yet.")
 
     def req_delete(self, label: int, col: int = None):
@@ -135,311 +229,145 @@ class ImagesViewerView(qtw.QWidget):
             SignalPacket(sender=[self.__class__.__name__], data=dui)
         )
 
-    def replace(self, new_instance):
-        row_info = self._grid_map[new_instance.track_id]
-        # Copied from delete method. There will be no update internally.
-        # TODO: Is this good thing???
-        row_info["widget"].layout().itemAt(col + 1).widget().deleteLater()
-        row_info["image_buttons"][col].deleteLater()
-        del row_info["image_buttons"][col]
-
-
-        if image is None:
-            image = self._grid_map[label]["image_buttons"][instance.instance_id]
-        self._delete_col(label, instance.instance_id)
-        self.add(label=label, instance=instance, image=image)
-
     def delete(self, label, col=None):
         if col is None:
             ret = self._delete_row(label)
         else:
             ret = self._delete_col(label, col)
-            
-        return ret
 
-    def _delete_row(self, label: int, update=True):
-        while self._grid_map[label]["image_buttons"]:
-            # Delete images
-            self._delete_col(label, update=False)
+        return ret
 
-        # delete label
-        # self._grid_map[label]["widget"].layout().takeAt(1)
-        self._grid_map[label]["widget"].layout().takeAt(0).widget().deleteLater()
-        # self._grid_map[label]["widget"].layout().itemAt(1).widget().deleteLater()
-        self.layout_grid.takeAt(label).widget().deleteLater()
-        if update:
-            self._update(label - 1, "delete")
+    def _delete_row(self, label: int):
+        self._unindex(self.model.row(label)["thumbnails"])
+        self.model.remove_row(label)
+        # Rows after the deleted one now sit at `label`.
+        self._update(label - 1, "delete")
 
         # Quick hack
         return "deleted_row"
 
-    def _delete_col(self, label: int, col=None, update=True):
-        row_info = self._grid_map[label]
+    def _delete_col(self, label: int, col=None):
         if col is None:
-            col = len(row_info["image_buttons"]) - 1
-        # TODO: Is this good thing???
-        row_info["widget"].layout().itemAt(col + 1).widget().deleteLater()
-        row_info["image_buttons"][col].deleteLater()
-        del row_info["image_buttons"][col]
+            col = len(self.model.row(label)["thumbnails"]) - 1
+        thumb = self.model.remove_thumbnail(label, col)
+        self._unindex([thumb])
 
         ret = "deleted_col"
-        if update:
-            if row_info["image_buttons"]:
-                self._update(label)
-            else:
-                ret = self._delete_row(label, update=True)
+        if not self.model.row(label)["thumbnails"]:
+            ret = self._delete_row(label)
         return ret
 
-    def labels_mapping(self, track_id=None):
-        retval = [(label, row_info["image_buttons"][0].track_id)
-                    for label, row_info in self._grid_map.items()]
+    def thumbnail(self, track_id, instance_id) -> Optional[Thumbnail]:
+        label = self.labels_mapping(track_id)
+        if label is None:
+            return None
+        return self.model.thumbnail(label, instance_id)
 
+    def labels_mapping(self, track_id=None):
         if track_id is not None:
-            try:
-                idx = [r[1] for r in retval].index(track_id)
-                retval = retval[idx][0]
-            except ValueError:
-                retval = None
+            return self.model.label(track_id)
 
-        return retval
+        return list(enumerate(self.model.track_ids.tolist()))
 
     def add(self, obj: Union[Instance, TrackedObject],
             image: Optional[np.ndarray] = None):
+        # Thumbnails are requested once their cells get painted.
         self._add(obj, image)
 
-        if isinstance(obj, TrackedObject):
-            frame_ids = [ins.frame_id for ins in obj]
-        elif isinstance(obj, Instance):
-            frame_ids = [obj.frame_id]
-
-        self.req_frames.emit(
-            SignalPacket(sender=[self.__class__.__name__], data=frame_ids)
-        )
-
-        
     def _add(self, obj: Union[Instance, TrackedObject],
             image: Optional[np.ndarray] = None):
-        label = self.labels_mapping(obj.track_id)
-
         if isinstance(obj, TrackedObject):  # and len(obj) == 1:
-            if label is None:
-                label = len(self)
+            # Keep the rows sorted by `track_id`.
+            label = self.model.insert_label(obj.track_id)
             instances = obj[:]
         elif isinstance(obj, Instance):
+            label = self.labels_mapping(obj.track_id)
             if label is None:
                 raise ValueError(f"{obj.track_id} is not yet created!")
             instances = [obj]
         else:
                 raise ValueError(f"Do not support of data {type(obj)}.")
 
-        image_btns = []
-        frame_ids = []
-        for ins in instances:
-            image_btn = ImageButton(image=image,
-                                    frame_id=ins.frame_id,
-                                    track_id=ins.track_id,
-                                    instance_id=ins.instance_id,
-                                    x1=ins.x1, 
-                                    y1=ins.y1, 
-                                    x2=ins.x2, 
-                                    y2=ins.y2, 
-                                    meta=ins.tags
-                                    # label=label,
-            )
-            frame_ids.append(ins.frame_id)
-            image_btn.right_clicked.connect(
-                self._request_instance_sl
-            )
-            image_btn.left_clicked.connect(
-                self._jump_to_frame_sl
-            )
-            image_btns.append(image_btn)
+        thumbs = [Thumbnail.from_instance(ins) for ins in instances]
+        if image is not None:
+            for thumb in thumbs:
+                self.cache.put(thumb.key, image)
 
         if isinstance(obj, TrackedObject):
-            self._add_tobj(label, image_btns)
+            self._add_tobj(label, obj.track_id, thumbs)
         else:
-            self._add_instance(label, image_btns)
+            self._add_instance(label, obj.instance_id, thumbs)
+
+    def _jump_to_frame_sl(self, index: qtc.QModelIndex):
+        thumb = index.data(ThumbnailsModel.ThumbnailRole)
+        if thumb is None:
+            return
 
-    def _jump_to_frame_sl(self, packet: SignalPacket):
         self.jump_to_frame.emit(
-            SignalPacket(sender=[*packet.sender, self.__class__.__name__], data=packet.data)
+            SignalPacket(sender=[self.__class__.__name__], data=thumb.frame_id)
         )
 
-    def _make_new_row(self, row_label, row_meta=None):
-        if row_label in self._grid_map.keys():
-            self._update(row_label - 1, "insert")
-
-        row_widget = qtw.QWidget()
-        # TODO: Use QListWidget???
-        # https://www.qtcentre.org/threads/33443-how-to-insert-one-widget-between-another-two-widgets-ina-a-list-of-widgets)
-        row_widget.setLayout(qtw.QBoxLayout(qtw.QBoxLayout.LeftToRight))
-
-        info_widget = qtw.QWidget()
-        info_widget.setLayout(qtw.QBoxLayout(qtw.QBoxLayout.TopToBottom))
-        info_widget.layout().addWidget(qtw.QLabel(str(row_label)))
-
-        row_widget.layout().addWidget(info_widget)
-        # row_widget.layout().addStretch()
-        self.layout_grid.insertWidget(row_label, row_widget)
-
-        self._grid_map[row_label] = {"widget": row_widget,
-                                     "row_meta": row_meta,
-                                     "col_meta": [],
-                                     "image_buttons": []}
-
-        for i in range(self.layout_grid.count()):
-            r = self.layout_grid.itemAt(i)
-
-
-    def _add_tobj(self, label: int, images):
-        # if not label in self._grid_map.keys():
-        #     raise ValueError(f"No {label} created yet!")
-
-        if label == len(self):
-            self._append_tobj(label, images)
-        elif label < len(self):
-            self._insert_tobj(label, images)
-            # self._update(label)
-        else:
+    def _add_tobj(self, label: int, track_id: int, thumbs: List[Thumbnail]):
+        if label > len(self):
             raise ValueError(f"Got label of {label}")
 
-        (self._grid_map[label]["widget"].layout().itemAt(0).widget().layout()
-         .addWidget(qtw.QLabel(f"<b>Track ID<\b>: {str(images[0].track_id)}")))
-
+        if label < len(self):
+            # The row holding this `track_id` and every row after are moved.
+            self._update(label - 1, "insert")
+        self.model.insert_row(label, track_id, thumbs)
+        self._index(thumbs)
 
-    def _append_tobj(self, label, images):
-        self._make_new_row(label)
-        row = self._grid_map[label]
-        for image in images:
-            row["widget"].layout().addWidget(image)
-            row["image_buttons"].append(image)
-
-    def _insert_tobj(self, label, images):
-        self._make_new_row(label)
-        row = self._grid_map[label]
-        for image in images:
-            row["widget"].layout().addWidget(image)
-            row["image_buttons"].append(image)
-
-
-    def _add_instance(self, label: int, images):
-        if not label in self._grid_map.keys():
+    def _add_instance(self, label: int, instance_id: int, thumbs: List[Thumbnail]):
+        if label >= len(self):
             raise ValueError(f"No {label} created yet!")
-        if len(images) != 1:
-            raise ValueError(f"Still do not support adding instances of len={len(images)}")
-
-        image = images[0]
-        if image.instance_id == len(self._grid_map[label]["image_buttons"]):
-            self._append_instance(label, image)
-        elif image.instance_id < len(self._grid_map[label]["image_buttons"]):
-            self._insert_instance(label, image.instance_id, image)
-            self._update(label)
-        else:
-            raise ValueError(f"Cannot add image of instance_id={image.instance_id}")
-
+        if len(thumbs) != 1:
+            raise ValueError(f"Still do not support adding instances of len={len(thumbs)}")
 
-    def _append_instance(self, label, image):
-        row = self._grid_map[label]
-        row["widget"].layout().addWidget(image)
-        row["image_buttons"].append(image)
-
-    def _insert_instance(self, label, col, image):
-        row = self._grid_map[label]
-        row["widget"].layout().insertWidget(col + 1, image)
-        row["image_buttons"].insert(col, image)
+        if instance_id > len(self.model.row(label)["thumbnails"]):
+            raise ValueError(f"Cannot add image of instance_id={instance_id}")
+        self.model.insert_thumbnail(label, instance_id, thumbs[0])
+        self._index(thumbs)
 
     def _update(self,
                 label_keep: int,
                 mode: Optional[Union[str, int]] = None):
-        """Handle updating internal `_grid_map`."""
-
-        if mode in ["insert", "delete", 1, -1]:
-            if mode == "delete":
-                if label_keep == len(self._grid_map) - 2:
-                    # We only deleted the end of `self._grid_map`.
-                    # Assuming _delete already handle everything.
-                    del self._grid_map[label_keep + 1]
-                    return
-
-            new_grid_map = {k:self._grid_map[k]
-                            for k in self._grid_map
-                            if k <= label_keep}
-
-            if mode == "insert":
-                new_grid_map[label_keep + 1] = {}
-                new_key_start = label_keep + 2
-                old_key_start = label_keep + 1
-                update_track_id = 1
-            elif mode =="delete":
-                new_key_start = label_keep + 1
-                old_key_start = label_keep + 2
-                update_track_id = -1
-            else:
-                new_key_start = label_keep + 1
-                old_key_start = label_keep + 1
-                update_track_id = mode
-
-            # CONT: Upadate the self.layout_grid object
-            for new_key, old_key in enumerate(
-                    range(old_key_start, len(self._grid_map)), new_key_start):
-                row_info = self._grid_map[old_key]
-
-                info_widget = row_info["widget"].layout().itemAt(0).widget() # .deleteLater()
-                _old_tid = row_info['image_buttons'][0].track_id
+        """Shift the `track_id` of every row after `label_keep`.
 
+        `"insert"` and `1` shift it by one, `"delete"` and `-1` by minus one.
+        """
+        delta = {"insert": 1, "delete": -1, 1: 1, -1: -1}.get(mode)
+        if delta is not None:
+            self.model.shift_track_ids(label_keep + 1, delta)
 
-                # row_info["widget"].layout().insertWidget(0, qtw.QLabel(str(new_key)))
-                new_grid_map[new_key] = row_info
-                self._update_col(row_info, update_track_id=update_track_id)
+    def shift_track_ids(self, track_id: int, delta: int):
+        """Shift the rows from `track_id` after a track got inserted/deleted.
 
-                new_label = qtw.QLabel(str(new_key))
-                new_tid = qtw.QLabel(
-                    f'<b>Track ID<\b>: {str(row_info["image_buttons"][0].track_id)}'
-                )
-
-                info_widget.layout().itemAt(0).widget().deleteLater()
-                info_widget.layout().itemAt(1).widget().deleteLater()
-                info_widget.layout().addWidget(new_label)
-                info_widget.layout().addWidget(new_tid)
-                _new_tid = row_info['image_buttons'][0].track_id
-                # print(f"Updated: label:{old_key} t_id:{_old_tid} -> label:{new_key} t_id{_new_tid}")
-
-            self._grid_map = new_grid_map
-            # print("NEW")
-            # print(list(self._grid_map.keys()))
-
-        else:
-            row_info = self._grid_map[label_keep]
-            self._update_col(row_info)
-
-    def _update_col(self, row_info, update_track_id: Optional[int] = None):
-        for idx, img_btn in enumerate(row_info["image_buttons"]):
-            img_btn.set_instance_id(idx)
-            if isinstance(update_track_id, int):
-                img_btn.track_id += update_track_id
-
-        # widgets = row_info["widget"]
-        # while widgets.count() > 2:
-        #     widgets.layout().itemAt(widgets.count() - 1)
+        Used by the viewers of the other classes, whose rows are not touched
+        but whose `track_id` follow `DataHandler`.
+        """
+        self.model.shift_track_ids(self.model.insert_label(track_id), delta)
 
 
 if __name__ == "__main__":
+    import sys
+
     app = qtw.QApplication(sys.argv)
     imgs_viewer = ImagesViewerView("dummy")
 
     dummy = np.full((320, 320, 3), 144, np.uint8)
-    instances = []
+    tobjs = []
     for track_id in range(10):
-        r = 3
-        if track_id == 2:
-            r = 4
-        for i, frame_id in enumerate(range(r)):
-            instances.append(Instance(
-                track_id, "none", i, 0, 0, 320, 320, frame_id,
-                {"view": "big", "time": "morning"}
-            ))
-    imgs_viewer.init_data(instances)
-    imgs_viewer.refresh_images([(i, dummy) for i in range(3)])
+        tobj = None
+        for frame_id in range(4 if track_id == 2 else 3):
+            instance = {"x1": 0, "y1": 0, "x2": 320, "y2": 320,
+                        "frame_id": frame_id, "tags": {"view": "big"}}
+            if tobj is None:
+                tobj = TrackedObject(track_id, "none", instance)
+            else:
+                tobj.add_instance(instance)
+        tobjs.append(tobj)
+    imgs_viewer.init_data(tobjs)
+    imgs_viewer.set_frames([(i, dummy) for i in range(4)])
     imgs_viewer.delete(0, 2)
     imgs_viewer.delete(2, 2)
     imgs_viewer.show()
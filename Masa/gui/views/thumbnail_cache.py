@@ -0,0 +1,106 @@
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+import numpy as np
+import cv2
+from PySide2 import QtGui as qtg
+
+from Masa.core.utils import convert_np
+
+
+class ThumbnailCache:
+    """Byte-bounded LRU of thumbnail pixmaps, shared by the `ImagesViewerView`s.
+
+    Entries are keyed by `(frame_id, x1, y1, x2, y2)` (see `Thumbnail.key`) and
+    crops are stored resized so that their longest side is `edge`. Once the
+    pixmaps exceed `max_bytes` the least recently used ones are dropped; a
+    viewer asks for their frame again when they become visible. The keys of
+    empty crops (a box outside of its frame) are kept apart, read as
+    `placeholder`, so that their frame is not asked again.
+
+    Parameters
+    ----------
+    edge : int
+        Longest side, in pixels, of the stored thumbnails.
+    max_bytes : int
+        Upper bound of the memory used by the stored pixmaps.
+    """
+    def __init__(self, edge: int = 128, max_bytes: int = 64 * 2 ** 20):
+        self.edge = edge
+        self.max_bytes = max_bytes
+        self._pixmaps: OrderedDict = OrderedDict()
+        self._nbytes = 0
+        # Keys of the crops that cannot make a thumbnail.
+        self._empty = set()
+        self._placeholder: Optional[qtg.QPixmap] = None
+
+    @staticmethod
+    def _pixmap_nbytes(pixmap: qtg.QPixmap) -> int:
+        return pixmap.width() * pixmap.height() * pixmap.depth() // 8
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+    def __len__(self):
+        return len(self._pixmaps)
+
+    def __contains__(self, key: Hashable):
+        return key in self._pixmaps or key in self._empty
+
+    @property
+    def placeholder(self) -> qtg.QPixmap:
+        """Pixmap of the empty crops, a gray pixel."""
+        if self._placeholder is None:
+            self._placeholder = qtg.QPixmap(1, 1)
+            self._placeholder.fill(qtg.QColor(60, 60, 60))
+        return self._placeholder
+
+    def get(self, key: Hashable) -> Optional[qtg.QPixmap]:
+        pixmap = self._pixmaps.get(key)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(key)
+        elif key in self._empty:
+            pixmap = self.placeholder
+
+        return pixmap
+
+    def to_pixmap(self, crop: np.ndarray) -> Optional[qtg.QPixmap]:
+        if crop.size == 0:
+            return None
+
+        height, width = crop.shape[:2]
+        scale = self.edge / max(height, width)
+        size = (max(int(width * scale), 1), max(int(height * scale), 1))
+        crop = cv2.resize(crop, size, interpolation=cv2.INTER_AREA)
+        return convert_np(crop, to="qpixmap")
+
+    def put(self, key: Hashable, crop: np.ndarray) -> Optional[qtg.QPixmap]:
+        """Resize `crop` to a thumbnail and store it under `key`.
+
+        Returns `None` if `crop` is empty, `key` is then read as `placeholder`.
+        """
+        pixmap = self.to_pixmap(crop)
+        self.discard(key)
+        if pixmap is None:
+            self._empty.add(key)
+            return None
+
+        self._pixmaps[key] = pixmap
+        self._nbytes += self._pixmap_nbytes(pixmap)
+        while self._nbytes > self.max_bytes and len(self._pixmaps) > 1:
+            _, old = self._pixmaps.popitem(last=False)
+            self._nbytes -= self._pixmap_nbytes(old)
+
+        return pixmap
+
+    def discard(self, key: Hashable):
+        self._empty.discard(key)
+        pixmap = self._pixmaps.pop(key, None)
+        if pixmap is not None:
+            self._nbytes -= self._pixmap_nbytes(pixmap)
+
+    def clear(self):
+        self._pixmaps.clear()
+        self._empty.clear()
+        self._nbytes = 0
@@ -0,0 +1,212 @@
+from collections import Counter
+from typing import Dict, List, Optional
+
+import numpy as np
+from PySide2 import QtCore as qtc
+
+from .thumbnail_cache import ThumbnailCache
+
+
+class Thumbnail:
+    """Light-weight record of a single cell of `ThumbnailsModel`.
+
+    It replaces the per instance `ImageButton` widget: only the data needed to
+    crop the thumbnail is kept, its pixmap lives in a `ThumbnailCache`. The
+    `track_id` and `instance_id` are not stored, they are given by the cell
+    position in `ThumbnailsModel`.
+    """
+    __slots__ = ("frame_id", "x1", "y1", "x2", "y2", "meta")
+
+    def __init__(self, frame_id, x1, y1, x2, y2, meta=None):
+        self.frame_id = frame_id
+        self.x1 = x1
+        self.y1 = y1
+        self.x2 = x2
+        self.y2 = y2
+        self.meta = meta if meta is not None else {}
+
+    @property
+    def key(self):
+        """`ThumbnailCache` key, only changes with the frame or the box."""
+        return (self.frame_id, self.x1, self.y1, self.x2, self.y2)
+
+    @classmethod
+    def from_instance(cls, instance):
+        return cls(instance.frame_id,
+                   instance.x1, instance.y1, instance.x2, instance.y2,
+                   instance.tags)
+
+
+class ThumbnailsModel(qtc.QAbstractTableModel):
+    """Table model of `Thumbnail` for an `ImagesViewerView`.
+
+    A row is a track (the row number is its label) and a column is an instance
+    of that track, so the column is the `instance_id`. Rows have different
+    lengths, cells beyond the end of a row are empty. Pixmaps are looked up in
+    `cache`.
+
+    The `track_id` of the rows are kept apart in a sorted array: finding the
+    label of a track is a binary search and relabelling after a track is
+    inserted or deleted is a single vectorised shift. Row headers are built
+    from it when Qt paints them.
+    """
+    ThumbnailRole = qtc.Qt.UserRole + 1
+
+    def __init__(self, cache: Optional[ThumbnailCache] = None, parent=None):
+        super().__init__(parent)
+        self.cache = cache if cache is not None else ThumbnailCache()
+        self._rows: List[Dict] = []
+        self._track_ids = np.empty(0, dtype=np.int64)
+        self._row_lengths = Counter()
+        self._n_cols = 0
+
+    # Qt model interface ######################################################
+    def rowCount(self, parent=qtc.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._rows)
+
+    def columnCount(self, parent=qtc.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self._n_cols
+
+    def data(self, index, role=qtc.Qt.DisplayRole):
+        thumb = self.thumbnail(index.row(), index.column())
+        if thumb is None:
+            return None
+
+        if role == self.ThumbnailRole:
+            return thumb
+        elif role == qtc.Qt.DisplayRole:
+            return f"Instance ID: {index.column()}"
+        elif role == qtc.Qt.DecorationRole:
+            return self.cache.get(thumb.key)
+        elif role == qtc.Qt.ToolTipRole:
+            tags = ", ".join(f"{k}: {v}" for k, v in thumb.meta.items())
+            return f"Frame {thumb.frame_id}\n{tags}"
+
+        return None
+
+    def headerData(self, section, orientation, role=qtc.Qt.DisplayRole):
+        if role != qtc.Qt.DisplayRole:
+            return None
+
+        if orientation == qtc.Qt.Vertical:
+            return f"{section}\nTrack ID: {self._track_ids[section]}"
+        return str(section)
+
+    def flags(self, index):
+        if self.thumbnail(index.row(), index.column()) is None:
+            return qtc.Qt.NoItemFlags
+        return qtc.Qt.ItemIsEnabled | qtc.Qt.ItemIsSelectable
+
+    # Access ##################################################################
+    def thumbnail(self, label, col) -> Optional[Thumbnail]:
+        try:
+            thumbs = self._rows[label]["thumbnails"]
+        except IndexError:
+            return None
+        if 0 <= col < len(thumbs):
+            return thumbs[col]
+        return None
+
+    def row(self, label) -> Dict:
+        return self._rows[label]
+
+    def track_id(self, label) -> int:
+        return int(self._track_ids[label])
+
+    @property
+    def track_ids(self) -> np.ndarray:
+        return self._track_ids
+
+    def insert_label(self, track_id) -> int:
+        """Label at which a row of `track_id` keeps the rows sorted."""
+        return int(np.searchsorted(self._track_ids, track_id, side="left"))
+
+    def label(self, track_id) -> Optional[int]:
+        label = self.insert_label(track_id)
+        if label < len(self._track_ids) and self._track_ids[label] == track_id:
+            return label
+        return None
+
+    @property
+    def rows(self) -> List[Dict]:
+        return self._rows
+
+    def thumbnail_changed(self, label, col):
+        index = self.index(label, col)
+        self.dataChanged.emit(index, index, [qtc.Qt.DecorationRole])
+
+    def thumbnails_changed(self):
+        """Notify that the pixmaps of any cell may have changed.
+
+        A single range lets the view repaint what is visible instead of handling
+        one signal per cell.
+        """
+        if self._rows and self._n_cols:
+            self.dataChanged.emit(self.index(0, 0),
+                                  self.index(len(self._rows) - 1, self._n_cols - 1),
+                                  [qtc.Qt.DecorationRole])
+
+    # Edit ####################################################################
+    def _length_changed(self, old, new):
+        if old is not None:
+            self._row_lengths[old] -= 1
+            if self._row_lengths[old] == 0:
+                del self._row_lengths[old]
+        if new is not None:
+            self._row_lengths[new] += 1
+
+        n_cols = max(self._row_lengths, default=0)
+        if n_cols > self._n_cols:
+            self.beginInsertColumns(qtc.QModelIndex(), self._n_cols, n_cols - 1)
+            self._n_cols = n_cols
+            self.endInsertColumns()
+        elif n_cols < self._n_cols:
+            self.beginRemoveColumns(qtc.QModelIndex(), n_cols, self._n_cols - 1)
+            self._n_cols = n_cols
+            self.endRemoveColumns()
+
+    def insert_row(self, label, track_id, thumbnails: List[Thumbnail], row_meta=None):
+        self.beginInsertRows(qtc.QModelIndex(), label, label)
+        self._rows.insert(label, {"row_meta": row_meta,
+                                  "thumbnails": list(thumbnails)})
+        self._track_ids = np.insert(self._track_ids, label, track_id)
+        self.endInsertRows()
+        self._length_changed(None, len(thumbnails))
+
+    def remove_row(self, label):
+        self.beginRemoveRows(qtc.QModelIndex(), label, label)
+        row = self._rows.pop(label)
+        self._track_ids = np.delete(self._track_ids, label)
+        self.endRemoveRows()
+        self._length_changed(len(row["thumbnails"]), None)
+
+    def insert_thumbnail(self, label, col, thumbnail: Thumbnail):
+        thumbs = self._rows[label]["thumbnails"]
+        thumbs.insert(col, thumbnail)
+        self._length_changed(len(thumbs) - 1, len(thumbs))
+        self._columns_changed(label, col)
+
+    def remove_thumbnail(self, label, col) -> Thumbnail:
+        thumbs = self._rows[label]["thumbnails"]
+        thumb = thumbs.pop(col)
+        self._length_changed(len(thumbs) + 1, len(thumbs))
+        self._columns_changed(label, col)
+        return thumb
+
+    def _columns_changed(self, label, col_start):
+        # Following thumbnails moved by one column, i.e. one `instance_id`.
+        thumbs = self._rows[label]["thumbnails"]
+        if col_start < len(thumbs):
+            self.dataChanged.emit(self.index(label, col_start),
+                                  self.index(label, len(thumbs) - 1))
+
+    def shift_track_ids(self, label_start, delta):
+        """Add `delta` to the `track_id` of every row from `label_start`."""
+        self._track_ids[label_start:] += delta
+
+        if label_start < len(self._rows):
+            self.headerDataChanged.emit(qtc.Qt.Vertical, label_start, len(self._rows) - 1)
@@ -2,6 +2,7 @@ from PySide2 import (QtWidgets as qtw, QtCore as qtc, QtGui as qtg)
 import numpy as np
 
 from .buffer_render_view import BufferRenderView
+from ..widgets.annotation_timeline import AnnotationTimeline
 from Masa.core.utils import SignalPacket
 
 
@@ -59,6 +60,7 @@ class VideoPlayerView(qtw.QWidget):
         self._set_frames_info("-")
         self.backward_btn = qtw.QPushButton()
         self.slider = qtw.QSlider(qtc.Qt.Horizontal)
+        self.timeline = AnnotationTimeline()
         self.start_pause_btn = qtw.QToolButton()
 
     def _request_datahandler_info_sl(self, packet):
@@ -90,6 +92,7 @@ class VideoPlayerView(qtw.QWidget):
 
         self.slider.sliderMoved.connect(self._set_frames_info)
         self.slider.valueChanged.connect(self._set_frames_info)
+        self.slider.valueChanged.connect(self.timeline.set_frame_id)
 
     def _set_frames_info(self, idx):
         self.frames_id_label.setText(
@@ -125,6 +128,7 @@ class VideoPlayerView(qtw.QWidget):
         self.layout.addWidget(self.backward_btn, 1, 2, 1, 1)
         self.layout.addWidget(self.slider, 2, 0, 1, 3)
         self.layout.addWidget(self.start_pause_btn, 2, 3, 1, 1)
+        self.layout.addWidget(self.timeline, 3, 0, 1, 3)
         self.setLayout(self.layout)
 
     def _on_rect_change(self, track_id, instance_id, x1, y1, x2, y2):
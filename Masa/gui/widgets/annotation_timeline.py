@@ -0,0 +1,136 @@
+from typing import Dict, Optional, Tuple
+
+from PySide2 import (QtWidgets as qtw, QtCore as qtc, QtGui as qtg)
+import numpy as np
+
+from Masa.core.utils import SignalPacket
+from Masa.models.annotation_density import AnnotationDensity
+
+
+class AnnotationTimeline(qtw.QWidget):
+    """Strip showing how many instances every frame has, meant to sit under
+    the slider.
+
+    Each column of the strip covers a range of frames and stacks the counts of
+    every object class (or of every value of the tag chosen through the
+    context menu). The strip is rendered once into a pixmap per widget size
+    and only re-rendered after `AnnotationDensity` changed. Clicking emits
+    `jump_to_frame` with the frame under the cursor.
+    """
+    jump_to_frame = qtc.Signal(SignalPacket)
+
+    background = qtg.QColor(40, 40, 40)
+    marker_pen = qtg.QPen(qtg.QColor(255, 60, 60), 1)
+
+    def __init__(self, density: Optional[AnnotationDensity] = None, parent=None,
+                 height: int = 24):
+        super().__init__(parent)
+        self.density = density
+        self.group_by: Optional[str] = None
+        self.frame_id = None
+        # (width, height) -> strip, for the current `_version`.
+        self._pixmaps: Dict[Tuple[int, int], qtg.QPixmap] = {}
+        self._version = None
+
+        self.setFixedHeight(height)
+        self.setCursor(qtc.Qt.PointingHandCursor)
+
+    def set_density(self, density: AnnotationDensity):
+        self.density = density
+        self._invalidate()
+
+    def set_group_by(self, group_by: Optional[str]):
+        self.group_by = group_by
+        self._invalidate()
+
+    def set_frame_id(self, frame_id):
+        self.frame_id = frame_id
+        self.update()
+
+    def data_update_sl(self, packet: SignalPacket):
+        if self.density is not None:
+            self.density.data_update(packet.data)
+            self.update()
+
+    def _invalidate(self):
+        self._pixmaps.clear()
+        self._version = None
+        self.update()
+
+    @staticmethod
+    def _colors(n) -> np.ndarray:
+        colors = [qtg.QColor.fromHsvF(i / max(n, 1), 0.8, 0.95).getRgb()
+                  for i in range(n)]
+        return np.array(colors, dtype=np.uint8).reshape(-1, 4)
+
+    @staticmethod
+    def _bin(counts: np.ndarray, width: int) -> np.ndarray:
+        """Maximum count of each group over the frames of every column."""
+        n_frames = counts.shape[1]
+        if n_frames >= width:
+            starts = np.linspace(0, n_frames, width, endpoint=False).astype(np.int64)
+            return np.maximum.reduceat(counts, starts, axis=1)
+        return counts[:, np.arange(width) * n_frames // width]
+
+    def _render(self, width, height) -> qtg.QPixmap:
+        _, counts = self.density.histogram(self.group_by)
+        binned = self._bin(counts, width)
+        n_groups = binned.shape[0]
+
+        # Top of every stacked group, in pixels from the bottom.
+        tops = np.cumsum(binned, axis=0) * (height / max(binned.sum(axis=0).max(), 1))
+        y = (np.arange(height)[::-1] + 0.5)[None, :, None]
+        # Index of the group painted on every pixel, `n_groups` for none.
+        group = (tops[:, None, :] < y).sum(axis=0)
+
+        colors = np.vstack([self._colors(n_groups), self.background.getRgb()])
+        rgba = np.ascontiguousarray(colors[group], dtype=np.uint8)
+        image = qtg.QImage(rgba.data, width, height, 4 * width,
+                           qtg.QImage.Format_RGBA8888).copy()
+        return qtg.QPixmap.fromImage(image)
+
+    def paintEvent(self, event):
+        painter = qtg.QPainter(self)
+        if self.density is None or self.width() == 0:
+            painter.fillRect(self.rect(), self.background)
+            return
+
+        if self._version != self.density.version:
+            self._pixmaps.clear()
+            self._version = self.density.version
+
+        key = (self.width(), self.height())
+        pixmap = self._pixmaps.get(key)
+        if pixmap is None:
+            pixmap = self._pixmaps[key] = self._render(*key)
+        painter.drawPixmap(0, 0, pixmap)
+
+        if self.frame_id is not None:
+            x = int((self.frame_id + 0.5) * self.width() / self.density.n_frames)
+            painter.setPen(self.marker_pen)
+            painter.drawLine(x, 0, x, self.height())
+
+    def frame_at(self, x) -> int:
+        frame_id = int(x * self.density.n_frames / max(self.width(), 1))
+        return min(max(frame_id, 0), self.density.n_frames - 1)
+
+    def mousePressEvent(self, event):
+        if self.density is None or event.button() != qtc.Qt.LeftButton:
+            return super().mousePressEvent(event)
+
+        self.jump_to_frame.emit(
+            SignalPacket(sender=[self.__class__.__name__],
+                         data=self.frame_at(event.pos().x()))
+        )
+
+    def contextMenuEvent(self, event):
+        if self.density is None:
+            return
+
+        menu = qtw.QMenu(self)
+        for key in self.density.group_keys:
+            action = menu.addAction("Object class" if key is None else f"Tag: {key}")
+            action.setCheckable(True)
+            action.setChecked(key == self.group_by)
+            action.triggered.connect(lambda _=False, k=key: self.set_group_by(k))
+        menu.exec_(event.globalPos())
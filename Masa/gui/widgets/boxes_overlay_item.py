@@ -0,0 +1,128 @@
+from typing import List, Optional, Tuple
+
+from PySide2 import (QtWidgets as qtw, QtCore as qtc, QtGui as qtg)
+import numpy as np
+
+from Masa.core.data import Instance
+from Masa.core.utils import SignalPacket, GridIndex
+
+
+class BoxesOverlayItem(qtw.QGraphicsObject):
+    """Paint every non-edited box of a frame in a single pass.
+
+    A `GraphicsRectItem` per box means eight handles, a custom `shape` and a
+    custom `paint` per box. For crowded frames this item replaces all of them:
+    the boxes are kept as one `(n, 4)` array, painted with one `drawRects` call
+    and hit-tested through a `GridIndex`. Only the box that is being edited is
+    expected to be promoted to a full `GraphicsRectItem` by the view.
+
+    Signal:
+    `box_selected`: `(track_id, instance_id)` of the clicked box, or `None` if
+    the click did not hit any box.
+    """
+    box_selected = qtc.Signal(SignalPacket)
+
+    brush = qtg.QBrush(qtg.QColor(255, 0, 0, 100))
+    brush_hovered = qtg.QBrush(qtg.QColor(255, 255, 0, 120))
+    pen = qtg.QPen(qtg.QColor(0, 0, 0), 1.0, qtc.Qt.SolidLine)
+
+    def __init__(self, width_scale, height_scale, cell_size=32.0, parent=None):
+        super().__init__(parent=parent)
+        self.width_scale = width_scale
+        self.height_scale = height_scale
+        self.cell_size = cell_size
+
+        self._boxes = np.empty([0, 4], np.float64)
+        self._ids: List[Tuple[int, int]] = []
+        self._rects: List[qtc.QRectF] = []
+        self._index = GridIndex(cell_size)
+        self._hovered: Optional[int] = None
+
+        self.setAcceptHoverEvents(True)
+
+    def set_instances(self, instances: List[Instance]):
+        """Replace the painted boxes with the ones of `instances`."""
+        self.prepareGeometryChange()
+        boxes = np.array(
+            [(ins.x1, ins.y1, ins.x2, ins.y2) for ins in instances],
+            dtype=np.float64
+        ).reshape(-1, 4)
+        boxes *= (self.width_scale, self.height_scale,
+                  self.width_scale, self.height_scale)
+
+        self._boxes = boxes
+        self._ids = [(ins.track_id, ins.instance_id) for ins in instances]
+        self._rects = [qtc.QRectF(qtc.QPointF(x1, y1), qtc.QPointF(x2, y2))
+                       for x1, y1, x2, y2 in boxes.tolist()]
+        self._index = GridIndex.from_boxes(boxes, cell_size=self.cell_size)
+        self._hovered = None
+        self.update()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def box_at(self, point: qtc.QPointF) -> Optional[int]:
+        """Return the row of the box under `point`.
+
+        When boxes overlap, the smallest one wins since it is the one the user
+        is most likely aiming at.
+        """
+        hits = self._index.query_point(point.x(), point.y())
+        if not hits:
+            return None
+
+        boxes = self._boxes[hits]
+        areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        return hits[int(np.argmin(areas))]
+
+    def ids_at(self, point: qtc.QPointF) -> Optional[Tuple[int, int]]:
+        row = self.box_at(point)
+        return None if row is None else self._ids[row]
+
+    def boundingRect(self):
+        if not self._rects:
+            return qtc.QRectF()
+
+        x1, y1 = self._boxes[:, :2].min(axis=0)
+        x2, y2 = self._boxes[:, 2:].max(axis=0)
+        return qtc.QRectF(qtc.QPointF(x1, y1), qtc.QPointF(x2, y2)).adjusted(-1, -1, 1, 1)
+
+    def paint(self, painter, option, widget=None):
+        painter.setPen(self.pen)
+        painter.setBrush(self.brush)
+        painter.drawRects(self._rects)
+
+        if self._hovered is not None:
+            painter.setBrush(self.brush_hovered)
+            painter.drawRect(self._rects[self._hovered])
+
+    def _set_hovered(self, row: Optional[int]):
+        if row == self._hovered:
+            return
+
+        for old in (self._hovered, row):
+            if old is not None:
+                self.update(self._rects[old].adjusted(-1, -1, 1, 1))
+        self._hovered = row
+
+    def hoverMoveEvent(self, event):
+        self._set_hovered(self.box_at(event.pos()))
+        super().hoverMoveEvent(event)
+
+    def hoverLeaveEvent(self, event):
+        self._set_hovered(None)
+        super().hoverLeaveEvent(event)
+
+    def mousePressEvent(self, event):
+        if event.button() != qtc.Qt.LeftButton:
+            event.ignore()
+            return
+
+        ids = self.ids_at(event.pos())
+        self.box_selected.emit(
+            SignalPacket(sender=[self.__class__.__name__], data=ids)
+        )
+        if ids is None:
+            event.ignore()
+        else:
+            event.accept()
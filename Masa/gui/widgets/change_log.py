@@ -0,0 +1,91 @@
+from PySide2 import (QtWidgets as qtw, QtCore as qtc, QtGui as qtg)
+
+from Masa.core.utils import SignalPacket
+
+
+class ChangeLog(qtw.QWidget):
+    """Debug panel of a `DataHandler`.
+
+    The "Changes" tab appends the one line description of every
+    `DataUpdateInfo`, keeping at most `max_lines` lines. The "Dataset" tab
+    shows `DataHandler.page`, only requested when the tab is opened or a page
+    is asked for.
+    """
+    req_page = qtc.Signal(SignalPacket)
+
+    def __init__(self, parent=None, max_lines: int = 10000):
+        super().__init__(parent)
+
+        self.max_lines = max_lines
+        self.n_changes = 0
+        self.curr_page = 0
+
+        self._set_widgets()
+        self._optimize_widgets()
+        self._set_layouts()
+        self._init()
+
+    def _set_widgets(self):
+        self.tabs = qtw.QTabWidget()
+        self.changes = qtw.QPlainTextEdit()
+        self.dataset = qtw.QWidget()
+        self.dataset_text = qtw.QPlainTextEdit()
+        self.prev_btn = qtw.QPushButton("<")
+        self.next_btn = qtw.QPushButton(">")
+        self.refresh_btn = qtw.QPushButton("Refresh")
+        self.page_label = qtw.QLabel()
+
+    def _optimize_widgets(self):
+        for text in [self.changes, self.dataset_text]:
+            text.setReadOnly(True)
+            text.setLineWrapMode(qtw.QPlainTextEdit.NoWrap)
+        # Oldest lines are dropped once reached.
+        self.changes.setMaximumBlockCount(self.max_lines)
+        self._set_page_label(0, 1)
+
+    def _set_layouts(self):
+        self.layout_main = qtw.QVBoxLayout()
+        self.layout_dataset = qtw.QVBoxLayout()
+        self.layout_pages = qtw.QHBoxLayout()
+
+    def _init(self):
+        self.layout_pages.addWidget(self.prev_btn)
+        self.layout_pages.addWidget(self.page_label)
+        self.layout_pages.addWidget(self.next_btn)
+        self.layout_pages.addStretch()
+        self.layout_pages.addWidget(self.refresh_btn)
+        self.layout_dataset.addLayout(self.layout_pages)
+        self.layout_dataset.addWidget(self.dataset_text)
+        self.dataset.setLayout(self.layout_dataset)
+
+        self.tabs.addTab(self.changes, "Changes")
+        self.tabs.addTab(self.dataset, "Dataset")
+        self.layout_main.addWidget(self.tabs)
+        self.setLayout(self.layout_main)
+
+        self.prev_btn.clicked.connect(lambda: self.request_page(self.curr_page - 1))
+        self.next_btn.clicked.connect(lambda: self.request_page(self.curr_page + 1))
+        self.refresh_btn.clicked.connect(lambda: self.request_page(self.curr_page))
+        self.tabs.currentChanged.connect(self._tab_changed_sl)
+
+    def _set_page_label(self, page, n_pages):
+        self.page_label.setText(f"Page {page + 1} / {n_pages}")
+
+    def log_change_sl(self, packet: SignalPacket):
+        self.n_changes += 1
+        self.changes.appendPlainText(f"#{self.n_changes} {packet.data}")
+
+    def request_page(self, page: int):
+        self.req_page.emit(
+            SignalPacket(sender=[self.__class__.__name__], data=page)
+        )
+
+    def set_page_sl(self, packet: SignalPacket):
+        page, n_pages, text = packet.data
+        self.curr_page = page
+        self._set_page_label(page, n_pages)
+        self.dataset_text.setPlainText(text)
+
+    def _tab_changed_sl(self, index):
+        if self.tabs.widget(index) is self.dataset:
+            self.request_page(self.curr_page)
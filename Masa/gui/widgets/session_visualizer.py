@@ -1,4 +1,4 @@
-from collections import defaultdict
+from collections import defaultdict, deque
 from typing import List, Tuple, Union
 from PySide2 import (QtWidgets as qtw, QtCore as qtc, QtGui as qtg)
 
@@ -9,6 +9,8 @@ from Masa.models import Buffer
 # TODO: Make `SessionsVisualizerView` or `SessionVisualizerView`?
 from ..views.sessions_visualizer_view import SessionsVisualizerView
 from ..views.images_viewer_view import ImagesViewerView
+from ..views.thumbnail_cache import ThumbnailCache
+from ..views.thumbnails_model import Thumbnail
 from ..dialog.instance_editor_dialog import InstanceEditorDialog
 
 from Masa.models import DataHandler
@@ -16,13 +18,34 @@ from Masa.core.utils import SignalPacket, DataUpdateInfo
 
 
 class SessionVisualizer(qtw.QWidget):
+    """Thumbnails of every track, one `ImagesViewerView` per object class.
+
+    Frames are requested progressively, `batch_size` frames every
+    `batch_interval` ms. Frames of the cells painted by the viewers go first,
+    the remaining annotated frames are then filled in the background as long
+    as the thumbnail cache is less than `background_fill` full.
+    """
     req_frames = qtc.Signal(SignalPacket)
     req_datainfo = qtc.Signal(SignalPacket)
     prop_data_change = qtc.Signal(SignalPacket)
     jump_to_frame = qtc.Signal(SignalPacket)
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, thumbnail_cache: ThumbnailCache = None,
+                 batch_size=8, batch_interval=30, background_fill=0.75):
         super().__init__(parent=parent)
+        # Shared by every `ImagesViewerView`.
+        self.thumbnail_cache = (thumbnail_cache if thumbnail_cache is not None
+                                else ThumbnailCache())
+        # frame_id -> viewers holding a thumbnail of that frame.
+        self._frame_viewers = defaultdict(list)
+
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.background_fill = background_fill
+        # Frames painted by a viewer and frames filled in the background.
+        self._visible_queue = deque()
+        self._visible_queued = set()
+        self._background_queue = deque()
 
         self._set_widgets()
         self._optimize_widgets()
@@ -31,9 +54,10 @@ class SessionVisualizer(qtw.QWidget):
 
     def _set_widgets(self):
         self.view = SessionsVisualizerView()
+        self.load_timer = qtc.QTimer(self)
 
     def _optimize_widgets(self):
-        pass
+        self.load_timer.setInterval(self.batch_interval)
 
     def _set_layouts(self):
         self.main_layout = qtw.QVBoxLayout()
@@ -41,6 +65,7 @@ class SessionVisualizer(qtw.QWidget):
     def _init(self):
         self.setLayout(self.main_layout)
         self.main_layout.addWidget(self.view)
+        self.load_timer.timeout.connect(self._load_batch)
 
     def __len__(self):
         return len(self.view._images_viewers)
@@ -71,35 +96,45 @@ class SessionVisualizer(qtw.QWidget):
         return next_val
 
     def set_frames(self, frames: List[Tuple[int, np.ndarray]]):
-        # TODO: This can be optimized.
-        for image_viewer in self:
-            image_viewer.set_frames(frames)
-        
+        viewer_frames = defaultdict(list)
+        for frame_id, frame in frames:
+            for image_viewer in self._frame_viewers.get(frame_id, ()):
+                viewer_frames[image_viewer].append((frame_id, frame))
+
+        for image_viewer, v_frames in viewer_frames.items():
+            image_viewer.set_frames(v_frames)
+
     def set_frames_sl(self, packet: SignalPacket):
         self.set_frames(packet.data)
-        
 
-    def init_data(self, data_handler: DataHandler):
-        # Signal must be connected for image acquisitions.
-        tobjs = data_handler[:]
-        obj_cls_tobjs = defaultdict(list)
+    def _frames_changed_sl(self, packet: SignalPacket):
+        image_viewer = self.sender()
+        added, removed = packet.data
+        for frame_id in added:
+            self._frame_viewers[frame_id].append(image_viewer)
+        for frame_id in removed:
+            viewers = self._frame_viewers[frame_id]
+            viewers.remove(image_viewer)
+            if not viewers:
+                del self._frame_viewers[frame_id]
 
-        for tobj in tobjs:
-            obj_cls_tobjs[tobj.object_class].append(tobj)
 
+    def init_data(self, data_handler: DataHandler):
+        # Signal must be connected for image acquisitions.
         for oc in data_handler.object_classes:
-            imv = ImagesViewerView(name=oc)
+            imv = ImagesViewerView(name=oc, cache=self.thumbnail_cache)
             imv.req_instance.connect(self.request_data_sl)
             imv.req_frames.connect(self.request_frames_sl)
             imv.jump_to_frame.connect(self._jump_to_frame_sl)
+            imv.frames_changed.connect(self._frames_changed_sl)
             self.view._add_images_viewer(oc, imv)
 
-        for name, images_viewer in self.view._images_viewers.items():
-            images_viewer.init_data(obj_cls_tobjs[name])
-
-        self.req_frames.emit(
-            SignalPacket(sender=[self.__class__.__name__], data=self.frame_ids)
-        )
+        # Thumbnails are requested by each viewer once they become visible,
+        # the others are loaded in the background.
+        for track_id, object_class, instances in data_handler.iter_tracks():
+            self.view._images_viewers[object_class].add_track(track_id, instances)
+        self._background_queue.extend(sorted(self._frame_viewers))
+        self.load_timer.start()
 
     def _jump_to_frame_sl(self, packet: SignalPacket):
         self.jump_to_frame.emit(
@@ -108,11 +143,47 @@ class SessionVisualizer(qtw.QWidget):
         )
 
     def request_frames_sl(self, packet: SignalPacket):
+        for frame_id in packet.data:
+            if frame_id not in self._visible_queued:
+                self._visible_queued.add(frame_id)
+                self._visible_queue.append(frame_id)
+
+        if not self.load_timer.isActive():
+            self.load_timer.start()
+
+    def _frame_needed(self, frame_id) -> bool:
+        return any(not iv.frame_cached(frame_id)
+                   for iv in self._frame_viewers.get(frame_id, ()))
+
+    def _next_batch(self) -> List[int]:
+        batch = []
+        while self._visible_queue and len(batch) < self.batch_size:
+            frame_id = self._visible_queue.popleft()
+            self._visible_queued.discard(frame_id)
+            if self._frame_needed(frame_id):
+                batch.append(frame_id)
+
+        cache = self.thumbnail_cache
+        while (self._background_queue and len(batch) < self.batch_size
+               and cache.nbytes < cache.max_bytes * self.background_fill):
+            frame_id = self._background_queue.popleft()
+            if frame_id not in batch and self._frame_needed(frame_id):
+                batch.append(frame_id)
+
+        return batch
+
+    def _load_batch(self):
+        batch = self._next_batch()
+        if not batch:
+            # Everything is loaded, or the cache has no room left for the
+            # background. Restarted by the next request of a viewer.
+            self.load_timer.stop()
+            return
+
         self.req_frames.emit(
-            SignalPacket(sender=[*packet.sender, self.__class__.__name__],
-                         data=packet.data)
+            SignalPacket(sender=[self.__class__.__name__], data=batch)
         )
-        
+
 
     def labels_mappings(self, track_id=None):
         retval = []
@@ -161,13 +232,17 @@ class SessionVisualizer(qtw.QWidget):
 
     def data_update_sl(self, packet: SignalPacket):
         dui: DataUpdateInfo = packet.data
-        if dui.added:
+        if dui.batch:
+            for change in dui.batch:
+                self.data_update_sl(SignalPacket(sender=packet.sender, data=change))
+        elif dui.added:
             self._add(dui.added)
         elif dui.deleted:
             self._delete(*dui.deleted)
         elif dui.replaced:
             if not isinstance(dui.replaced, Instance):
                 return ValueError(f"Only support replacing an Instance.")
+            self._invalidate_thumbnail(dui.replaced)
             self._add(dui.replaced)
             self._delete(dui.replaced.track_id, dui.replaced.instance_id + 1,
                          update_others=False)
@@ -175,6 +250,15 @@ class SessionVisualizer(qtw.QWidget):
             self._delete(*dui.moved[0])
             self._add(dui.moved[1])
 
+    def _invalidate_thumbnail(self, new_instance: Instance):
+        """Drop the cached thumbnail of an instance whose box is changed."""
+        for iv in self.images_viewers:
+            old = iv.thumbnail(new_instance.track_id, new_instance.instance_id)
+            if old is not None:
+                if old.key != Thumbnail.from_instance(new_instance).key:
+                    self.thumbnail_cache.discard(old.key)
+                return
+
     def _replace(self, new_instance):
         for iv in self:
             lbl = iv.labels_mapping(new_instance.track_id)
@@ -186,65 +270,40 @@ class SessionVisualizer(qtw.QWidget):
                 iv._add(new_instance)
 
     def _delete(self, t_id, ins_id, update_others=True):
-        for iv in self:
+        deleted = None
+        for iv in self.images_viewers:
             lbl = iv.labels_mapping(t_id)
             if lbl is not None:
-                # print("before:", iv.labels_mapping())
-                deleted = iv.delete(lbl, ins_id) # CONT: solve weather deleted row or not
+                deleted = iv.delete(lbl, ins_id)
                 object_class = iv.name
-                # print("after:", iv.labels_mapping())
+                break
 
         # Update tracked_object
         if update_others and deleted == "deleted_row":
-            for iv in self:
+            for iv in self.images_viewers:
                 if iv.name != object_class:
-                    lm = iv.labels_mapping()
-                    del_lbl = None
-                    for nlbl, nt_id in lm:
-                        if nt_id >= t_id:
-                            del_lbl = nlbl
-                            break
-                    if del_lbl is not None:
-                        iv._update(label_keep=del_lbl - 1,
-                                    mode=-1)
+                    iv.shift_track_ids(t_id, -1)
 
     def _add(self, obj: Union[TrackedObject, Instance]):
         if isinstance(obj, Instance):
-            for iv in self:
-                out = iv.labels_mapping(obj.track_id)
-                # print(iv.name, obj.track_id, out)
-                if out is not None:
+            for iv in self.images_viewers:
+                if iv.labels_mapping(obj.track_id) is not None:
                     iv.add(obj)
+                    break
         elif isinstance(obj, TrackedObject):
-            t_id = obj.track_id
-            for iv in self:
+            for iv in self.images_viewers:
                 if iv.name == obj.object_class:
                     iv.add(obj)
-
-            # Update tracked_object
-            for iv in self:
-                if iv.name != obj.object_class:
-                    lm = iv.labels_mapping()
-                    # Assuming `lm` is 0,1,..n
-                    add_lbl = None
-                    for lbl, t_id in lm:
-                        if t_id >= obj.track_id:
-                            add_lbl = lbl
-                            break
-                    if add_lbl is not None:
-                        iv._update(label_keep=add_lbl - 1,
-                                mode=1)
+                else:
+                    # Update tracked_object
+                    iv.shift_track_ids(obj.track_id, 1)
         else:
             raise ValueError(f"Do not support data {obj}")
         
 
     @property
     def frame_ids(self):
-        frame_ids = set()
-        for image_viewer in self:
-            frame_ids |= set(image_viewer.frame_ids)
-
-        return list(frame_ids)
+        return list(self._frame_viewers)
 
     def _get_frames_sl(self, packet: SignalPacket):
         pass
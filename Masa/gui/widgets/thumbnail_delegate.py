@@ -0,0 +1,54 @@
+from PySide2 import (QtWidgets as qtw, QtCore as qtc, QtGui as qtg)
+
+from Masa.gui.views.thumbnails_model import ThumbnailsModel
+
+
+class ThumbnailDelegate(qtw.QStyledItemDelegate):
+    """Paint a `Thumbnail` cell: the crop (or a placeholder) and its info.
+
+    Qt only asks the delegate to paint visible cells, so this is also where
+    missing crops are discovered. `thumbnail_needed` is emitted with the
+    `frame_id` of every visible cell whose pixmap is not cached.
+    """
+    thumbnail_needed = qtc.Signal(int)
+
+    placeholder_brush = qtg.QBrush(qtg.QColor(60, 60, 60))
+    margin = 2
+
+    def __init__(self, edge: int = 128, parent=None):
+        super().__init__(parent)
+        self.edge = edge
+
+    def _text_height(self, option):
+        return option.fontMetrics.height() + self.margin
+
+    def sizeHint(self, option, index):
+        return qtc.QSize(self.edge + 2 * self.margin,
+                         self.edge + self._text_height(option) + 2 * self.margin)
+
+    def paint(self, painter, option, index):
+        thumb = index.data(ThumbnailsModel.ThumbnailRole)
+        if thumb is None:
+            return
+
+        painter.save()
+        if option.state & qtw.QStyle.State_Selected:
+            painter.fillRect(option.rect, option.palette.highlight())
+
+        m = self.margin
+        image_rect = qtc.QRect(option.rect.x() + m, option.rect.y() + m,
+                               self.edge, self.edge)
+        pixmap = index.data(qtc.Qt.DecorationRole)
+        if pixmap is None:
+            painter.fillRect(image_rect, self.placeholder_brush)
+            self.thumbnail_needed.emit(thumb.frame_id)
+        else:
+            size = pixmap.size().scaled(image_rect.size(), qtc.Qt.KeepAspectRatio)
+            target = qtc.QRect(qtc.QPoint(0, 0), size)
+            target.moveCenter(image_rect.center())
+            painter.drawPixmap(target, pixmap)
+
+        text_rect = qtc.QRect(image_rect.left(), image_rect.bottom() + m,
+                              self.edge, self._text_height(option))
+        painter.drawText(text_rect, qtc.Qt.AlignCenter, index.data(qtc.Qt.DisplayRole))
+        painter.restore()
@@ -0,0 +1,48 @@
+from typing import List, Tuple
+
+from PySide2 import (QtWidgets as qtw, QtCore as qtc, QtGui as qtg)
+import numpy as np
+
+
+class TrajectoriesItem(qtw.QGraphicsItem):
+    """Paint the box-centre paths of tracks around the current frame.
+
+    The past part of a path is drawn solid and the future part dashed. Paths
+    are expected as returned by `Trajectories.window`.
+    """
+    def __init__(self, paths: List[Tuple[int, np.ndarray]], frame_id,
+                 width_scale, height_scale, parent=None):
+        super().__init__(parent)
+        self.frame_id = frame_id
+        self.width_scale = width_scale
+        self.height_scale = height_scale
+        self.setAcceptedMouseButtons(qtc.Qt.NoButton)
+
+        self._polylines = []
+        for t_id, path in paths:
+            past = path[path[:, 0] <= frame_id]
+            future = path[path[:, 0] >= frame_id]
+            self._polylines.append(
+                (self.color(t_id), self._polygon(past), self._polygon(future))
+            )
+
+    def _polygon(self, path: np.ndarray) -> qtg.QPolygonF:
+        points = path[:, 1:] * (self.width_scale, self.height_scale)
+        return qtg.QPolygonF([qtc.QPointF(x, y) for x, y in points.tolist()])
+
+    @staticmethod
+    def color(track_id) -> qtg.QColor:
+        # Golden ratio hue stepping keeps neighbouring track ids apart.
+        return qtg.QColor.fromHsvF((track_id * 0.618033988749895) % 1, 0.9, 0.95)
+
+    def boundingRect(self):
+        return qtc.QRectF(0, 0, self.width_scale, self.height_scale)
+
+    def paint(self, painter, option, widget=None):
+        painter.setRenderHint(qtg.QPainter.Antialiasing)
+        painter.setBrush(qtc.Qt.NoBrush)
+        for color, past, future in self._polylines:
+            painter.setPen(qtg.QPen(color, 2.0, qtc.Qt.SolidLine))
+            painter.drawPolyline(past)
+            painter.setPen(qtg.QPen(color, 1.5, qtc.Qt.DashLine))
+            painter.drawPolyline(future)
@@ -3,6 +3,8 @@ from PySide2 import QtWidgets as qtw
 try:
     from ..views.video_player_view import VideoPlayerView
     from Masa.models import Buffer
+    from Masa.models.trajectories import Trajectories
+    from Masa.models.annotation_density import AnnotationDensity
     from Masa.core.utils import resize_calculator
 except ValueError:
     import sys
@@ -52,6 +54,17 @@ class VideoPlayer(qtw.QWidget):
         # Getting info from `DataHandler` based on `Buffer` engine.
         self.dh.curr_frame_data.connect(self.view.view.set_frame_data_sl)
 
+        # Track paths are built once and then patched on every edit.
+        self.trajectories = Trajectories.from_data_handler(self.dh)
+        self.dh.data_updated.connect(self.trajectories.data_update_sl)
+        self.view.view.set_trajectories(self.trajectories)
+
+        # Same for the per frame annotation counts under the slider.
+        self.density = AnnotationDensity.from_data_handler(self.dh, self.buff.n_frames)
+        self.view.timeline.set_density(self.density)
+        self.dh.data_updated.connect(self.view.timeline.data_update_sl)
+        self.view.timeline.jump_to_frame.connect(self.jump_frame_sl)
+
     def curr_frame_sl(self, packet):
         self.dh.propogate_curr_frame_data_sl(packet)
         self.view.slider.setValue(packet.data[1])
@@ -1,2 +1,3 @@
 from .buffer import Buffer
-from .datahandler import DataHandler
+from .datahandler import (DataHandler, ColumnarDataHandler, SQLiteDataHandler,
+                          WindowedDataHandler)
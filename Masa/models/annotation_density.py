@@ -0,0 +1,148 @@
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from Masa.core.data import Instance, TrackedObject
+from Masa.core.utils import SignalPacket, DataUpdateInfo
+
+
+class AnnotationDensity:
+    """Per-frame number of instances, per object class and per tag value.
+
+    Every histogram is a `(n_groups, n_frames)` array. As in `Trajectories`,
+    each track is mirrored as an array of `(frame_id, class, *tag values)`
+    codes ordered like `TrackedObject.instances`, so a `DataUpdateInfo` can
+    be applied by position and only the counts of the touched instances are
+    changed. `version` is increased on every change.
+
+    Parameters
+    ----------
+    n_frames
+        Number of frames of the video, grown if an instance is beyond.
+    object_classes
+        Every object class, in the order of the histogram rows.
+    tags
+        Every tag key with its possible values.
+    """
+    def __init__(self, n_frames: int, object_classes: List[str],
+                 tags: Optional[Dict[str, List[str]]] = None):
+        self.object_classes = list(object_classes)
+        self.tags = {key: list(values) for key, values in (tags or {}).items()}
+        self._class_codes = {oc: i for i, oc in enumerate(self.object_classes)}
+        self._tag_codes = {key: {v: i for i, v in enumerate(values)}
+                           for key, values in self.tags.items()}
+
+        self.n_frames = n_frames
+        self._counts: Dict[Optional[str], np.ndarray] = {
+            None: np.zeros((len(self.object_classes), n_frames), dtype=np.int32)
+        }
+        for key, values in self.tags.items():
+            self._counts[key] = np.zeros((len(values), n_frames), dtype=np.int32)
+
+        self._tracks: List[np.ndarray] = []
+        self.version = 0
+
+    @classmethod
+    def from_data_handler(cls, data_handler, n_frames: int):
+        density = cls(n_frames, data_handler.object_classes, data_handler.tags)
+        for track_id, _, instances in data_handler.iter_tracks():
+            density._insert_track(track_id, instances)
+
+        return density
+
+    def __len__(self):
+        return len(self._tracks)
+
+    def _rows(self, instances: List[Instance]) -> np.ndarray:
+        rows = np.empty((len(instances), 2 + len(self.tags)), dtype=np.int64)
+        for i, ins in enumerate(instances):
+            rows[i, 0] = ins.frame_id
+            rows[i, 1] = self._class_codes.get(ins.object_class, -1)
+            for j, key in enumerate(self.tags, 2):
+                rows[i, j] = self._tag_codes[key].get(ins.tags.get(key), -1)
+
+        return rows
+
+    def _grow(self, n_frames):
+        pad = n_frames - self.n_frames
+        for key, counts in self._counts.items():
+            self._counts[key] = np.pad(counts, ((0, 0), (0, pad)))
+        self.n_frames = n_frames
+
+    def _count(self, rows: np.ndarray, sign: int):
+        if len(rows) == 0:
+            return
+        if rows[:, 0].max() >= self.n_frames:
+            self._grow(int(rows[:, 0].max()) + 1)
+
+        frames = rows[:, 0]
+        for j, key in enumerate([None, *self.tags], 1):
+            codes = rows[:, j]
+            known = codes >= 0
+            np.add.at(self._counts[key], (codes[known], frames[known]), sign)
+
+    def _insert_track(self, track_id, instances: List[Instance]):
+        rows = self._rows(instances)
+        self._tracks.insert(track_id, rows)
+        self._count(rows, 1)
+
+    def _add_instance(self, instance: Instance):
+        rows = self._rows([instance])
+        t_id = instance.track_id
+        self._tracks[t_id] = np.insert(self._tracks[t_id], instance.instance_id, rows, axis=0)
+        self._count(rows, 1)
+
+    def _delete(self, track_id, instance_id=None):
+        track = self._tracks[track_id]
+        if instance_id is None:
+            self._count(track, -1)
+            del self._tracks[track_id]
+            return
+
+        self._count(track[instance_id:instance_id + 1], -1)
+        self._tracks[track_id] = np.delete(track, instance_id, axis=0)
+        if len(self._tracks[track_id]) == 0:
+            # Mirror `DataHandler`, an empty `TrackedObject` is removed.
+            del self._tracks[track_id]
+
+    def _add(self, obj: Union[Instance, TrackedObject]):
+        if isinstance(obj, TrackedObject):
+            self._insert_track(obj.track_id, obj[:])
+        else:
+            self._add_instance(obj)
+
+    def data_update(self, dui: DataUpdateInfo):
+        if dui.batch:
+            for change in dui.batch:
+                self.data_update(change)
+            return
+        elif dui.added:
+            self._add(dui.added)
+        elif dui.deleted:
+            self._delete(*dui.deleted)
+        elif dui.replaced:
+            ins = dui.replaced
+            track = self._tracks[ins.track_id]
+            self._count(track[ins.instance_id:ins.instance_id + 1], -1)
+            track[ins.instance_id] = self._rows([ins])[0]
+            self._count(track[ins.instance_id:ins.instance_id + 1], 1)
+        elif dui.moved:
+            self._delete(*dui.moved[0])
+            self._add(dui.moved[1])
+        else:
+            return
+
+        self.version += 1
+
+    def data_update_sl(self, packet: SignalPacket):
+        self.data_update(packet.data)
+
+    @property
+    def group_keys(self) -> List[Optional[str]]:
+        """`None` groups by object class, the others by tag value."""
+        return [None, *self.tags]
+
+    def histogram(self, group_by: Optional[str] = None) -> Tuple[List[str], np.ndarray]:
+        """Return the group labels and their `(n_groups, n_frames)` counts."""
+        labels = self.object_classes if group_by is None else self.tags[group_by]
+        return labels, self._counts[group_by]
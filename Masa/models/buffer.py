@@ -31,7 +31,7 @@ class Buffer(qtc.QThread):
     run_results = qtc.Signal(SignalPacket)
     session_initialized = qtc.Signal(SignalPacket)
     video_ended = qtc.Signal(int)
-    pass_frames = qtc.Signal(list)
+    pass_frames = qtc.Signal(SignalPacket)
     backwarded = qtc.Signal(bool)
     buffer_rect = qtc.Signal(tuple)
     curr_frame = qtc.Signal(SignalPacket)
@@ -52,7 +52,8 @@ class Buffer(qtc.QThread):
         self.idx = None
         self.prev_idx = -1
         self.prev_idx = None
-        # self.session = EpipolarTrack()
+        # Called with every frame shown, as `session(frame, idx)`.
+        self.sessions = []
         self.backward = backward
         self.run_thread = True
         self.default_fps = fps
@@ -105,8 +106,10 @@ class Buffer(qtc.QThread):
         self.video.set(cv2.CAP_PROP_POS_FRAMES, self.idx)
 
         if straight_jump:
+            frame = self.next_frame()
+            self._run_sessions(frame)
             self.curr_frame.emit(
-                SignalPacket(sender="Buffer", data=(self.next_frame().copy(), self.idx))
+                SignalPacket(sender="Buffer", data=(frame.copy(), self.idx))
             )
         else:
             return self.next_frame()
@@ -158,6 +161,13 @@ class Buffer(qtc.QThread):
             self._play = prev_play_status
             self.backwarded.emit(self.backward)
 
+    def add_session(self, session):
+        self.sessions.append(session)
+
+    def _run_sessions(self, frame):
+        for session in self.sessions:
+            session(frame, self.idx)
+
     def session_init_sl(self, packet: SignalPacket):
         self.pause()
         packet = packet.data
@@ -230,7 +240,7 @@ class Buffer(qtc.QThread):
                 else:
                     self.frame = frame
 
-                # for session in self.session: session()
+                self._run_sessions(frame)
 
                 # fi = self.dh.from_frame(self.idx, to="frameinfo")
                 # fi.frame = self.frame
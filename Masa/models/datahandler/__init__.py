@@ -1 +1,6 @@
 from .datahandler import DataHandler
+from .columnar import ColumnarDataHandler, ColumnarStore
+from .container import AnnotationContainer, csv_to_container, container_to_csv
+from .database import SQLiteDataHandler, SQLiteStore
+from .history import EditHistory
+from .windowed import WindowedDataHandler
@@ -0,0 +1,424 @@
+from collections.abc import Mapping
+from itertools import groupby
+from operator import attrgetter
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from Masa.core.data import TrackedObject, Instance
+from .datahandler import DataHandler, cached_view
+from .loader import CsvTable, check_tags, first_appearance_ids, tag_codes
+
+
+class ColumnarStore:
+    """Annotations kept as one structured NumPy array, one row per box.
+
+    Rows are sorted by `track_id`, and by `instance_id` inside a track, so a
+    track is a contiguous slice and the `instance_id` of a row is its offset
+    in that slice. As `TrackedObject.object_class`, the class of a track is
+    the one it was created with and is kept in `track_classes`, with the
+    `track_uids` that identify a track whatever its position. Object
+    classes and tag values are stored as categorical codes (`-1` for a
+    missing tag). `Instance` and `TrackedObject` are only created when asked
+    for.
+
+    Parameters
+    ----------
+    object_classes
+        Every valid object class.
+    tags
+        Every tag key with its valid values.
+    """
+    coords = ("x1", "y1", "x2", "y2")
+
+    def __init__(self, object_classes: Sequence[str], tags: Dict[str, Sequence[str]]):
+        self.object_classes = list(object_classes)
+        self.tag_values = {key: list(values) for key, values in tags.items()}
+        self._class_codes = {oc: i for i, oc in enumerate(self.object_classes)}
+        self._tag_codes = {key: {v: i for i, v in enumerate(values)}
+                           for key, values in self.tag_values.items()}
+
+        self.dtype = np.dtype([
+            ("track_id", np.int64),
+            ("frame_id", np.int64),
+            *[(c, np.float64) for c in self.coords],
+            # Bit `i` is set if `coords[i]` was given as an `int`.
+            ("int_mask", np.uint8),
+            ("object_class", np.int16),
+            *[(self._tag_field(key), np.int16) for key in self.tag_values],
+        ])
+        self.rows = np.empty(0, dtype=self.dtype)
+        self.track_classes = np.empty(0, dtype=np.int16)
+        self.track_uids = np.empty(0, dtype=np.int64)
+        self._next_uid = 0
+        # Rows sorted by `frame_id`, rebuilt lazily after an edit.
+        self._frame_order = None
+
+    @staticmethod
+    def _tag_field(key) -> str:
+        return f"tag:{key}"
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def n_tracks(self) -> int:
+        return int(self.rows["track_id"][-1]) + 1 if len(self.rows) else 0
+
+    @property
+    def nbytes(self) -> int:
+        return self.rows.nbytes
+
+    def _changed(self):
+        self._frame_order = None
+
+    # Loading #################################################################
+    @classmethod
+    def from_table(cls, table: CsvTable, object_classes: Sequence[str],
+                   tags: Dict[str, Sequence[str]]) -> "ColumnarStore":
+        """Build from a parsed Masa CSV.
+
+        As with `DataHandler`, `track_id` are renumbered `0..n-1` in order of
+        first appearance and instances keep the order of the file.
+        """
+        store = cls(object_classes, tags)
+        rows = np.empty(len(table), dtype=store.dtype)
+        track_ids, _ = table.numbers("track_id")
+        frame_ids, _ = table.numbers("frame_id")
+        rows["frame_id"] = np.trunc(frame_ids)
+        int_mask = np.zeros(len(table), dtype=np.uint8)
+        for i, c in enumerate(cls.coords):
+            rows[c], is_int = table.numbers(c)
+            int_mask |= is_int.astype(np.uint8) << i
+        rows["int_mask"] = int_mask
+        rows["object_class"] = table.codes("object_class", store.object_classes,
+                                           "Class of {} is not valid.")
+        for key, values in store.tag_values.items():
+            rows[store._tag_field(key)] = tag_codes(table, key, values)
+
+        rows["track_id"], first = first_appearance_ids(track_ids.astype(np.int64))
+        store.rows = rows[np.argsort(rows["track_id"], kind="stable")]
+        store.track_classes = rows["object_class"][first]
+        store.track_uids = np.arange(len(first), dtype=np.int64)
+        store._next_uid = len(first)
+        return store
+
+    def encode(self, instances: List[Instance]) -> np.ndarray:
+        rows = np.empty(len(instances), dtype=self.dtype)
+        for row, ins in zip(rows, instances):
+            if ins.object_class not in self._class_codes:
+                raise ValueError(f"Class of {ins.object_class} is not valid.")
+            row["track_id"] = ins.track_id
+            row["frame_id"] = ins.frame_id
+            mask = 0
+            for i, c in enumerate(self.coords):
+                value = getattr(ins, c)
+                row[c] = value
+                mask |= isinstance(value, (int, np.integer)) << i
+            row["int_mask"] = mask
+            row["object_class"] = self._class_codes[ins.object_class]
+            check_tags(ins.tags, self._tag_codes)
+            for key, codes in self._tag_codes.items():
+                row[self._tag_field(key)] = codes.get(ins.tags.get(key), -1)
+
+        return rows
+
+    # Access ##################################################################
+    def track_slice(self, track_id) -> slice:
+        track_ids = self.rows["track_id"]
+        lo = int(np.searchsorted(track_ids, track_id, side="left"))
+        hi = int(np.searchsorted(track_ids, track_id, side="right"))
+        if lo == hi:
+            raise KeyError(track_id)
+        return slice(lo, hi)
+
+    def instances(self, rows: np.ndarray) -> List[Instance]:
+        """Materialise the `Instance` of the given row positions."""
+        rows = np.asarray(rows, dtype=np.int64)
+        track_ids = self.rows["track_id"]
+        starts = np.searchsorted(track_ids, track_ids[rows], side="left")
+        records = self.rows[rows]
+
+        ret = []
+        for record, row, start in zip(records, rows.tolist(), starts.tolist()):
+            mask = int(record["int_mask"])
+            coords = [int(record[c]) if mask >> i & 1 else float(record[c])
+                      for i, c in enumerate(self.coords)]
+            tags = {}
+            for key, values in self.tag_values.items():
+                code = int(record[self._tag_field(key)])
+                tags[key] = values[code] if code >= 0 else None
+            ret.append(Instance(int(record["track_id"]),
+                                self.object_classes[int(record["object_class"])],
+                                row - start, *coords, int(record["frame_id"]), tags))
+
+        return ret
+
+    def tracked_object(self, track_id) -> TrackedObject:
+        instances = self.instances(np.arange(*self.track_slice(track_id).indices(len(self))))
+        object_class = self.object_classes[self.track_classes[track_id]]
+        tobj = TrackedObject(track_id, object_class, instances[0])
+        for instance in instances[1:]:
+            tobj.add_instance(instance, update=False)
+        tobj._update()
+
+        return tobj
+
+    # Queries #################################################################
+    def _frame_sorted(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._frame_order is None:
+            order = np.argsort(self.rows["frame_id"], kind="stable")
+            self._frame_order = (order, self.rows["frame_id"][order])
+
+        return self._frame_order
+
+    def by_frame(self, frame_id) -> np.ndarray:
+        order, frames = self._frame_sorted()
+        lo = np.searchsorted(frames, frame_id, side="left")
+        hi = np.searchsorted(frames, frame_id, side="right")
+        # The stable sort keeps them in (track_id, instance_id) order.
+        return order[lo:hi]
+
+    def by_track(self, track_id) -> np.ndarray:
+        return np.arange(*self.track_slice(track_id).indices(len(self)))
+
+    def by_class(self, object_class) -> np.ndarray:
+        code = self._class_codes.get(object_class, -2)
+        return np.flatnonzero(self.rows["object_class"] == code)
+
+    def by_tag(self, key, value) -> np.ndarray:
+        code = self._tag_codes[key].get(value, -2)
+        return np.flatnonzero(self.rows[self._tag_field(key)] == code)
+
+    def frames(self) -> np.ndarray:
+        return np.unique(self._frame_sorted()[1])
+
+    def track_uid(self, track_id) -> int:
+        return int(self.track_uids[track_id])
+
+    def track_id_of(self, uid) -> Optional[int]:
+        found = np.flatnonzero(self.track_uids == uid)
+        return int(found[0]) if len(found) else None
+
+    # Edits ###################################################################
+    def _shift_tracks(self, start, delta):
+        self.rows["track_id"][start:] += delta
+
+    def insert_instance(self, instance: Instance):
+        """Insert `instance` in its track, appended if `instance_id` is past the end."""
+        sl = self.track_slice(instance.track_id)
+        length = sl.stop - sl.start
+        if instance.instance_id > length or instance.instance_id == -1:
+            instance.instance_id = length
+        self.rows = np.insert(self.rows, sl.start + instance.instance_id,
+                              self.encode([instance]))
+        self._changed()
+
+    def insert_track(self, track_id, object_class, instances: List[Instance],
+                     uid: Optional[int] = None):
+        """Insert a track at `track_id`, the following tracks are shifted.
+
+        The track gets a new uid, or `uid`, the one it had before its deletion.
+        """
+        if object_class not in self._class_codes:
+            raise ValueError(f"Class of {object_class} is not valid.")
+        if uid is None:
+            uid = self._next_uid
+        elif self.track_id_of(uid) is not None:
+            raise ValueError(f"Track uid {uid} is already in use.")
+        self.track_classes = np.insert(self.track_classes, track_id,
+                                       self._class_codes[object_class])
+        self.track_uids = np.insert(self.track_uids, track_id, uid)
+        self._next_uid = max(self._next_uid, uid + 1)
+        pos = int(np.searchsorted(self.rows["track_id"], track_id, side="left"))
+        self._shift_tracks(pos, 1)
+        rows = self.encode(instances)
+        rows["track_id"] = track_id
+        self.rows = np.insert(self.rows, pos, rows)
+        self._changed()
+
+    def delete_track(self, track_id):
+        sl = self.track_slice(track_id)
+        self.rows = np.delete(self.rows, np.arange(*sl.indices(len(self))))
+        self.track_classes = np.delete(self.track_classes, track_id)
+        self.track_uids = np.delete(self.track_uids, track_id)
+        self._shift_tracks(sl.start, -1)
+        self._changed()
+
+    def delete_instance(self, track_id, instance_id) -> bool:
+        """Delete an instance, and its track if it was the last one.
+
+        Returns whether the track got deleted.
+        """
+        sl = self.track_slice(track_id)
+        pos = range(sl.start, sl.stop)[instance_id]
+        self.rows = np.delete(self.rows, pos)
+        emptied = sl.stop - sl.start == 1
+        if emptied:
+            self.track_classes = np.delete(self.track_classes, track_id)
+            self.track_uids = np.delete(self.track_uids, track_id)
+            self._shift_tracks(sl.start, -1)
+        self._changed()
+
+        return emptied
+
+    def replace(self, instance: Instance):
+        sl = self.track_slice(instance.track_id)
+        pos = range(sl.start, sl.stop)[instance.instance_id]
+        row = self.encode([instance])[0]
+        row["track_id"] = self.rows["track_id"][pos]
+        self.rows[pos] = row
+        self._changed()
+
+    # Saving ##################################################################
+    def csv_rows(self, scene: str) -> Iterator[Tuple[str, ...]]:
+        """Rows of the Masa CSV, without its header.
+
+        The rows are copied first, the returned iterator can be consumed by
+        another thread while the store is edited.
+        """
+        rows = self.rows.copy()
+
+        def formatted():
+            columns = [rows["track_id"].astype(str), rows["frame_id"].astype(str)]
+            for i, c in enumerate(self.coords):
+                is_int = (rows["int_mask"] >> i & 1).astype(bool)
+                columns.append(np.where(is_int, rows[c].astype(np.int64).astype(str),
+                                        rows[c].astype(str)))
+            columns.append(np.full(len(rows), scene))
+            columns.append(np.array(self.object_classes)[rows["object_class"]])
+            for key, values in self.tag_values.items():
+                # An empty value for a missing tag.
+                columns.append(np.array([*values, ""])[rows[self._tag_field(key)]])
+            yield from zip(*(c.tolist() for c in columns))
+
+        return formatted()
+
+
+class _TrackedObjects(Mapping):
+    """Read-only `track_id -> TrackedObject` view over a `ColumnarStore`."""
+    def __init__(self, store: ColumnarStore):
+        self._store = store
+
+    def __getitem__(self, track_id):
+        if not isinstance(track_id, (int, np.integer)) or not 0 <= track_id < len(self):
+            raise KeyError(track_id)
+        return self._store.tracked_object(track_id)
+
+    def __iter__(self):
+        return iter(range(len(self)))
+
+    def __len__(self):
+        return self._store.n_tracks
+
+
+class ColumnarDataHandler(DataHandler):
+    """`DataHandler` backed by a `ColumnarStore` instead of `TrackedObject`.
+
+    It exposes the same API: `Instance` and `TrackedObject` are materialised
+    on access and edits are written to the store. `tracked_objs` is a
+    read-only view. Use `store` for vectorised queries by frame, track, class
+    or tag.
+
+    `from_frame` builds new `Instance` every time, so the `FrameIndex` are
+    dropped by every edit and built again on the next query.
+    """
+    def _init_store(self):
+        self.store: ColumnarStore = None
+
+    def _build_index(self):
+        # `ColumnarStore.by_frame` is the index.
+        pass
+
+    def _read_from_input(self):
+        self.store = ColumnarStore.from_table(self._read_table(), self.object_classes,
+                                              self.all_tags)
+
+    @property
+    def tracked_objs(self) -> Mapping:
+        return _TrackedObjects(self.store)
+
+    def __getitem__(self, index):
+        track_ids = range(len(self))[index]
+        if isinstance(track_ids, range):
+            return [self.store.tracked_object(t_id) for t_id in track_ids]
+        return self.store.tracked_object(track_ids)
+
+    def __len__(self):
+        return self.store.n_tracks
+
+    @property
+    def instances(self):
+        # Not cached, `Instance` are only kept in memory while used.
+        return self.store.instances(np.arange(len(self.store)))
+
+    def iter_tracks(self):
+        # Every `Instance` materialised at once, without `TrackedObject`.
+        classes = self.store.track_classes.tolist()
+        for track_id, instances in groupby(self.instances, key=attrgetter("track_id")):
+            yield track_id, self.store.object_classes[classes[track_id]], list(instances)
+
+    @cached_view
+    def frames(self):
+        return self.store.frames().tolist()
+
+    @cached_view
+    def object_class_mapping(self):
+        obj_cls_map = {obj_cls: [] for obj_cls in self.object_classes}
+        for t_id, code in enumerate(self.store.track_classes.tolist()):
+            obj_cls_map[self.store.object_classes[code]].append(t_id)
+
+        return obj_cls_map
+
+    def from_frame(self, frame_id, to: str = None) -> List[Instance]:
+        return self.store.instances(self.store.by_frame(frame_id))
+
+    def track_uid(self, track_id: int) -> int:
+        return self.store.track_uid(track_id)
+
+    def track_id_of(self, uid: int) -> Optional[int]:
+        return self.store.track_id_of(uid)
+
+    def _add_instance(self, instance):
+        if instance.track_id >= len(self):
+            raise Exception(f"Must instantiated the `TrackedObject` with "
+                            f"`track_id`={instance.track_id} first.")
+        self.store.insert_instance(instance)
+        self._invalidate("frames")
+        self._spatial.clear()
+
+    def _add_tobj(self, tobj):
+        if tobj.track_id > len(self):
+            tobj.change_track_id(len(self))
+        self.store.insert_track(tobj.track_id, tobj.object_class, tobj[:],
+                                self._restored_uid(tobj))
+        self._invalidate("frames", "object_class_mapping")
+        self._spatial.clear()
+
+    def _delete_tobj(self, tobj_idx: int):
+        try:
+            self.store.delete_track(tobj_idx)
+        except KeyError:
+            raise ValueError(f"`tobj_idx`={tobj_idx} does not exist")
+        self._invalidate("frames", "object_class_mapping")
+        self._spatial.clear()
+
+    def _delete_instance(self, tobj_idx: int, instance_idx: int, update=True):
+        try:
+            emptied = self.store.delete_instance(tobj_idx, instance_idx)
+        except KeyError:
+            raise ValueError(f"`tobj_idx`={tobj_idx} does not exist")
+        except IndexError:
+            raise ValueError(f"`instance_idx`={instance_idx} does not exist")
+        self._invalidate("frames")
+        self._spatial.clear()
+        if emptied:
+            self._invalidate("object_class_mapping")
+
+    def _replace_instance(self, instance):
+        self.store.replace(instance)
+        self._invalidate("frames")
+        self._spatial.clear()
+
+    def _snapshot(self):
+        return self.store.csv_rows(self.scene)
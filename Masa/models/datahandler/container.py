@@ -0,0 +1,252 @@
+"""Binary, memory-mappable container of a Masa annotation file.
+
+Convert a CSV with::
+
+    python -m Masa.models.datahandler.container annotations.csv annotations.masa
+
+and back with the arguments swapped.
+"""
+from io import StringIO
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Tuple, Union
+import argparse
+import json
+import struct
+
+import numpy as np
+
+from .loader import CsvTable, python_numbers, recode
+from .writer import write_csv
+
+
+SUFFIX = ".masa"
+MAGIC = b"MASACOL1"
+# Every array starts on a multiple of `ALIGN` bytes.
+ALIGN = 64
+ID_COLUMNS = ("track_id", "frame_id")
+COORD_COLUMNS = ("x1", "y1", "x2", "y2")
+
+
+def is_container(path: Union[str, Path]) -> bool:
+    return Path(path).suffix == SUFFIX
+
+
+def _record_dtype(text_columns: List[str]) -> np.dtype:
+    return np.dtype([
+        # Position of the row in the CSV.
+        ("_row", "<i8"),
+        *[(c, "<i8") for c in ID_COLUMNS],
+        *[(c, "<f8") for c in COORD_COLUMNS],
+        # Bit `i` is set if `COORD_COLUMNS[i]` was written as an `int`.
+        ("_int_mask", "u1"),
+        # Index in the dictionary of the column.
+        *[(c, "<i4") for c in text_columns],
+    ])
+
+
+def _padding(offset: int) -> int:
+    return -offset % ALIGN
+
+
+def write_container(f: BinaryIO, table: CsvTable):
+    """Write `table` into the binary file `f`.
+
+    Layout: `MAGIC`, the length of a JSON header and the header (columns,
+    dictionaries of the text columns, dtype and offset of the arrays), then
+    the arrays, each aligned on `ALIGN` bytes:
+
+    - `records`, one structured row per box sorted by `frame_id` (in the
+      order of the CSV for a same frame),
+    - `frames`, every distinct `frame_id`,
+    - `frame_starts`, the first record of every frame (and the number of
+      records), so the records of a range of frames are found without
+      reading `records`.
+    """
+    for c in (*ID_COLUMNS, *COORD_COLUMNS):
+        if c not in table.header:
+            raise ValueError(f"Missing column {c}.")
+    text_columns = [c for c in table.header if c not in ID_COLUMNS + COORD_COLUMNS]
+    dtype = _record_dtype(text_columns)
+
+    records = np.empty(len(table), dtype=dtype)
+    records["_row"] = np.arange(len(table))
+    for c in ID_COLUMNS:
+        values, is_int = table.numbers(c)
+        if not is_int.all():
+            raise ValueError(f"{c} must be integers.")
+        records[c] = values
+    int_mask = np.zeros(len(table), dtype=np.uint8)
+    for i, c in enumerate(COORD_COLUMNS):
+        records[c], is_int = table.numbers(c)
+        int_mask |= is_int.astype(np.uint8) << i
+    records["_int_mask"] = int_mask
+    dictionaries = {}
+    for c in text_columns:
+        dictionaries[c], records[c] = table.factorized(c)
+
+    records = records[np.argsort(records["frame_id"], kind="stable")]
+    frames, frame_starts = np.unique(records["frame_id"], return_index=True)
+    frame_starts = np.append(frame_starts, len(records)).astype("<i8")
+    arrays = {"records": records, "frames": frames.astype("<i8"),
+              "frame_starts": frame_starts}
+
+    # Offsets are relative to the first array, right after the header.
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        offset += _padding(offset)
+        layout[name] = {"offset": offset,
+                        "dtype": np.lib.format.dtype_to_descr(array.dtype),
+                        "shape": len(array)}
+        offset += array.nbytes
+    header = json.dumps({"columns": table.header, "dictionaries": dictionaries,
+                         "arrays": layout}).encode()
+
+    f.write(MAGIC)
+    f.write(struct.pack("<Q", len(header)))
+    f.write(header)
+    f.write(b"\0" * _padding(len(MAGIC) + 8 + len(header)))
+    written = 0
+    for name, array in arrays.items():
+        f.write(b"\0" * (layout[name]["offset"] - written))
+        f.write(np.ascontiguousarray(array).data)
+        written = layout[name]["offset"] + array.nbytes
+
+
+class ContainerTable:
+    """Rows of an `AnnotationContainer`, in the order of the CSV.
+
+    Offer the reading interface of `CsvTable`, `DataHandler` reads both.
+    """
+    def __init__(self, records: np.ndarray, header: List[str],
+                 dictionaries: Dict[str, List[str]]):
+        if not (np.diff(records["_row"]) > 0).all():
+            records = records[np.argsort(records["_row"], kind="stable")]
+        self.records = records
+        self.header = header
+        self.dictionaries = dictionaries
+
+    def __len__(self):
+        return len(self.records)
+
+    def numbers(self, key) -> Tuple[np.ndarray, np.ndarray]:
+        values = self.records[key].astype(np.float64)
+        if key in ID_COLUMNS:
+            return values, np.ones(len(self), dtype=bool)
+        bit = COORD_COLUMNS.index(key)
+        return values, (self.records["_int_mask"] >> bit & 1).astype(bool)
+
+    def factorized(self, key) -> Tuple[List[str], np.ndarray]:
+        return self.dictionaries[key], self.records[key]
+
+    def codes(self, key, valid, error: str) -> np.ndarray:
+        return recode(*self.factorized(key), valid, error)
+
+    def text(self, key) -> np.ndarray:
+        return np.array(self.dictionaries[key] or [""])[self.records[key]]
+
+    def rows(self) -> Iterator[tuple]:
+        """Rows as written in the CSV, Python values."""
+        columns = []
+        for c in self.header:
+            if c in ID_COLUMNS:
+                columns.append(self.records[c].tolist())
+            elif c in COORD_COLUMNS:
+                columns.append(python_numbers(*self.numbers(c)))
+            else:
+                columns.append(self.text(c).tolist())
+        return zip(*columns)
+
+
+class AnnotationContainer:
+    """Read-only, memory-mapped view of a file written by `write_container`.
+
+    Opening only reads the header, the records are mapped and paged in by
+    the OS as they are read: `window` reads the records of a range of frames
+    and nothing else.
+
+    Parameters
+    ----------
+    path
+        Path to the container.
+    """
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        with self.path.open("rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{self.path} is not a Masa container.")
+            (size,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(size))
+        self.header: List[str] = header["columns"]
+        self.dictionaries: Dict[str, List[str]] = header["dictionaries"]
+
+        start = len(MAGIC) + 8 + size
+        start += _padding(start)
+        arrays = {}
+        for name, layout in header["arrays"].items():
+            dtype = np.lib.format.descr_to_dtype(_as_descr(layout["dtype"]))
+            if layout["shape"]:
+                arrays[name] = np.memmap(self.path, dtype=dtype, mode="r",
+                                         offset=start + layout["offset"],
+                                         shape=(layout["shape"],))
+            else:
+                # Empty arrays cannot be mapped.
+                arrays[name] = np.empty(0, dtype=dtype)
+        self.records = arrays["records"]
+        self.frames = arrays["frames"]
+        self.frame_starts = arrays["frame_starts"]
+
+    def __len__(self):
+        return len(self.records)
+
+    def frame_range(self, start: int, stop: int) -> slice:
+        """Records of the frames from `start` to `stop` (excluded)."""
+        lo, hi = np.searchsorted(self.frames, [start, stop])
+        return slice(int(self.frame_starts[lo]), int(self.frame_starts[hi]))
+
+    def window(self, start: int, stop: int) -> ContainerTable:
+        """Rows of the frames from `start` to `stop` (excluded)."""
+        return ContainerTable(np.array(self.records[self.frame_range(start, stop)]),
+                              self.header, self.dictionaries)
+
+    def table(self) -> ContainerTable:
+        return ContainerTable(np.array(self.records), self.header, self.dictionaries)
+
+
+def _as_descr(descr):
+    # JSON turned the tuples of a structured descr into lists.
+    if isinstance(descr, str):
+        return descr
+    return [tuple(field) for field in descr]
+
+
+def csv_to_container(csv_file: Union[str, Path], container_file: Union[str, Path]):
+    with Path(container_file).open("wb") as f:
+        write_container(f, CsvTable.from_file(csv_file))
+
+
+def container_to_csv(container_file: Union[str, Path], csv_file: Union[str, Path]):
+    """Write back the CSV, every value is kept, `int` stay `int`."""
+    table = AnnotationContainer(container_file).table()
+    with Path(csv_file).open("w", newline="") as f:
+        write_csv(f, table.header, table.rows())
+
+
+def write_container_rows(f: BinaryIO, header: List[str], rows: Iterable[Iterable]):
+    """`write_container` for rows given as to `write_csv`."""
+    # Going through the CSV text keeps the container equal to the CSV.
+    text = StringIO()
+    write_csv(text, header, rows)
+    write_container(f, CsvTable.from_str(text.getvalue()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=f"Convert a Masa CSV into a {SUFFIX} container, or back."
+    )
+    parser.add_argument("input")
+    parser.add_argument("output")
+    args = parser.parse_args()
+    if is_container(args.input):
+        container_to_csv(args.input, args.output)
+    else:
+        csv_to_container(args.input, args.output)
@@ -0,0 +1,567 @@
+from contextlib import contextmanager
+from itertools import groupby
+from operator import attrgetter
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+import json
+import sqlite3
+
+import numpy as np
+
+from Masa.core.data import TrackedObject, Instance
+from .columnar import ColumnarDataHandler, _TrackedObjects
+from .datahandler import _Batch
+from .journal import file_stamp
+from .loader import CsvTable, check_tags, first_appearance_ids, python_numbers, tag_codes
+
+
+def _py(value):
+    # `sqlite3` only binds Python numbers.
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class TrackSummary(NamedTuple):
+    object_class: str
+    n_instances: int
+    first_frame: int
+    last_frame: int
+
+
+class SQLiteStore:
+    """Annotations kept in a SQLite database, one row per box.
+
+    As in `ColumnarStore`, `track_id` are dense and `instance_id` are the
+    position of an instance in its track. Only `tracks` holds the `track_id`,
+    with the class of each track: the rows of `instances` refer to their
+    track by its `rowid`, which identifies it whatever its position, so
+    inserting or deleting a track renumbers the following `tracks` only, not
+    their rows. Rows are indexed on `(track, instance_id)`, `frame_id` and
+    `object_class`, `Instance` and `TrackedObject` are only created for the
+    rows asked for. The `where` of queries can use `track_id` as any column
+    of `instances` (`instances.object_class`, which `tracks` has too).
+
+    Every edit is committed right away. `transaction` groups several edits
+    into one commit, and counts it in `position`.
+
+    Parameters
+    ----------
+    path
+        Path to the database, created if needed. `":memory:"` keeps it in RAM.
+    object_classes
+        Every valid object class.
+    tags
+        Every tag key with its valid values.
+    """
+    coords = ("x1", "y1", "x2", "y2")
+    # Version of the tables, a database of another one is made again.
+    schema = 2
+
+    def __init__(self, path: Union[str, Path], object_classes: Sequence[str],
+                 tags: Dict[str, Sequence[str]]):
+        self.path = str(path)
+        self.object_classes = list(object_classes)
+        self.tag_values = {key: list(values) for key, values in tags.items()}
+        self.conn = sqlite3.connect(self.path)
+        if self.path != ":memory:":
+            # Readers (the writer thread) do not block edits.
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self._depth = 0
+        # Next `rowid` of `tracks`, never given twice while the store is open.
+        self._next_uid = None
+
+        # Tags are stored in `tag_<i>` columns, whatever their key.
+        self._tag_columns = [f"tag_{i}" for i in range(len(self.tag_values))]
+        columns = ["object_class", "instance_id", *self.coords, "frame_id",
+                   *self._tag_columns]
+        self._columns = ", ".join(["track_id", *(f"instances.{c}" for c in columns)])
+        # `track` first.
+        self._insert_sql = (f"INSERT INTO instances "
+                            f"VALUES ({', '.join('?' * (len(columns) + 1))})")
+
+    # Schema ##################################################################
+    @property
+    def layout(self) -> str:
+        """Classes and tags the rows were validated against, and `schema`."""
+        return json.dumps([self.object_classes, self.tag_values, self.schema])
+
+    def get_meta(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                          (key, json.dumps(value)))
+
+    def is_current(self) -> bool:
+        """Whether the database holds rows made with the same classes and tags."""
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'meta'"
+        ).fetchone()
+        return bool(exists) and self.get_meta("layout") == self.layout
+
+    def _create(self):
+        conn = self.conn
+        for table in ["instances", "tracks", "meta"]:
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute("CREATE TABLE tracks (track_id INTEGER NOT NULL, "
+                     "object_class TEXT NOT NULL)")
+        # No declared type on the coordinates: `int` and `float` are kept as
+        # they were given. `track` is the `rowid` of the track.
+        conn.execute(
+            "CREATE TABLE instances (track INTEGER NOT NULL, "
+            "object_class TEXT NOT NULL, instance_id INTEGER NOT NULL, "
+            f"{', '.join(self.coords)}, frame_id INTEGER NOT NULL"
+            + "".join(f", {c} TEXT" for c in self._tag_columns) + ")"
+        )
+        self.set_meta("layout", self.layout)
+        self.set_meta("position", 0)
+        self.set_meta("saved", 0)
+
+    def _create_indexes(self):
+        # Not unique: renumbering updates many rows in one statement.
+        for name, columns in [("tracks_track", "tracks(track_id)"),
+                              ("instances_track", "instances(track, instance_id)"),
+                              ("instances_frame", "instances(frame_id)"),
+                              ("instances_class", "instances(object_class)")]:
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {columns}")
+
+    def import_table(self, table: CsvTable, chunk_size: int = 50000):
+        """Replace every row with the rows of a parsed Masa CSV.
+
+        As with `DataHandler`, `track_id` are renumbered `0..n-1` in order of
+        first appearance and every instance takes the class of its track. The
+        `rowid` of a track is its `track_id` plus one.
+        """
+        class_codes = table.codes("object_class", self.object_classes,
+                                  "Class of {} is not valid.")
+        coords = [table.numbers(c) for c in self.coords]
+        frame_ids = np.trunc(table.numbers("frame_id")[0]).astype(np.int64)
+        tag_values = [
+            np.array(values, dtype=object)[tag_codes(table, key, values)]
+            for key, values in self.tag_values.items()
+        ]
+
+        track_ids, first = first_appearance_ids(
+            table.numbers("track_id")[0].astype(np.int64)
+        )
+        order = np.argsort(track_ids, kind="stable")
+        bounds = np.searchsorted(track_ids[order], np.arange(len(first) + 1))
+        instance_ids = np.arange(len(table)) - bounds[track_ids[order]]
+        track_classes = np.array(self.object_classes, dtype=object)[class_codes[first]]
+
+        def rows() -> Iterator[tuple]:
+            # Python values for a chunk of rows at a time.
+            for start in range(0, len(table), chunk_size):
+                chunk = order[start:start + chunk_size]
+                yield from zip(
+                    (track_ids[chunk] + 1).tolist(),
+                    track_classes[track_ids[chunk]].tolist(),
+                    instance_ids[start:start + chunk_size].tolist(),
+                    *[python_numbers(values[chunk], is_int[chunk]) for values, is_int in coords],
+                    frame_ids[chunk].tolist(), *[values[chunk].tolist() for values in tag_values],
+                )
+
+        with self.conn:
+            self._create()
+            self.conn.executemany("INSERT INTO tracks (rowid, track_id, object_class) "
+                                  "VALUES (?, ?, ?)",
+                                  ((t_id + 1, t_id, object_class) for t_id, object_class
+                                   in enumerate(track_classes.tolist())))
+            self.conn.executemany(self._insert_sql, rows())
+            self._create_indexes()
+        self._next_uid = None
+
+    # Access ##################################################################
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM instances").fetchone()[0]
+
+    @property
+    def n_tracks(self) -> int:
+        n_tracks = self.conn.execute("SELECT MAX(track_id) + 1 FROM tracks").fetchone()[0]
+        return n_tracks or 0
+
+    def _to_instance(self, row: tuple) -> Instance:
+        return Instance(*row[:8], dict(zip(self.tag_values, row[8:])))
+
+    def instances(self, where: str = "", params: tuple = ()) -> List[Instance]:
+        """`Instance` of the rows matching the SQL `where`, in track order."""
+        return list(self.iter_instances(where, params))
+
+    def iter_instances(self, where: str = "", params: tuple = ()) -> Iterator[Instance]:
+        """As `instances`, one at a time. The store must not be edited before
+        the iterator is exhausted."""
+        return map(self._to_instance, self.conn.execute(
+            f"SELECT {self._columns} FROM instances "
+            f"JOIN tracks ON tracks.rowid = instances.track {where} "
+            "ORDER BY track_id, instance_id", params
+        ))
+
+    def track_class(self, track_id) -> str:
+        row = self.conn.execute("SELECT object_class FROM tracks WHERE track_id = ?",
+                                (track_id,)).fetchone()
+        if row is None:
+            raise KeyError(track_id)
+        return row[0]
+
+    def track_classes(self) -> List[str]:
+        return [row[0] for row in self.conn.execute(
+            "SELECT object_class FROM tracks ORDER BY track_id"
+        )]
+
+    def track_uid(self, track_id) -> int:
+        row = self.conn.execute("SELECT rowid FROM tracks WHERE track_id = ?",
+                                (track_id,)).fetchone()
+        if row is None:
+            raise KeyError(track_id)
+        return row[0]
+
+    def track_id_of(self, uid) -> Optional[int]:
+        row = self.conn.execute("SELECT track_id FROM tracks WHERE rowid = ?",
+                                (uid,)).fetchone()
+        return None if row is None else row[0]
+
+    def _new_uid(self) -> int:
+        # SQLite gives the `rowid` of a deleted last row again.
+        if self._next_uid is None:
+            last = self.conn.execute("SELECT MAX(rowid) FROM tracks").fetchone()[0]
+            self._next_uid = (last or 0) + 1
+        self._next_uid += 1
+        return self._next_uid - 1
+
+    def track_length(self, track_id) -> int:
+        return self._track_length(self.track_uid(track_id))
+
+    def _track_length(self, uid) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM instances WHERE track = ?",
+                                 (uid,)).fetchone()[0]
+
+    def track_frames(self, track_id) -> List[int]:
+        """`frame_id` of the instances of the track, without loading them."""
+        return [row[0] for row in self.conn.execute(
+            "SELECT DISTINCT frame_id FROM instances WHERE track = ?",
+            (self.track_uid(track_id),)
+        )]
+
+    def tracked_object(self, track_id) -> TrackedObject:
+        object_class = self.track_class(track_id)
+        return TrackedObject.from_instances(track_id, object_class,
+                                            self.by_track(track_id))
+
+    # Queries #################################################################
+    def by_frame(self, frame_id) -> List[Instance]:
+        return self.instances("WHERE frame_id = ?", (_py(frame_id),))
+
+    def by_frames(self, start, stop) -> List[Instance]:
+        """Instances of the frames from `start` to `stop` (excluded)."""
+        return self.instances("WHERE frame_id >= ? AND frame_id < ?",
+                              (_py(start), _py(stop)))
+
+    def by_track(self, track_id) -> List[Instance]:
+        return self.instances("WHERE track_id = ?", (_py(track_id),))
+
+    def by_class(self, object_class) -> List[Instance]:
+        return self.instances("WHERE instances.object_class = ?", (object_class,))
+
+    def by_tag(self, key, value) -> List[Instance]:
+        column = self._tag_columns[list(self.tag_values).index(key)]
+        return self.instances(f"WHERE {column} = ?", (value,))
+
+    def frames(self) -> List[int]:
+        return [row[0] for row in self.conn.execute(
+            "SELECT DISTINCT frame_id FROM instances ORDER BY frame_id"
+        )]
+
+    def track_summaries(self) -> List[TrackSummary]:
+        """`TrackSummary` of every track, in order, without loading instances."""
+        return [TrackSummary(*row) for row in self.conn.execute(
+            "SELECT tracks.object_class, COUNT(*), MIN(frame_id), MAX(frame_id) "
+            "FROM tracks JOIN instances ON instances.track = tracks.rowid "
+            "GROUP BY track_id ORDER BY track_id"
+        )]
+
+    # Edits ###################################################################
+    @contextmanager
+    def transaction(self):
+        """Commit the edits made inside at once, or none of them on error."""
+        self._depth += 1
+        try:
+            if self._depth == 1:
+                with self.conn:
+                    yield
+                    self.set_meta("position", self.position + 1)
+            else:
+                yield
+        finally:
+            self._depth -= 1
+
+    def _encode(self, instance: Instance, uid: int) -> tuple:
+        """Row of `instance`, in the track of `rowid` `uid`."""
+        if instance.object_class not in self.object_classes:
+            raise ValueError(f"Class of {instance.object_class} is not valid.")
+        check_tags(instance.tags, self.tag_values)
+        tags = [instance.tags.get(key) for key in self.tag_values]
+
+        return (uid, instance.object_class, _py(instance.instance_id),
+                *[_py(getattr(instance, c)) for c in self.coords],
+                _py(instance.frame_id), *tags)
+
+    def _shift_tracks(self, start, delta):
+        # The rows of the tracks are not touched.
+        self.conn.execute("UPDATE tracks SET track_id = track_id + ? "
+                          "WHERE track_id >= ?", (delta, start))
+
+    def _position(self, track_id, instance_id) -> Tuple[int, int]:
+        """`rowid` of the track and non negative `instance_id`, as indexing the
+        instances of the track."""
+        uid = self.track_uid(track_id)
+        return uid, range(self._track_length(uid))[instance_id]
+
+    def insert_instance(self, instance: Instance):
+        """Insert `instance` in its track, appended if `instance_id` is past the end."""
+        uid = self.track_uid(instance.track_id)
+        length = self._track_length(uid)
+        if instance.instance_id > length or instance.instance_id == -1:
+            instance.instance_id = length
+        with self.transaction():
+            self.conn.execute("UPDATE instances SET instance_id = instance_id + 1 "
+                              "WHERE track = ? AND instance_id >= ?",
+                              (uid, instance.instance_id))
+            self.conn.execute(self._insert_sql, self._encode(instance, uid))
+
+    def insert_track(self, track_id, object_class, instances: List[Instance],
+                     uid: Optional[int] = None):
+        """Insert a track at `track_id`, the following tracks are shifted.
+
+        The track gets a new uid, or `uid`, the one it had before its deletion.
+        """
+        if object_class not in self.object_classes:
+            raise ValueError(f"Class of {object_class} is not valid.")
+        if uid is not None and self.track_id_of(uid) is not None:
+            raise ValueError(f"Track uid {uid} is already in use.")
+        uid = self._new_uid() if uid is None else uid
+        rows = [(*row[:2], instance_id, *row[3:]) for instance_id, row
+                in enumerate(self._encode(instance, uid) for instance in instances)]
+        with self.transaction():
+            self._shift_tracks(track_id, 1)
+            self.conn.execute("INSERT INTO tracks (rowid, track_id, object_class) "
+                              "VALUES (?, ?, ?)", (uid, track_id, object_class))
+            self.conn.executemany(self._insert_sql, rows)
+
+    def delete_track(self, track_id):
+        uid = self.track_uid(track_id)
+        with self.transaction():
+            self.conn.execute("DELETE FROM instances WHERE track = ?", (uid,))
+            self.conn.execute("DELETE FROM tracks WHERE rowid = ?", (uid,))
+            self._shift_tracks(track_id + 1, -1)
+
+    def delete_instance(self, track_id, instance_id) -> bool:
+        """Delete an instance, and its track if it was the last one.
+
+        Returns whether the track got deleted.
+        """
+        uid, pos = self._position(track_id, instance_id)
+        with self.transaction():
+            self.conn.execute("DELETE FROM instances WHERE track = ? AND instance_id = ?",
+                              (uid, pos))
+            self.conn.execute("UPDATE instances SET instance_id = instance_id - 1 "
+                              "WHERE track = ? AND instance_id > ?", (uid, pos))
+            emptied = not self._track_length(uid)
+            if emptied:
+                self.conn.execute("DELETE FROM tracks WHERE rowid = ?", (uid,))
+                self._shift_tracks(track_id + 1, -1)
+
+        return emptied
+
+    def replace(self, instance: Instance):
+        uid, pos = self._position(instance.track_id, instance.instance_id)
+        row = self._encode(instance, uid)
+        with self.transaction():
+            self.conn.execute(
+                f"UPDATE instances SET object_class = ?, {', '.join(f'{c} = ?' for c in self.coords)}, "
+                f"frame_id = ?{''.join(f', {c} = ?' for c in self._tag_columns)} "
+                "WHERE track = ? AND instance_id = ?",
+                (row[1], *row[3:], uid, pos)
+            )
+
+    # Saving ##################################################################
+    @property
+    def position(self) -> int:
+        """Number of transactions committed since the database was created."""
+        return self.get_meta("position", 0)
+
+    def csv_rows(self, scene: str) -> Iterator[tuple]:
+        """Rows of the Masa CSV, without its header.
+
+        They are read from a snapshot of the database taken right away, the
+        returned iterator can be consumed by another thread while the store is
+        edited.
+        """
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        # The read transaction, and so the snapshot, starts with the statement.
+        cursor = conn.execute(
+            f"SELECT track_id, frame_id, {', '.join(self.coords)}, instances.object_class"
+            f"{''.join(f', {c}' for c in self._tag_columns)} "
+            "FROM instances JOIN tracks ON tracks.rowid = instances.track "
+            "ORDER BY track_id, instance_id"
+        )
+
+        def formatted():
+            try:
+                for row in cursor:
+                    yield (*row[:6], scene, *row[6:])
+            finally:
+                conn.close()
+
+        return formatted()
+
+    def close(self):
+        self.conn.close()
+
+
+class _StoreJournal:
+    """`EditJournal` interface over a `SQLiteStore`.
+
+    Edits are committed to the database by `SQLiteStore.transaction`, this
+    only keeps track of which of them the data file has: the `file_stamp` of
+    the data file and the store `position` it was saved at.
+    """
+    # Nothing to encode, see `append`.
+    needs_entries = False
+
+    def __init__(self, store: SQLiteStore, data_file: Path):
+        self.store = store
+        self.data_file = data_file
+
+    def matches(self) -> bool:
+        """Whether the store was made from, or saved into, the data file.
+
+        If not, the data file was changed by something else.
+        """
+        stamp = file_stamp(self.data_file)
+        if self.store.get_meta("stamp") == stamp:
+            return True
+
+        # Crashed after a save replaced the data file.
+        pending = self.store.get_meta("pending")
+        if pending is not None and pending["stamp"] == stamp:
+            self.rebase(pending["position"])
+            return True
+        return False
+
+    def rebase(self, position: int):
+        """The data file now holds the edits up to `position`."""
+        with self.store.conn:
+            self.store.set_meta("stamp", file_stamp(self.data_file))
+            self.store.set_meta("saved", position)
+
+    def mark_saved(self, position: int, new_file: Union[str, Path]):
+        # Called from the writer thread, with its own connection.
+        conn = sqlite3.connect(self.store.path)
+        try:
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (
+                    "pending", json.dumps({"position": position,
+                                           "stamp": file_stamp(new_file)})
+                ))
+        finally:
+            conn.close()
+
+    @property
+    def position(self) -> int:
+        return self.store.position
+
+    def append(self, entry: str):
+        # Already committed by `SQLiteStore.transaction`.
+        pass
+
+    def sync(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __len__(self):
+        """Number of edits not in the data file."""
+        return self.store.position - self.store.get_meta("saved", 0)
+
+
+class SQLiteDataHandler(ColumnarDataHandler):
+    """`DataHandler` backed by a `SQLiteStore`.
+
+    The annotations stay in a SQLite database next to `input_file` (`.#{name}
+    .sqlite`), only the instances asked for are loaded in memory. Every
+    change received by `data_update_sl` is applied in one transaction, so a
+    crash never loses a committed change and the journal of `DataHandler` is
+    not needed. `save` still writes `input_file`. The database is rebuilt
+    from `input_file` when it is missing, when the classes or tags of the
+    meta file changed, or when `input_file` was modified by something else.
+    Use `store` for indexed queries by frame, track, class or tag.
+    """
+    def _read_from_input(self):
+        path = (self.input_file.parent / f".#{self.input_file.name}.sqlite"
+                if self.input_file else ":memory:")
+        self.store = SQLiteStore(path, self.object_classes, self.all_tags)
+        self._store_journal = None
+        if self.input_file:
+            self._store_journal = _StoreJournal(self.store, self.input_file)
+            if self.store.is_current() and self._store_journal.matches():
+                return
+
+        self.store.import_table(self._read_table())
+        if self._store_journal is not None:
+            self._store_journal.rebase(self.store.position)
+
+    def _open_journal(self):
+        self.journal = self._store_journal
+
+    @contextmanager
+    def _batch_transaction(self):
+        # One transaction for the whole batch, none of it is kept on error.
+        try:
+            with self.store.transaction():
+                yield
+        except BaseException:
+            self._batch = _Batch()
+            raise
+
+    def _apply(self, dui):
+        with self.store.transaction():
+            super()._apply(dui)
+
+    @property
+    def tracked_objs(self):
+        return _TrackedObjects(self.store)
+
+    @property
+    def instances(self):
+        return self.store.instances()
+
+    def iter_tracks(self):
+        # One query for every track, rather than one per track.
+        classes = self.store.track_classes()
+        for track_id, instances in groupby(self.store.iter_instances(),
+                                           key=attrgetter("track_id")):
+            yield track_id, classes[track_id], list(instances)
+
+    @property
+    def frames(self):
+        return self.store.frames()
+
+    @property
+    def object_class_mapping(self):
+        obj_cls_map = {obj_cls: [] for obj_cls in self.object_classes}
+        for t_id, object_class in enumerate(self.store.track_classes()):
+            obj_cls_map[object_class].append(t_id)
+
+        return obj_cls_map
+
+    def from_frame(self, frame_id, to: str = None) -> List[Instance]:
+        return self.store.by_frame(frame_id)
+
+    def _snapshot(self):
+        return self.store.csv_rows(self.scene)
+
+    def close(self):
+        super().close()
+        self.store.close()
@@ -1,15 +1,45 @@
-from collections import defaultdict
-from copy import deepcopy
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+from copy import copy, deepcopy
+from dataclasses import replace as replace_fields
+from functools import wraps
 from io import StringIO
+from itertools import islice
+from math import ceil
 from pathlib import Path
-from typing import Union, List, Dict, Tuple
-import csv
+from typing import Union, List, Dict, Iterator, Tuple, Optional
 
+import numpy as np
 import toml
 from PySide2 import QtCore as qtc
 
-from Masa.core.data import TrackedObject, Instance
+from Masa.core.data import TrackedObject, Instance, TrackOrder
+from Masa.core.data.data import Tags
 from Masa.core.utils import SignalPacket, DataUpdateInfo, FrameData, DataInfo
+from .container import (AnnotationContainer, ContainerTable, is_container,
+                        write_container_rows)
+from .history import Delta, EditHistory
+from .interpolation import INTERPOLATED, INTERPOLATED_VALUES, interpolate
+from .journal import EditJournal, encode_change
+from .loader import CsvTable, check_tags, first_appearance_ids, python_numbers, tag_codes
+from .spatial import FrameIndex
+from .writer import CsvWriter, SaveJob, write_csv
+
+
+def cached_view(method):
+    """Read-only property computed once, until `DataHandler._invalidate`."""
+    name = method.__name__
+
+    @wraps(method)
+    def view(self):
+        try:
+            return self._views[name]
+        except KeyError:
+            value = self._views[name] = method(self)
+            return value
+
+    return property(view)
 
 
 class DataHandler(qtc.QObject):
@@ -23,12 +53,42 @@ class DataHandler(qtc.QObject):
     Parameters
     ----------
     input_file
-        Path to the data file.
+        Path to the data file, a CSV or a binary container (`.masa`, see
+        `container.py`).
+    input_str
+        CSV like string, used if there is no `input_file`.
+    backup_file
+        Number of backups of the data file kept by `save`.
+    autosave_step
+        Edits are appended to a journal next to `input_file` as they come
+        (and replayed on load if the application crashed), the journal is
+        `fsync`-ed every `autosave_step` edits. `save` writes them into
+        `input_file` from the `writer` thread.
+
+    Every `add`, `delete`, `replace` and `move` is recorded in `history` as
+    the changes doing and undoing it. `undo` and `redo` apply them through
+    `data_update_sl`, like any other change.
+
+    Inside `batch`, the changes are applied right away but signaled once, as
+    a single `DataUpdateInfo(batch=...)`.
+
+    `instances`, `frames` and `object_class_mapping` are computed once and
+    kept until an edit changes them, they must not be modified.
+    `invalidations` counts how many times each one was dropped.
+
+    `instances_at`, `instances_within`, `instances_iou` and `overlaps` query
+    the boxes of a frame through a `FrameIndex`, built on the first query of
+    the frame and kept up to date by the edits.
     """
     data_updated = qtc.Signal(SignalPacket)
     pass_datainfo = qtc.Signal(SignalPacket)
     curr_frame_data = qtc.Signal(SignalPacket)
-    print_data = qtc.Signal(SignalPacket)
+    change_logged = qtc.Signal(SignalPacket)
+    pass_page = qtc.Signal(SignalPacket)
+    save_failed = qtc.Signal(SignalPacket)
+
+    # Number of `TrackedObject` per page of `page`.
+    page_size = 50
 
     def __init__(self, input_file: Union[str, Path] = None, input_str: str = None,
                  backup_file: int = 3, autosave_step: int = 5):
@@ -44,31 +104,47 @@ class DataHandler(qtc.QObject):
         self.backup_file = backup_file
         self.autosave_step = autosave_step
         self.change_count = 0
+        self._batch: Optional[_Batch] = None
+        # Whether `history` is being played, the tracks added back get their
+        # `uid` back.
+        self._replaying = False
+        # Cached `cached_view`, by name.
+        self._views = {}
+        self.invalidations = Counter()
+        # frame_id -> `FrameIndex` of the frames queried so far.
+        self._spatial: Dict[int, FrameIndex] = {}
         if input_file:
             self.input_file = Path(input_file)
         else:
             self.input_str = input_str
-        self.tracked_objs: Dict[int, TrackedObject] = {}
-
-        if self.input_file:
-            self._repair_csv()
+        self._init_store()
 
         self._read_meta()
         self._read_from_input()
+        self._build_index()
         self._fixed_head = "track_id object_class".split()
-        self._update()
-
-    def _repair_csv(self):
-        """Temporary fix for broken csv."""
-        with self.input_file.open("r") as f:
-            header = f.readline().strip().split(",")
-            if header[0] == "frame_id" and header[1] == "track_id":
-                header[0] = "track_id"
-                header[1] = "frame_id"
-            data = f.read()
-        with self.input_file.open("w") as f:
-            f.write(f"{','.join(header)}\n{data}")
 
+        self.history = EditHistory()
+        self.journal: EditJournal = None
+        if self.input_file:
+            with self.history.paused():
+                self._open_journal()
+        self.writer = CsvWriter()
+        self.writer.saved.connect(self._saved_sl)
+        self.writer.save_failed.connect(self._save_failed_sl)
+
+    def _init_store(self):
+        # `track_id` are positions in `tracked_objs`, kept `0..n-1` without
+        # renumbering anything, `TrackedObject.uid` are stable ids.
+        self.tracked_objs = TrackOrder()
+        # frame_id -> instances on that frame, and the sorted frame ids.
+        # `Instance` are referenced directly so renumbering `track_id` or
+        # `instance_id` does not touch the index.
+        self._frame_index: Dict[int, List[Instance]] = {}
+        self._frames: List[int] = []
+
+    def _build_index(self):
+        self._index_instances(self.instances)
 
     def _read_meta(self):
         if not self.input_meta.exists():
@@ -84,70 +160,76 @@ class DataHandler(qtc.QObject):
         for key in meta:
             if key not in [obj_cls_key, scene_key]:
                 self.all_tags[key] = meta[key]
+        # Always saved, the generated instances are known after a reload.
+        self.all_tags.setdefault(INTERPOLATED, list(INTERPOLATED_VALUES))
+
+    def _read_table(self) -> Union[CsvTable, ContainerTable]:
+        if self.input_file and is_container(self.input_file):
+            return AnnotationContainer(self.input_file).table()
+        if self.input_file:
+            return CsvTable.from_file(self.input_file)
+        return CsvTable.from_str(self.input_str)
 
     def _read_from_input(self):
-        """Read data from CSV."""
-        to_number = ["x1", "x2", "y1", "y2", "frame_id"]
-        try:
-            if self.input_file:
-                f_csv = self.input_file.open(mode="r")
-            else:
-                f_csv = StringIO(self.input_str)
-
-            csv_reader = csv.DictReader(f_csv)
-            line_count = 0
-            for instance in csv_reader:
-                new_instance: dict = {}
-                track_id = int(instance.pop("track_id"))
-                object_class = instance.pop("object_class")  # TEMP: Repair this
-                if object_class not in self.object_classes:
-                    raise ValueError(f"Class of {object_class} is not valid.")
-                for key in to_number:
-                    if key == "frame_id":
-                        new_instance[key] = int(float(instance.pop("frame_id")))
-                    else:
-                        # the numbers could be of type `int` of `float`
-                        try:
-                            val = instance.pop(key)
-                            new_instance[key] = int(val)
-                        except ValueError:
-                            try:
-                                new_instance[key] = float(val)
-                            except ValueError as v:
-                                raise v(f"Cannot convert data of key {key}"
-                                        "to `int` of `float`.")
-
-                # XXX: Forcing the tags...
-                tags = {}
-                for key in self.all_tags:
-                    val = instance[key]
-                    if val in self.all_tags[key]:
-                        tags[key] = val
-                    else:
-                        raise ValueError(f"Problem with tags of key: {key}, val: {val}")
-                new_instance["tags"] = tags
-
-                # for tag, val in instance.items():
-                #     tags[tag] = val
-                # new_instance["tags"] = tags
-                
-                if self.tracked_objs.get(track_id) is None:
-                    # TODO: Should we use the internal methods?
-                    self.tracked_objs[track_id] = TrackedObject(
-                        track_id=track_id, object_class=object_class,
-                        instance=new_instance)
-                else:
-                    self.tracked_objs[track_id].add_instance(new_instance, update=False)
-
-            # For possibly performance purpose
-            for tracked_obj in self.tracked_objs.values():
-                tracked_obj._update()
-        finally:
-            if self.input_file:
-                f_csv.close()
+        """Read data from CSV, column by column."""
+        table = self._read_table()
+        track_ids, _ = table.numbers("track_id")
+        class_codes = table.codes("object_class", self.object_classes,
+                                  "Class of {} is not valid.")
+        coords = [python_numbers(*table.numbers(key)) for key in ["x1", "y1", "x2", "y2"]]
+        frame_ids, _ = table.numbers("frame_id")
+        frame_ids = np.trunc(frame_ids).astype(np.int64).tolist()
+
+        # XXX: Forcing the tags...
+        tag_values = []
+        for key, values in self.all_tags.items():
+            codes = tag_codes(table, key, values)
+            tag_values.append(np.array(values, dtype=object)[codes])
+        tags = Tags.many(self.all_tags, zip(*tag_values) if tag_values
+                         else [()] * len(table))
+
+        # Group the rows per track, in order of first appearance.
+        track_ids, first = first_appearance_ids(track_ids.astype(np.int64))
+        order = np.argsort(track_ids, kind="stable")
+        bounds = np.searchsorted(track_ids[order], np.arange(len(first) + 1))
+        instance_ids = np.empty(len(table), dtype=np.int64)
+        instance_ids[order] = np.arange(len(table)) - bounds[track_ids[order]]
+        # Every instance takes the class of its `TrackedObject`.
+        object_classes = np.array(self.object_classes, dtype=object)[
+            class_codes[first][track_ids]
+        ]
+
+        instances = list(map(Instance, track_ids.tolist(), object_classes.tolist(),
+                             instance_ids.tolist(), *coords, frame_ids, tags))
+        instances = [instances[i] for i in order.tolist()]
+        self.tracked_objs = TrackOrder(
+            TrackedObject.from_instances(t_id, instances[start].object_class,
+                                         instances[start:stop])
+            for t_id, (start, stop) in enumerate(zip(bounds[:-1].tolist(),
+                                                     bounds[1:].tolist()))
+        )
 
     def __getitem__(self, index):
-        return list(self.tracked_objs.values())[index]
+        return self.tracked_objs.tracks[index]
+
+    def iter_tracks(self) -> Iterator[Tuple[int, str, List[Instance]]]:
+        """`(track_id, object_class, instances)` of every track, in order.
+
+        For the views built once from the whole data, without building every
+        `TrackedObject` of the backends that do not keep them.
+        """
+        for tobj in self.tracked_objs.values():
+            yield tobj.track_id, tobj.object_class, tobj[:]
+
+    def track_uid(self, track_id: int) -> int:
+        """Key of the track at `track_id`, kept while tracks are added or
+        deleted before it. A track deleted and added back gets a new one."""
+        return self.tracked_objs[track_id].uid
+
+    def track_id_of(self, uid: int) -> Optional[int]:
+        """Current `track_id` of the track keyed `uid`, `None` if deleted."""
+        tobj = self.tracked_objs.by_uid.get(uid)
+        return None if tobj is None else tobj.track_id
 
     def get_instance_sl(self, packet: SignalPacket):
         d = packet.data
@@ -161,26 +243,57 @@ class DataHandler(qtc.QObject):
         self._iter_idx = None
         return self
 
-    @property
+    @cached_view
     def instances(self):
         return [instance
                 for t_obj in self[:] 
                 for instance in t_obj[:]]
 
-    @property
+    @cached_view
     def frames(self):
-        frames = set()
-        for tobj in self.tracked_objs.values():
-            for instance in tobj:
-                frames.add(instance.frame_id)
-        return sorted(list(frames))
+        return list(self._frames)
+
+    def _invalidate(self, *names: str):
+        """Drop the cached views `names`, an edit changed them."""
+        for name in names:
+            if self._views.pop(name, None) is not None:
+                self.invalidations[name] += 1
+
+    def _index_instances(self, instances: List[Instance]):
+        for instance in instances:
+            indexed = self._frame_index.get(instance.frame_id)
+            if indexed is None:
+                indexed = self._frame_index[instance.frame_id] = []
+                insort(self._frames, instance.frame_id)
+                self._invalidate("frames")
+            indexed.append(instance)
+            spatial = self._spatial.get(instance.frame_id)
+            if spatial is not None:
+                spatial.add(instance)
+
+    def _unindex_instances(self, instances: List[Instance]):
+        for instance in instances:
+            indexed = self._frame_index[instance.frame_id]
+            # By identity, `Instance` equality compares every field.
+            for i, indexed_instance in enumerate(indexed):
+                if indexed_instance is instance:
+                    del indexed[i]
+                    break
+            spatial = self._spatial.get(instance.frame_id)
+            if spatial is not None:
+                spatial.remove(instance)
+
+            if not indexed:
+                del self._frame_index[instance.frame_id]
+                del self._frames[bisect_left(self._frames, instance.frame_id)]
+                self._invalidate("frames")
 
     @property
     def object_classes(self):
         return self.all_object_classes
         # return list(set(t_obj.object_class for t_obj in self.tracked_objs.values()))
 
-    @property
+    @cached_view
     def object_class_mapping(self):
         # obj_cls_map = defaultdict(list)
         obj_cls_map = {obj_cls: [] for obj_cls in self.object_classes}
@@ -202,58 +315,160 @@ class DataHandler(qtc.QObject):
         # return {tag: list(vals) for tag, vals in tags.items()}
 
     def from_frame(self, frame_id, to: str = None) -> List[Instance]:
-        ret = []
-        for tobj in self.tracked_objs.values():
-            ins = []
-            for instance in tobj:
-                if instance.frame_id == frame_id:
-                    ins.append(instance)
-            if ins:
-                ret.extend(ins)
-
-        return ret
+        return sorted(self._frame_index.get(frame_id, ()),
+                      key=lambda ins: (ins.track_id, ins.instance_id))
+
+    # Spatial queries #########################################################
+    def spatial_index(self, frame_id) -> FrameIndex:
+        spatial = self._spatial.get(frame_id)
+        if spatial is None:
+            spatial = self._spatial[frame_id] = FrameIndex(self.from_frame(frame_id))
+        return spatial
+
+    def instances_at(self, frame_id, x, y) -> List[Instance]:
+        """Instances of the frame whose box contains the point `(x, y)`."""
+        return self.spatial_index(frame_id).at(x, y)
+
+    def instances_within(self, frame_id, x1, y1, x2, y2) -> List[Instance]:
+        """Instances of the frame whose box intersects the rectangle."""
+        return self.spatial_index(frame_id).within(x1, y1, x2, y2)
+
+    def instances_iou(self, frame_id, x1, y1, x2, y2, min_iou: float = 0.5
+                      ) -> List[Tuple[Instance, float]]:
+        """`(instance, iou)` of the instances of the frame with an IoU of at
+        least `min_iou` with the box."""
+        return self.spatial_index(frame_id).iou(x1, y1, x2, y2, min_iou)
+
+    def overlaps(self, frame_id, min_iou: float = 0.5
+                 ) -> List[Tuple[Instance, Instance, float]]:
+        """Pairs of instances of the frame with an IoU of at least `min_iou`,
+        e.g. the same object annotated twice."""
+        return self.spatial_index(frame_id).overlaps(min_iou)
+
+    def _open_journal(self):
+        """Replay the edits a crash left out of `input_file`."""
+        self.journal = EditJournal(
+            self.input_file.parent / f".#{self.input_file.name}.journal",
+            self.input_file, sync_step=self.autosave_step
+        )
+        for dui in self.journal.replay():
+            self._apply(dui)
 
     def data_update_sl(self, packet: SignalPacket):
         dui: DataUpdateInfo = packet.data
+        if dui.batch:
+            with self.batch():
+                for change in dui.batch:
+                    self.data_update_sl(SignalPacket(sender=packet.sender, data=change))
+            return
 
-        # We just consider for an Instance object to
-        # other Instance or new TrackedObject
-        if dui.added:
-            self.add(dui.added)
+        if isinstance(dui.replaced, dict):
+            dui = dui._replace(replaced=self._replacement(dui.replaced))
+        # Encoded before `_apply`, which might change `dui` objects.
+        journaled = self.journal is not None and self.journal.needs_entries
+        entry = encode_change(dui) if journaled and any(dui) else None
+        self._apply(dui)
 
-        elif dui.deleted:
-            pos: Tuple[int, int] = dui.deleted
-            self.delete(*pos) # TODO: How to delete object??
-        elif dui.replaced:
-            self.replace(dui.replaced)
-        elif dui.moved:
-            self.move(*dui.moved)
-            
+        self.change_count += 1
+        if entry is not None:
+            self.journal.append(entry)
 
-        self._update()
+        if self._batch is not None:
+            self._batch.received.append(dui)
+            self._batch.sender = packet.sender
+        else:
+            self._propagate_change(packet.sender, dui)
+
+    def _propagate_change(self, sender: List[str], dui: DataUpdateInfo):
         try:
             # Assuming every data added and deleted is through this function,
             # this will make sure our viewport is also updated.
             framedata = FrameData(self.curr_frame, self.curr_index, self.from_frame(self.curr_index))
             self.curr_frame_data.emit(
-                SignalPacket(sender=[*packet.sender, self.__class__.__name__],
+                SignalPacket(sender=[*sender, self.__class__.__name__],
                              data=framedata)
             )
-        except NameError:
+        except (NameError, AttributeError):
             # Haven't even started the buffer yet...
             pass
-        # TODO: This determines autosave feature.
-        #       However, only valid on change based on slot. Make it better.
 
-        self.change_count += 1
-        if self.change_count >= self.autosave_step:
-            self.save()
-            self.change_count = 0
-
-        self.print_data.emit(
-            SignalPacket(sender=[self.__class__.__name__], data=self.__str__())
+        self.change_logged.emit(
+            SignalPacket(sender=[self.__class__.__name__],
+                         data=self.describe_change(dui))
         )
 
+    @contextmanager
+    def batch(self):
+        """Apply many changes as one.
+
+        The changes made inside are applied as they come, but `data_updated`
+        is emitted once on exit with a `DataUpdateInfo(batch=...)` of all of
+        them, in order (or the change itself if there is only one), followed
+        by one `curr_frame_data` and one `change_logged` for those received by
+        `data_update_sl`. They are one command of `history`. Nested batches
+        are part of the outer one.
+
+        For example, to delete a range of tracks::
+
+            with data_handler.batch():
+                for _ in range(10):
+                    data_handler.delete(0)
+        """
+        if self._batch is not None:
+            yield self
+            return
+
+        self._batch = _Batch()
+        try:
+            with self._batch_transaction():
+                yield self
+        finally:
+            batch, self._batch = self._batch, None
+            if batch.forward:
+                self.history.record(batch.forward,
+                                    [d for inverse in batch.inverses[::-1] for d in inverse])
+            if batch.updated:
+                self.data_updated.emit(
+                    SignalPacket(sender=self.__class__.__name__,
+                                 data=_batched(batch.updated))
+                )
+            if batch.received:
+                self._propagate_change(batch.sender, _batched(batch.received))
+
+    def _batch_transaction(self):
+        return nullcontext()
+
+    def _record(self, forward: List[Delta], inverse: List[Delta]):
+        if self._batch is not None:
+            self._batch.forward.extend(forward)
+            self._batch.inverses.append(inverse)
+        else:
+            self.history.record(forward, inverse)
+
+    def _emit_update(self, dui: DataUpdateInfo):
+        if self._batch is not None:
+            # Read once the batch is over, the ids must not follow the
+            # changes made after this one.
+            self._batch.updated.append(DataUpdateInfo(*map(_frozen, dui)))
+        else:
+            self.data_updated.emit(
+                SignalPacket(sender=self.__class__.__name__, data=dui)
+            )
+
+    def _apply(self, dui: DataUpdateInfo):
+        # We just consider for an Instance object to
+        # other Instance or new TrackedObject
+        if dui.added:
+            self.add(dui.added)
+
+        elif dui.deleted:
+            pos: Tuple[int, int] = dui.deleted
+            self.delete(*pos) # TODO: How to delete object??
+        elif dui.replaced:
+            self.replace(dui.replaced)
+        elif dui.moved:
+            self.move(*dui.moved)
+
     def run_sresults_sl(self, curr_sresults: SignalPacket):
         """Receive result from current index of session.
 
@@ -333,35 +548,63 @@ class DataHandler(qtc.QObject):
         return di
         
 
+    @staticmethod
+    def _tag_keyframes(obj: Union[Instance, TrackedObject]):
+        """Tag the instances added without `INTERPOLATED` as keyframes, as they
+        are read back once saved."""
+        is_tobj = isinstance(obj, TrackedObject)
+        for instance in obj[:] if is_tobj else [obj]:
+            if instance.tags.get(INTERPOLATED) is None:
+                instance.tags[INTERPOLATED] = "false"
+                if is_tobj:
+                    obj._update_tags(instance)
+
+    def _check_tags(self, obj: Union[Instance, TrackedObject]):
+        """Raise on tags the meta file does not declare, they could not be
+        saved."""
+        for instance in obj[:] if isinstance(obj, TrackedObject) else [obj]:
+            check_tags(instance.tags, self.all_tags)
+
     def add(self, data: Union[TrackedObject, Instance, List[Instance]]):
         """Add data.
 
         The passed data should already have `track_id` and `object_id` set
         beforehand.
         """
-        if (isinstance(data, TrackedObject) and len(data) == 1):
-                self._add_tobj(data)
+        if isinstance(data, (TrackedObject, Instance)):
+            self._check_tags(data)
+            self._tag_keyframes(data)
+        if isinstance(data, TrackedObject) and len(data) > 0:
+            self._add_tobj(data)
+            pos = (data.track_id, None)
 
         elif isinstance(data, Instance):
             self._add_instance(data)
+            pos = (data.track_id, data.instance_id)
 
         else:
             raise ValueError(f"Data of type {type(data)} "
                              f"with len of {len(data)}is not supported.")
 
         dui = DataUpdateInfo(added=data)
-        self.data_updated.emit(
-            SignalPacket(sender=self.__class__.__name__, data=dui)
-        )
+        # Redoing it adds the track back with the same `uid`.
+        uid = self.track_uid(pos[0]) if pos[1] is None else None
+        self._record([Delta(dui, pos, uid=uid)], [Delta(DataUpdateInfo(deleted=pos))])
+        self._emit_update(dui)
 
         return self
 
     def move(self, old_pos, obj: Union[TrackedObject, Instance]):
+        self._check_tags(obj)
+        tobj, moved = self._at(*old_pos)
+        uid = self.track_uid(old_pos[0])
+        target = self._position(obj)
         prev_len = len(self)
         self._delete_instance(*old_pos)
+        emptied = prev_len == len(self) + 1
 
         # TODO: There must be a better way...
-        if old_pos[0] <= obj.track_id and prev_len == len(self) + 1:
+        if old_pos[0] <= obj.track_id and emptied:
             try:
                 obj.change_track_id(obj.track_id - 1)
             except AttributeError:
@@ -373,39 +616,112 @@ class DataHandler(qtc.QObject):
             self._add_instance(obj)
 
         dui = DataUpdateInfo(moved=(old_pos, obj))
-        self.data_updated.emit(
-            SignalPacket(sender=self.__class__.__name__, data=dui)
+        self._record(
+            [Delta(dui, target)],
+            [Delta(DataUpdateInfo(deleted=self._position(obj))),
+             self._restoring(old_pos, tobj, moved, emptied, uid)]
         )
+        self._emit_update(dui)
+
+    @staticmethod
+    def _tobj_lines(tobj: TrackedObject) -> List[str]:
+        lines = [f"\tTrackedObject ({tobj.track_id}, {tobj.object_class})"]
+        for ins in tobj[:]:
+            tags = ", ".join(f"{key}: {value}" for key, value in ins.tags.items())
+            lines.append(f"\t\tInstance {ins.instance_id}:  ({tags})")
+
+        return lines
 
     def __str__(self):
-        ret = f"DataHandler {str(self.input_file)}\n"
-        for tobj in self:
-            ret += f"\tTrackedObject ({tobj.track_id}, {tobj.object_class})\n"
-            for ins in tobj:
-                ret += f"\t\tInstance {ins.instance_id}:  "
-                tags = ""
-                for key, value in ins.tags.items():
-                    tags += f"{key}: {value}, "
-                ret += f"({tags.strip()[:-1]})\n"
-
-        return ret.strip()
+        lines = [f"DataHandler {str(self.input_file)}"]
+        for tobj in self.tracked_objs.values():
+            lines.extend(self._tobj_lines(tobj))
+
+        return "\n".join(lines)
+
+    @property
+    def n_pages(self) -> int:
+        return max(ceil(len(self) / self.page_size), 1)
+
+    def page(self, page: int) -> str:
+        """`__str__` restricted to the `page`-th `page_size` tracks."""
+        start = page * self.page_size
+        lines = []
+        for tobj in islice(self.tracked_objs.values(), start, start + self.page_size):
+            lines.extend(self._tobj_lines(tobj))
+
+        return "\n".join(lines)
+
+    def get_page_sl(self, packet: SignalPacket):
+        page = min(max(packet.data, 0), self.n_pages - 1)
+        self.pass_page.emit(
+            SignalPacket(sender=[*packet.sender, self.__class__.__name__],
+                         data=(page, self.n_pages, self.page(page)))
+        )
+
+    @staticmethod
+    def _describe_position(obj: Union[TrackedObject, Instance, dict]) -> str:
+        if isinstance(obj, TrackedObject):
+            return (f"TrackedObject ({obj.track_id}, {obj.object_class}) "
+                    f"of {len(obj)} instance(s)")
+        if isinstance(obj, dict):
+            # Only the changed fields, see `replace`.
+            changes = {key: value for key, value in obj.items()
+                       if key not in ("track_id", "instance_id")}
+            return f"Instance ({obj['track_id']}, {obj['instance_id']}) {changes}"
+        return (f"Instance ({obj.track_id}, {obj.instance_id}) frame {obj.frame_id} "
+                f"[{obj.x1}, {obj.y1}, {obj.x2}, {obj.y2}]")
+
+    def describe_change(self, dui: DataUpdateInfo) -> str:
+        """One line summary of a `DataUpdateInfo`."""
+        if dui.added:
+            return f"added {self._describe_position(dui.added)}"
+        elif dui.deleted:
+            track_id, instance_id = dui.deleted
+            if instance_id is None:
+                return f"deleted TrackedObject {track_id}"
+            return f"deleted Instance ({track_id}, {instance_id})"
+        elif dui.replaced:
+            return f"replaced {self._describe_position(dui.replaced)}"
+        elif dui.moved:
+            old_pos, obj = dui.moved
+            return f"moved ({old_pos[0]}, {old_pos[1]}) to {self._describe_position(obj)}"
+        elif dui.batch:
+            kinds = Counter(kind for change in dui.batch
+                            for kind in DataUpdateInfo._fields if getattr(change, kind))
+            return (f"{len(dui.batch)} changes: "
+                    + ", ".join(f"{n} {kind}" for kind, n in kinds.items()))
+
+        return "no change"
         
     def replace(self, instance: Union[Instance, dict]):
+        """Replace the instance at the position of `instance`.
+
+        `instance` can also be a `dict` of `track_id`, `instance_id` and the
+        fields to change.
+        """
         if isinstance(instance, dict):
-            pos = ["track_id", "instance_id"]
-            t_id, ins_id = instance[pos[0]], instance[pos[1]]
-            new = deepcopy(self[t_id][ins_id])
-            for key in instance:
-                if key not in pos:
-                    setattr(new, key, instance[key])
-            instance = new
+            instance = self._replacement(instance)
+        self._check_tags(instance)
+        pos = self._position(instance)
+        _, old = self._at(*pos)
 
         self._replace(instance)
 
         dui = DataUpdateInfo(replaced=instance)
-        self.data_updated.emit(
-            SignalPacket(sender=self.__class__.__name__, data=dui)
-        )
+        self._record([Delta(dui, pos)],
+                            [Delta(DataUpdateInfo(replaced=old), pos)])
+        self._emit_update(dui)
+
+    def _replacement(self, changes: dict) -> Instance:
+        """The instance at `changes["track_id"]`, `changes["instance_id"]`
+        with the other fields of `changes`."""
+        changes = dict(changes)
+        pos = (changes.pop("track_id"), changes.pop("instance_id"))
+        _, old = self._at(*pos)
+        # Only `tags` is mutable, the other fields can be shared.
+        changes.setdefault("tags", old.tags.copy())
+        return replace_fields(old, **changes)
 
     def _replace(self, instance):
         self._replace_instance(instance)
@@ -422,147 +738,290 @@ class DataHandler(qtc.QObject):
         # The `append`, `insert` and how it is updated is handled by the
         # `TrackedObject` class.
         self.tracked_objs[instance.track_id].add_instance(instance)
+        self._index_instances([instance])
+        self._invalidate("instances")
 
     def _add_tobj(self, tobj):
-        if len(tobj) != 1:
-            raise Exception("Only can instantiated a `TrackedObject` with an `Instance`.")
-
         if tobj.track_id > len(self):
             tobj.change_track_id(len(self))
-        if tobj.track_id == len(self):
-            self._append_tobj(tobj)
-        else:
-            self._insert_tobj(tobj)
-
-    def _append_tobj(self, tobj):
-        self.tracked_objs[tobj.track_id] = tobj
-
-    def _insert_tobj(self, tobj):
-        old_tobjs = self.tracked_objs
-        keep_keys = list(range(tobj.track_id))
-        keep_tobjs = {k: old_tobjs[k] for k in keep_keys}
-
-        self.tracked_objs = keep_tobjs
-        self.tracked_objs[tobj.track_id] = tobj
-        self.tracked_objs.update(
-            {k + 1: old_tobjs[k].change_track_id(k + 1)
-             for k in range(tobj.track_id, len(old_tobjs))}
-        )
-        
+        # The following tracks are shifted, without touching them.
+        self.tracked_objs.insert(tobj.track_id, tobj, self._restored_uid(tobj))
+        self._index_instances(tobj[:])
+        self._invalidate("instances", "object_class_mapping")
 
     def delete(self, tobj_idx: int, instance_idx: int = None):
+        tobj, deleted = self._at(tobj_idx, instance_idx)
+        uid = self.track_uid(tobj_idx)
+        prev_len = len(self)
         self._delete(tobj_idx, instance_idx)
 
         dui = DataUpdateInfo(deleted=(tobj_idx, instance_idx))
-        self.data_updated.emit(
-            SignalPacket(sender=self.__class__.__name__, data=dui)
+        self._record(
+            [Delta(dui)],
+            [self._restoring((tobj_idx, instance_idx), tobj, deleted,
+                             prev_len == len(self) + 1, uid)]
         )
+        self._emit_update(dui)
 
         return self
 
     def _delete(self, tobj_idx: int, instance_idx: int = None):
         if not isinstance(instance_idx, int):
-            if tobj_idx == len(self):
-                self._delete_tobj_end(tobj_idx)
-            else:
-                self._delete_tobj(tobj_idx)
+            self._delete_tobj(tobj_idx)
         else:
             self._delete_instance(tobj_idx, instance_idx)
         
 
-    def _delete_tobj_end(self, tobj_idx: int):
-            try:
-                del self.tracked_objs[tobj_idx]
-            except KeyError:
-                raise ValueError(f"`tobj_idx`={tobj_idx} does not exist")
-
-    def _delete_tobj(self, tobj_idx: int, update=True):
-            try:
-                del self.tracked_objs[tobj_idx]
-            except KeyError:
-                raise ValueError(f"`tobj_idx`={tobj_idx} does not exist")
-
-            if update:
-                self._update(keep_until=tobj_idx - 1)
+    def _delete_tobj(self, tobj_idx: int):
+        try:
+            tobj = self.tracked_objs.pop(tobj_idx)
+        except KeyError:
+            raise ValueError(f"`tobj_idx`={tobj_idx} does not exist")
+        self._unindex_instances(tobj[:])
+        self._invalidate("instances", "object_class_mapping")
 
     def _delete_instance(self, tobj_idx: int, instance_idx: int, update=True):
             try:
+                instance = self.tracked_objs[tobj_idx][instance_idx]
                 self.tracked_objs[tobj_idx].delete(instance_idx, update)
             except KeyError:
                 raise ValueError(f"`tobj_idx`={tobj_idx} does not exist")
             except IndexError:
                 raise ValueError(f"`instance_idx`={instance_idx} does not exist")
+            self._unindex_instances([instance])
+            self._invalidate("instances")
             if update:
                 if len(self.tracked_objs[tobj_idx]) == 0:
                     self._delete(tobj_idx)
         
-    def _update(self, keep_until=None):
-        """Make sure `self.tracked_objs` is always sorted with no missed number.
+    def _at(self, tobj_idx: int, instance_idx: int = None
+            ) -> Tuple[TrackedObject, Union[TrackedObject, Instance]]:
+        """The track at `tobj_idx`, and the track or instance at the position."""
+        try:
+            tobj = self[tobj_idx]
+            return tobj, tobj if instance_idx is None else tobj[instance_idx]
+        except (KeyError, IndexError):
+            raise ValueError(f"({tobj_idx}, {instance_idx}) does not exist")
 
-        Can be only used with `*delete` method.
+    @staticmethod
+    def _position(obj: Union[TrackedObject, Instance]) -> Tuple[int, int]:
+        if isinstance(obj, TrackedObject):
+            return obj.track_id, None
+        return obj.track_id, obj.instance_id
+
+    @staticmethod
+    def _restoring(pos: Tuple[int, int], tobj: TrackedObject,
+                   deleted: Union[TrackedObject, Instance], emptied: bool,
+                   uid: int) -> Delta:
+        """Change adding back `deleted`, deleted from `pos` of `tobj`.
+
+        `tobj` is added back too if deleting an `Instance` `emptied` it, with
+        `uid`, the `track_uid` it had.
         """
-        # TODO: Make it better. And how about put it inside *insert method?
-        old_tobjs = self.tracked_objs
-        old_keys = list(old_tobjs.keys())
-        if isinstance(keep_until, int):
-            # TODO: Ensure the index until `keep_until` is also sorted
-            keep_keys = list(range(keep_until + 1))
-            keep_tobjs = {k: old_tobjs[k] for k in keep_keys}
-            old_tobjs = {k: old_tobjs[k] for k in list(old_tobjs.keys())
-                         if k not in keep_tobjs}
-            sort_ok = False
-        else:
-            keep_until = -1
-            keep_tobjs = {}
-            sort_ok = all(old_keys[i] == old_keys[i + 1] for i in range(len(old_keys) - 1))
-
-        if not sort_ok:
-            self.tracked_objs = {}
-            self.tracked_objs.update(keep_tobjs)
-            for new_k, tobj in enumerate(old_tobjs.values(), keep_until + 1):
-                self.tracked_objs[new_k] = tobj.change_track_id(new_k)
-
-    def save(self, manual_call=False):
-        # Backup file. ########################################################
-        for i in range(self.backup_file - 1, 0, -1):
-            b_file = self.input_file.parent / f".#{self.input_file.name}{i - 1}"
-            if b_file.exists():
-                # TODO: Make a better logic.
-                old_b_file = self.input_file.parent / f".#{self.input_file.name}{i}"
-                if old_b_file.exists():
-                    old_b_file.unlink()
-                b_file.rename(self.input_file.parent / f".#{self.input_file.name}{i}")
-        i = 0
-        (self.input_file.parent / f".#{self.input_file.name}{i}").write_text(
-            self.input_file.read_text()
+        if emptied and isinstance(deleted, Instance):
+            return Delta(DataUpdateInfo(added=tobj), (pos[0], None), [deleted], uid)
+        if isinstance(deleted, TrackedObject):
+            return Delta(DataUpdateInfo(added=deleted), pos, uid=uid)
+        return Delta(DataUpdateInfo(added=deleted), pos)
+
+    def _restored_uid(self, tobj: TrackedObject) -> Optional[int]:
+        """`uid` to give back to `tobj`, added while playing `history`."""
+        if self._replaying and tobj.uid is not None and self.track_id_of(tobj.uid) is None:
+            return tobj.uid
+        return None
+
+    def interpolate(self, track_ids: Optional[List[int]] = None,
+                    method: str = "linear") -> int:
+        """Fill the frames between the keyframes of tracks with boxes.
+
+        Keyframes are the instances not tagged `INTERPOLATED` `"true"`, the
+        other ones are generated again: after moving a keyframe, interpolating its track
+        updates them. The boxes of all the tracks are computed at once (see
+        `interpolation.interpolate`), then the interpolated instances of every
+        track that changed are replaced through `data_update_sl`, as one
+        batch. The tracks themselves are kept, with their `uid`.
+
+        `INTERPOLATED` is a tag of every data (see `_read_meta`), saved with
+        the other ones.
+
+        Parameters
+        ----------
+        track_ids
+            Tracks to interpolate, all of them by default.
+        method
+            `"linear"` or `"cubic"`.
+
+        Returns
+        -------
+        int
+            Number of interpolated instances of the tracks.
+        """
+        if track_ids is None:
+            track_ids = range(len(self))
+        tracks = [self[t_id] for t_id in track_ids]
+        keyframes = [sorted((ins for ins in tobj if ins.tags.get(INTERPOLATED) != "true"),
+                            key=lambda ins: ins.frame_id) for tobj in tracks]
+        flat = [ins for track_keyframes in keyframes for ins in track_keyframes]
+        rows, frame_ids, boxes, sources = interpolate(
+            np.repeat(np.arange(len(tracks)), list(map(len, keyframes))),
+            [ins.frame_id for ins in flat],
+            [(ins.x1, ins.y1, ins.x2, ins.y2) for ins in flat],
+            method
         )
+        bounds = np.searchsorted(rows, np.arange(len(tracks) + 1)).tolist()
+        frame_ids, boxes, sources = frame_ids.tolist(), boxes.tolist(), sources.tolist()
+
+        # Tags of the boxes interpolated from each keyframe.
+        tags_of = {}
+        for source in set(sources):
+            tags_of[source] = flat[source].tags.copy()
+            tags_of[source][INTERPOLATED] = "true"
+
+        changes = []
+        for i, tobj in enumerate(tracks):
+            if not keyframes[i] or (bounds[i] == bounds[i + 1]
+                                    and len(keyframes[i]) == len(tobj)):
+                continue
+            instances = []
+            for ins in keyframes[i]:
+                instances.append(replace_fields(ins, tags=ins.tags.copy()))
+                # Every instance of a track has the same tags.
+                instances[-1].tags[INTERPOLATED] = "false"
+            for j in range(bounds[i], bounds[i + 1]):
+                instances.append(Instance(tobj.track_id, tobj.object_class, 0,
+                                          *boxes[j], frame_ids[j],
+                                          tags_of[sources[j]].copy()))
+            instances.sort(key=lambda ins: ins.frame_id)
+            for instance_id, instance in enumerate(instances):
+                instance.instance_id = instance_id
+            if instances == tobj[:]:
+                # Generated again as they were.
+                continue
+
+            # The instances are changed in place, the track keeps its `uid`:
+            # the interpolated ones are deleted, from the last one, the
+            # keyframes left are put in order and the new ones are inserted.
+            for ins in tobj[::-1]:
+                if ins.tags.get(INTERPOLATED) == "true":
+                    changes.append(DataUpdateInfo(deleted=(tobj.track_id, ins.instance_id)))
+            left = [ins for ins in tobj if ins.tags.get(INTERPOLATED) != "true"]
+            ordered = [ins for ins in instances if ins.tags[INTERPOLATED] == "false"]
+            for slot, (old, new) in enumerate(zip(left, ordered)):
+                new = replace_fields(new, instance_id=slot, tags=new.tags.copy())
+                if replace_fields(old, instance_id=slot) != new:
+                    changes.append(DataUpdateInfo(replaced=new))
+            for instance in instances:
+                if instance.tags[INTERPOLATED] == "true":
+                    changes.append(DataUpdateInfo(added=instance))
+
+        if changes:
+            self.data_update_sl(SignalPacket(sender=["interpolate"],
+                                             data=DataUpdateInfo(batch=changes)))
+
+        return len(frame_ids)
+
+    def undo(self) -> bool:
+        """Undo the last edit, returns whether there was one."""
+        command = self.history.undo()
+        if command is not None:
+            self._play(command.inverse)
+        return command is not None
+
+    def redo(self) -> bool:
+        """Redo the last undone edit, returns whether there was one."""
+        command = self.history.redo()
+        if command is not None:
+            self._play(command.forward)
+        return command is not None
+
+    def _play(self, deltas: List[Delta]):
+        # Journaled and signaled as any change, but not recorded again.
+        self._replaying = True
+        try:
+            with self.history.paused(), self.batch():
+                for delta in deltas:
+                    self.data_update_sl(
+                        SignalPacket(sender=[EditHistory.__name__], data=delta.place())
+                    )
+        finally:
+            self._replaying = False
 
-        # Write current data. #################################################
-        self.input_file.write_text(self._data_as_text())
+    def save(self, manual_call=False, block=False):
+        """Write the data into `input_file` from the `writer` thread.
+
+        A snapshot of the data is taken right away, edits made while it is
+        being written stay in the journal. `block` waits for the file to be
+        written.
+        """
+        position = self.journal.position if self.journal is not None else 0
+        job = SaveJob(self.input_file, self._csv_header(), self._snapshot(),
+                      self.backup_file, self.journal, position)
+        if is_container(self.input_file):
+            job = job._replace(write=write_container_rows, binary=True)
+        self.writer.submit(job)
 
         if manual_call:
             # Reset the autosave count if this function is called remotely
             # (manually called).
             self.change_count = 0
-        print("Saved (maybe automatically).")
+        if block:
+            self.writer.flush()
+            self._saved_sl()
 
+    def _saved_sl(self, packet: SignalPacket = None):
+        if not self.writer.done:
+            # Already handled by `save(block=True)`.
+            return
+        while self.writer.done:
+            job = self.writer.done.popleft()
+            if job.journal is not None:
+                job.journal.rebase(job.position)
+        print("Saved.")
+
+    def _save_failed_sl(self, packet: SignalPacket):
+        print(f"Saving failed: {packet.data}")
+        self.save_failed.emit(
+            SignalPacket(sender=[*packet.sender, self.__class__.__name__],
+                         data=packet.data)
+        )
 
-    def _data_as_text(self):
-        header = [
-        "track_id", "frame_id", "x1", "y1", "x2", "y2", "scene",
-        "object_class", *list(self.all_tags.keys())
-        ]
+    def close(self):
+        """Save the journaled edits, if any, and stop the writer."""
+        if self.journal is not None and len(self.journal):
+            self.save(manual_call=True, block=True)
+        self.writer.stop()
+        if self.journal is not None:
+            self.journal.close()
 
-        data = ",".join(header) + "\n"
-        for tobj in self:
-            for ins in tobj:
-                tags = ",".join([ins.tags[tag] for tag in self.all_tags.keys()])
-                data += (f"{ins.track_id},{ins.frame_id},"
-                         f"{ins.x1},{ins.y1},{ins.x2},"
-                         f"{ins.y2},{self.scene},{ins.object_class},{tags}"
-                         "\n")
+    def _csv_header(self) -> List[str]:
+        return ["track_id", "frame_id", "x1", "y1", "x2", "y2", "scene",
+                "object_class", *self.all_tags]
 
-        return data[:-1]
+    def _snapshot(self) -> Iterator[tuple]:
+        """Rows of the data file, left untouched by later edits.
+
+        Only the instances of every track are listed right away, the rows are
+        made as they are read (by the writer thread). Edits replace instances
+        rather than changing them, and `track_id` is read now.
+        """
+        tracks = [(tobj.track_id, tuple(tobj.instances))
+                  for tobj in self.tracked_objs.tracks]
+        tags = list(self.all_tags)
+        scene = self.scene
+
+        def rows():
+            # An empty value for a missing tag, as `ColumnarStore.csv_rows`.
+            for track_id, instances in tracks:
+                for ins in instances:
+                    yield (track_id, ins.frame_id, ins.x1, ins.y1, ins.x2, ins.y2,
+                           scene, ins.object_class, *[ins.tags.get(tag) for tag in tags])
+
+        return rows()
+
+    def _data_as_text(self):
+        f = StringIO()
+        write_csv(f, self._csv_header(), self._snapshot())
+        return f.getvalue()
 
     def propogate_curr_frame_data_sl(self, packet: SignalPacket):
         # TODO: check the best way to pass  ndarray
@@ -571,3 +1030,37 @@ class DataHandler(qtc.QObject):
         self.curr_frame_data.emit(
             SignalPacket(sender=self.__class__.__name__, data=framedata)
         )
+
+
+def _frozen(value):
+    """Detached copy of a `TrackedObject` or `Instance`, keeping its ids."""
+    if isinstance(value, TrackedObject) and len(value):
+        # As `deepcopy`, sharing what is immutable, much faster for long tracks.
+        frozen = TrackedObject.from_instances(value.track_id, value.object_class,
+                                              list(map(copy, value)))
+        frozen._tag_keys = value._tag_keys
+        return frozen
+    if isinstance(value, TrackedObject):
+        return deepcopy(value)
+    if isinstance(value, Instance):
+        return copy(value)
+    if isinstance(value, tuple):
+        return tuple(map(_frozen, value))
+    return value
+
+
+def _batched(changes: List[DataUpdateInfo]) -> DataUpdateInfo:
+    return changes[0] if len(changes) == 1 else DataUpdateInfo(batch=changes)
+
+
+class _Batch:
+    """Changes of `DataHandler.batch` not signaled or recorded yet."""
+    def __init__(self):
+        # Emitted by `data_updated`.
+        self.updated: List[DataUpdateInfo] = []
+        # Received by `data_update_sl`, and from whom.
+        self.received: List[DataUpdateInfo] = []
+        self.sender: List[str] = []
+        # Deltas of the `history` command, the inverses of every change.
+        self.forward: List[Delta] = []
+        self.inverses: List[List[Delta]] = []
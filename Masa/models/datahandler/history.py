@@ -0,0 +1,143 @@
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, List, NamedTuple, Optional, Tuple, Union
+import sys
+
+from Masa.core.data import TrackedObject, Instance
+from Masa.core.utils import DataUpdateInfo
+
+
+class Delta(NamedTuple):
+    """One change, applied as `DataHandler.data_update_sl` applies `dui`.
+
+    The added, replaced or moved object of `dui` is put at `position` first:
+    objects are referenced, not copied, and their ids might have changed
+    since. An added `TrackedObject` is given back its `instances`, if any,
+    as they are deleted from it when it gets emptied, and its `uid`, if any,
+    which the data handler gives it back.
+    """
+    dui: DataUpdateInfo
+    position: Optional[Tuple[int, Optional[int]]] = None
+    instances: Optional[List[Instance]] = None
+    uid: Optional[int] = None
+
+    def place(self) -> DataUpdateInfo:
+        if self.dui.moved:
+            obj = self.dui.moved[1]
+        elif self.dui.added is not None:
+            obj = self.dui.added
+        else:
+            obj = self.dui.replaced
+        if self.instances is not None:
+            obj.instances.clear()
+            for instance in self.instances:
+                obj.add_instance(instance)
+        if obj is not None and self.position is not None:
+            if isinstance(obj, TrackedObject):
+                obj.change_track_id(self.position[0])
+            else:
+                obj.track_id, obj.instance_id = self.position
+        if self.uid is not None:
+            obj.uid = self.uid
+        return self.dui
+
+
+class Command(NamedTuple):
+    """An edit: the deltas doing it and the ones undoing it."""
+    forward: List[Delta]
+    inverse: List[Delta]
+    nbytes: int
+
+
+def _obj_nbytes(obj: Union[TrackedObject, Instance, tuple, None]) -> int:
+    if isinstance(obj, TrackedObject):
+        return (sys.getsizeof(obj) + sys.getsizeof(obj.instances)
+                + sum(map(sys.getsizeof, obj.instances)))
+    if isinstance(obj, Instance):
+        return sys.getsizeof(obj)
+    return 0
+
+
+def command_nbytes(deltas: List[Delta]) -> int:
+    """Memory kept alive by `deltas`, roughly (shared tags are not counted)."""
+    return sum(sys.getsizeof(delta) + _obj_nbytes(delta.dui.added)
+               + _obj_nbytes(delta.dui.replaced)
+               + sum(map(_obj_nbytes, delta.instances or ())) for delta in deltas)
+
+
+class EditHistory:
+    """Undo and redo stacks of `Command`.
+
+    The oldest commands are dropped once there are more than `max_count`
+    of them or they take more than `max_bytes`. A new command clears the
+    redo stack.
+
+    Parameters
+    ----------
+    max_count
+        Maximum number of commands kept, undo and redo stacks together.
+    max_bytes
+        Maximum memory kept alive by the commands, see `command_nbytes`.
+    """
+    def __init__(self, max_count: int = 1000, max_bytes: int = 64 * 2 ** 20):
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self._undo: Deque[Command] = deque()
+        self._redo: List[Command] = []
+        self.nbytes = 0
+        self.recording = True
+
+    @contextmanager
+    def paused(self):
+        """Do not record the edits made inside, e.g. while undoing."""
+        recording, self.recording = self.recording, False
+        try:
+            yield
+        finally:
+            self.recording = recording
+
+    def record(self, forward: List[Delta], inverse: List[Delta]):
+        if not self.recording:
+            return
+        for command in self._redo:
+            self.nbytes -= command.nbytes
+        self._redo.clear()
+
+        command = Command(forward, inverse, command_nbytes(forward + inverse))
+        self._undo.append(command)
+        self.nbytes += command.nbytes
+        while self._undo and (len(self._undo) > self.max_count
+                              or self.nbytes > self.max_bytes):
+            self.nbytes -= self._undo.popleft().nbytes
+
+    @property
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    @property
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    def undo(self) -> Optional[Command]:
+        """Command to undo, moved to the redo stack."""
+        if not self._undo:
+            return None
+        command = self._undo.pop()
+        self._redo.append(command)
+        return command
+
+    def redo(self) -> Optional[Command]:
+        """Command to redo, moved back to the undo stack."""
+        if not self._redo:
+            return None
+        command = self._redo.pop()
+        self._undo.append(command)
+        return command
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+        self.nbytes = 0
+
+    def __len__(self):
+        return len(self._undo)
@@ -0,0 +1,96 @@
+"""Boxes of the frames between keyframes, for every track at once.
+
+Keyframes of all the tracks are passed as flat arrays, sorted by track and
+frame. Every gap between two consecutive keyframes of a track is filled in
+one NumPy pass, without any Python loop over the tracks or the frames.
+"""
+from typing import Tuple
+
+import numpy as np
+
+
+# Tag of the instances, `"true"` for the generated ones, the other ones are
+# keyframes. Every data has it, see `DataHandler._read_meta`.
+INTERPOLATED = "interpolated"
+INTERPOLATED_VALUES = ["false", "true"]
+METHODS = ("linear", "cubic")
+
+
+def _secants(frame_ids: np.ndarray, boxes: np.ndarray, a: np.ndarray,
+             b: np.ndarray) -> np.ndarray:
+    span = (frame_ids[b] - frame_ids[a]).astype(np.float64)[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(span > 0, (boxes[b] - boxes[a]) / span, np.nan)
+
+
+def _tangents(track_ids: np.ndarray, frame_ids: np.ndarray,
+              boxes: np.ndarray) -> np.ndarray:
+    """Per frame slope of the boxes at each keyframe.
+
+    Harmonic mean of the slopes towards the previous and next keyframes of the
+    same track, zero at a local extremum so that the curve does not overshoot
+    the keyframes (as `PCHIP`). One-sided at the ends of a track.
+    """
+    n = len(track_ids)
+    idx = np.arange(n)
+    prev = np.where((idx > 0) & (track_ids == np.roll(track_ids, 1)), idx - 1, idx)
+    next_ = np.where((idx < n - 1) & (track_ids == np.roll(track_ids, -1)), idx + 1, idx)
+    before = _secants(frame_ids, boxes, prev, idx)
+    after = _secants(frame_ids, boxes, idx, next_)
+    before = np.where(np.isnan(before), after, before)
+    after = np.where(np.isnan(after), before, after)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slopes = 2 * before * after / (before + after)
+    return np.where(before * after > 0, slopes, 0.0)
+
+
+def interpolate(track_ids: np.ndarray, frame_ids: np.ndarray, boxes: np.ndarray,
+                method: str = "linear"
+                ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Boxes of every frame strictly between consecutive keyframes.
+
+    Parameters
+    ----------
+    track_ids, frame_ids
+        `(n,)` keyframes, sorted by `track_id` then `frame_id`.
+    boxes
+        `(n, 4)` `(x1, y1, x2, y2)` of the keyframes.
+    method
+        `"linear"`, or `"cubic"` for a monotone cubic Hermite spline going
+        through the keyframes, smoother for tracks with many keyframes.
+
+    Returns
+    -------
+    track_ids, frame_ids, boxes
+        The interpolated boxes, in the same order as the keyframes.
+    sources
+        Row of the keyframe before each interpolated box.
+    """
+    if method not in METHODS:
+        raise ValueError(f"`method` must be one of {METHODS}, got {method!r}")
+    track_ids = np.asarray(track_ids, dtype=np.int64)
+    frame_ids = np.asarray(frame_ids, dtype=np.int64)
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+
+    # Segments between a keyframe and the next one of the same track.
+    gaps = np.diff(frame_ids)
+    segments = np.flatnonzero((np.diff(track_ids) == 0) & (gaps > 1))
+    counts = gaps[segments] - 1
+    sources = np.repeat(segments, counts)
+    steps = np.arange(len(sources)) - np.repeat(np.cumsum(counts) - counts, counts) + 1
+    lengths = gaps[sources].astype(np.float64)
+    t = (steps / lengths)[:, None]
+
+    start, end = boxes[sources], boxes[sources + 1]
+    if method == "linear":
+        out = start + (end - start) * t
+    else:
+        # Slopes scaled to the length of the segment.
+        slopes = _tangents(track_ids, frame_ids, boxes)
+        m0 = slopes[sources] * lengths[:, None]
+        m1 = slopes[sources + 1] * lengths[:, None]
+        t2, t3 = t * t, t * t * t
+        out = ((2 * t3 - 3 * t2 + 1) * start + (t3 - 2 * t2 + t) * m0
+               + (-2 * t3 + 3 * t2) * end + (t3 - t2) * m1)
+
+    return track_ids[sources], frame_ids[sources] + steps, out, sources
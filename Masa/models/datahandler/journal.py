@@ -0,0 +1,225 @@
+from dataclasses import fields
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+import json
+import os
+import threading
+
+from Masa.core.data import TrackedObject, Instance
+from Masa.core.utils import DataUpdateInfo
+
+
+INSTANCE_FIELDS = [f.name for f in fields(Instance)]
+
+
+def instance_to_dict(instance: Instance) -> dict:
+    ret = {key: getattr(instance, key) for key in INSTANCE_FIELDS}
+    ret["tags"] = dict(instance.tags)
+    return ret
+
+
+def obj_to_dict(obj: Union[Instance, TrackedObject]) -> dict:
+    if isinstance(obj, TrackedObject):
+        return {"track_id": obj.track_id, "object_class": obj.object_class,
+                "instances": [instance_to_dict(ins) for ins in obj]}
+    return instance_to_dict(obj)
+
+
+def obj_from_dict(data: dict) -> Union[Instance, TrackedObject]:
+    if "instances" not in data:
+        return Instance(**data)
+
+    instances = [Instance(**ins) for ins in data["instances"]]
+    tobj = TrackedObject(data["track_id"], data["object_class"], instances[0])
+    for instance in instances[1:]:
+        tobj.add_instance(instance)
+    return tobj
+
+
+def encode_change(dui: DataUpdateInfo) -> str:
+    """One JSON line describing `dui`."""
+    if dui.added:
+        entry = {"added": obj_to_dict(dui.added)}
+    elif dui.deleted:
+        entry = {"deleted": list(dui.deleted)}
+    elif dui.replaced:
+        entry = {"replaced": obj_to_dict(dui.replaced)}
+    elif dui.moved:
+        entry = {"moved": [list(dui.moved[0]), obj_to_dict(dui.moved[1])]}
+    else:
+        raise ValueError(f"Nothing to journal in {dui}")
+
+    return json.dumps(entry, separators=(",", ":"))
+
+
+def decode_change(line: str) -> DataUpdateInfo:
+    entry = json.loads(line)
+    if "added" in entry:
+        return DataUpdateInfo(added=obj_from_dict(entry["added"]))
+    if "deleted" in entry:
+        return DataUpdateInfo(deleted=tuple(entry["deleted"]))
+    if "replaced" in entry:
+        return DataUpdateInfo(replaced=obj_from_dict(entry["replaced"]))
+    old_pos, obj = entry["moved"]
+    return DataUpdateInfo(moved=(tuple(old_pos), obj_from_dict(obj)))
+
+
+def file_stamp(path: Union[str, Path]) -> dict:
+    """Identify a version of a file by its size and modification time."""
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+class EditJournal:
+    """Append-only log of the edits made since the data file was written.
+
+    Every edit is appended as one JSON line, so recording it costs the size of
+    the edit instead of the size of the dataset. The first line identifies
+    the data file (`file_stamp`) the edits apply to: after a crash, `replay`
+    returns the unsaved edits, and a journal left behind by an older data file
+    is ignored.
+
+    A save writes the edits up to `position` into a new data file. Before that
+    file replaces the old one, `mark_saved` appends a line with its stamp, so
+    whichever of the two files survives a crash, the journal knows which edits
+    it misses. `rebase` then drops the saved edits. Positions count every edit
+    ever appended, so they stay valid across rebases. Writes are locked as
+    the marker comes from the writer thread.
+
+    Parameters
+    ----------
+    path
+        Path to the journal.
+    data_file
+        The file the edits apply to.
+    sync_step
+        The journal is `fsync`-ed every `sync_step` edits, it is flushed to
+        the OS after every edit.
+    """
+    # Whether `append` needs the edits encoded by `encode_change`.
+    needs_entries = True
+
+    def __init__(self, path: Union[str, Path], data_file: Union[str, Path],
+                 sync_step: int = 5):
+        self.path = Path(path)
+        self.data_file = Path(data_file)
+        self.sync_step = sync_step
+        self.n_edits = 0
+        # Edits dropped by `rebase` and `reset`.
+        self.n_dropped = 0
+        self._unsynced = 0
+        self._f = None
+        self._lock = threading.Lock()
+
+    def _read(self) -> Tuple[Optional[dict], List[str], List[dict]]:
+        """Header, entries and save markers of the journal."""
+        header, entries, markers = None, [], []
+        if not self.path.exists():
+            return header, entries, markers
+
+        with self.path.open("r") as f:
+            try:
+                header = json.loads(f.readline())
+            except ValueError:
+                return header, entries, markers
+            for line in f:
+                # A crash might have cut the last line.
+                if not line.endswith("\n"):
+                    break
+                if line.startswith('{"saved"'):
+                    markers.append(json.loads(line))
+                else:
+                    entries.append(line)
+
+        return header, entries, markers
+
+    def _rewrite(self, entries: List[str], markers: List[dict] = ()):
+        """Atomically replace the journal, stamped with the current data file."""
+        self.close()
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with tmp_path.open("w") as f:
+            f.write(json.dumps(file_stamp(self.data_file)) + "\n")
+            f.writelines(entries)
+            f.writelines(json.dumps(m, separators=(",", ":")) + "\n" for m in markers)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+        self._f = self.path.open("a")
+        self.n_edits = len(entries)
+        self._unsynced = 0
+
+    def replay(self) -> List[DataUpdateInfo]:
+        """Edits not yet in the data file, then keep appending to the journal."""
+        with self._lock:
+            header, entries, markers = self._read()
+            stamp = file_stamp(self.data_file)
+            if header == stamp:
+                pending = entries
+            else:
+                # Crashed after a save replaced the data file.
+                saved = [m["saved"] for m in markers
+                         if {k: m[k] for k in stamp} == stamp]
+                pending = entries[saved[-1]:] if saved else []
+            self._rewrite(pending)
+
+        return [decode_change(line) for line in pending]
+
+    def append(self, entry: str):
+        """Append an entry made by `encode_change`."""
+        with self._lock:
+            if self._f is None:
+                self._rewrite([])
+            self._f.write(entry + "\n")
+            self._f.flush()
+            self.n_edits += 1
+            self._unsynced += 1
+            if self._unsynced >= self.sync_step:
+                self._sync()
+
+    def _sync(self):
+        if self._f is not None:
+            os.fsync(self._f.fileno())
+        self._unsynced = 0
+
+    def sync(self):
+        with self._lock:
+            self._sync()
+
+    @property
+    def position(self) -> int:
+        return self.n_dropped + self.n_edits
+
+    def mark_saved(self, position: int, new_file: Union[str, Path]):
+        """Record that `new_file` holds the edits up to `position`."""
+        with self._lock:
+            if self._f is None:
+                return
+            marker = {"saved": position - self.n_dropped, **file_stamp(new_file)}
+            self._f.write(json.dumps(marker, separators=(",", ":")) + "\n")
+            self._f.flush()
+            self._sync()
+
+    def rebase(self, position: int):
+        """Drop the edits up to `position`, now in the data file."""
+        with self._lock:
+            saved = position - self.n_dropped
+            _, entries, markers = self._read()
+            markers = [{**m, "saved": m["saved"] - saved} for m in markers
+                       if m["saved"] > saved]
+            self._rewrite(entries[saved:], markers)
+            self.n_dropped = position
+
+    def reset(self):
+        """Start an empty journal for the current data file."""
+        with self._lock:
+            self.n_dropped += self.n_edits
+            self._rewrite([])
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+    def __len__(self):
+        return self.n_edits
@@ -0,0 +1,266 @@
+from io import StringIO
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+import csv
+
+import numpy as np
+
+from .interpolation import INTERPOLATED
+
+
+COMMA, NEWLINE, DOT, MINUS, PLUS, ZERO = map(ord, ",\n.-+0")
+# Digits a float64 holds exactly, beyond it `CsvTable.numbers` lets NumPy parse.
+MAX_DIGITS = 15
+
+
+class CsvTable:
+    """Columns of a Masa CSV, parsed in one vectorised pass.
+
+    The bytes are split on their separators with NumPy and every column is
+    kept as a fixed width bytes array. Files NumPy cannot split (quoted
+    fields, ragged rows) go through `csv.reader` instead. Old files with
+    `frame_id` and `track_id` swapped in the header are read as if it was
+    fixed, the file itself is left untouched.
+
+    Parameters
+    ----------
+    data
+        Content of the CSV, header included.
+    """
+    def __init__(self, data: bytes):
+        data = data.replace(b"\r\n", b"\n").lstrip(b"\n")
+        header, _, body = data.partition(b"\n")
+        self.header = header.decode().strip().split(",")
+        if self.header[:2] == ["frame_id", "track_id"]:
+            self.header[:2] = ["track_id", "frame_id"]
+
+        # Blank lines are skipped, as `csv.DictReader` does.
+        if body.startswith(b"\n") or b"\n\n" in body:
+            body = b"\n".join(line for line in body.split(b"\n") if line)
+        if body and not body.endswith(b"\n"):
+            body += b"\n"
+
+        # Columns are cut out of `_fields` when first asked for.
+        self.columns: Dict[str, np.ndarray] = {}
+        self._fields = self._split(body, len(self.header))
+        if self._fields is None:
+            self.columns = dict(zip(self.header, self._split_slow(body, len(self.header))))
+            self.n_rows = len(self.columns[self.header[0]])
+        else:
+            self.n_rows = len(self._fields[1])
+
+    @classmethod
+    def from_file(cls, path: Union[str, Path]) -> "CsvTable":
+        return cls(Path(path).read_bytes())
+
+    @classmethod
+    def from_str(cls, text: str) -> "CsvTable":
+        return cls(text.encode())
+
+    @staticmethod
+    def _split(body: bytes, n_cols: int) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Windows over the bytes, and the start and length of every field."""
+        if b'"' in body:
+            return None
+
+        buf = np.frombuffer(body, dtype=np.uint8)
+        ends = np.flatnonzero((buf == COMMA) | (buf == NEWLINE))
+        if len(ends) % n_cols:
+            return None
+        kinds = buf[ends].reshape(-1, n_cols)
+        if (kinds[:, -1] != NEWLINE).any() or (kinds[:, :-1] != COMMA).any():
+            return None
+
+        starts = np.empty_like(ends)
+        starts[:1] = 0
+        starts[1:] = ends[:-1] + 1
+        starts = starts.reshape(-1, n_cols)
+        lengths = ends.reshape(-1, n_cols) - starts
+
+        # Every field as a window of `max_width` bytes starting on it.
+        max_width = max(int(lengths.max()), 1) if len(lengths) else 1
+        padded = np.concatenate([buf, np.zeros(max_width, dtype=np.uint8)])
+        windows = np.lib.stride_tricks.as_strided(
+            padded, shape=(len(buf), max_width), strides=(1, 1), writeable=False
+        )
+        return windows, starts, lengths
+
+    def column(self, key) -> np.ndarray:
+        """Fixed width bytes of every value of `key`."""
+        if not self.n_rows:
+            # Even without header, as an empty file.
+            return np.empty(0, dtype="S1")
+        if key not in self.columns:
+            windows, starts, lengths = self._fields
+            j = self.header.index(key)
+            start, length = starts[:, j], lengths[:, j]
+            width = max(int(length.max()), 1) if len(length) else 1
+            chars = windows[start, :width]
+            chars[np.arange(width) >= length[:, None]] = 0
+            self.columns[key] = chars.view(f"S{width}").ravel()
+
+        return self.columns[key]
+
+    @staticmethod
+    def _split_slow(body: bytes, n_cols: int) -> List[np.ndarray]:
+        records = list(csv.reader(StringIO(body.decode())))
+        columns = zip(*records) if records else [()] * n_cols
+        return [np.char.encode(np.array(col, dtype=str)) if col else
+                np.empty(0, dtype="S1") for col in columns]
+
+    def __len__(self):
+        return self.n_rows
+
+    def text(self, key) -> np.ndarray:
+        return np.char.decode(self.column(key))
+
+    @staticmethod
+    def _factorize(column: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Unique values of `column` and the index of every row in them.
+
+        Rows are hashed to integers, much faster to sort than bytes.
+        """
+        n, width = len(column), column.dtype.itemsize
+        n_words = -(-width // 8)
+        chars = np.zeros((n, n_words * 8), dtype=np.uint8)
+        chars[:, :width] = column.view(np.uint8).reshape(n, width)
+        words = chars.view(np.uint64)
+        hashes = words[:, 0].copy()
+        for i in range(1, n_words):
+            hashes = hashes * np.uint64(1000003) ^ words[:, i]
+
+        _, first, inverse = np.unique(hashes, return_index=True, return_inverse=True)
+        uniques = column[first]
+        if (uniques[inverse] != column).any():
+            # Collision.
+            return np.unique(column, return_inverse=True)
+        return uniques, inverse
+
+    def factorized(self, key) -> Tuple[List[str], np.ndarray]:
+        """Distinct values of `key` and the index of every row in them."""
+        uniques, inverse = self._factorize(self.column(key))
+        return [value.decode() for value in uniques.tolist()], inverse
+
+    def codes(self, key, valid: Sequence[str], error: str) -> np.ndarray:
+        """Index of every value in `valid`.
+
+        Raise `ValueError(error.format(value))` on the first invalid value.
+        """
+        return recode(*self.factorized(key), valid, error)
+
+    def numbers(self, key) -> Tuple[np.ndarray, np.ndarray]:
+        """Values of a numerical column and whether each was written as `int`.
+
+        Plain decimals are parsed from the bytes as an integer mantissa
+        divided by a power of ten, which gives the same `float` as Python.
+        Anything else (exponents, spaces, `nan`) is left to NumPy.
+        """
+        column = self.column(key)
+        parsed = self._parse_decimals(column)
+        if parsed is not None:
+            return parsed
+
+        stripped = np.char.strip(column)
+        values = stripped.astype(np.float64)
+        is_int = np.char.isdigit(np.char.lstrip(stripped, b"+-"))
+        return values, is_int
+
+    @staticmethod
+    def _parse_decimals(column: np.ndarray) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        n, width = len(column), column.dtype.itemsize
+        chars = column.view(np.uint8).reshape(n, width)
+        negative = chars[:, 0] == MINUS
+        signed = negative | (chars[:, 0] == PLUS)
+
+        # Horner's scheme over the characters, every row at once.
+        mantissa = np.zeros(n, dtype=np.int64)
+        n_digits = np.zeros(n, dtype=np.int64)
+        n_frac = np.zeros(n, dtype=np.int64)
+        n_dots = np.zeros(n, dtype=np.int64)
+        for k in range(width):
+            char = chars[:, k]
+            digit = char - np.uint8(ZERO)
+            is_digit = digit <= 9
+            is_dot = char == DOT
+            known = is_digit | is_dot | (char == 0)
+            if k == 0:
+                known |= signed
+            if not known.all():
+                return None
+
+            mantissa = np.where(is_digit, mantissa * 10 + digit, mantissa)
+            n_digits += is_digit
+            n_frac += is_digit & (n_dots > 0)
+            n_dots += is_dot
+
+        if n and not ((n_dots <= 1).all() and (n_digits > 0).all()
+                      and (n_digits <= MAX_DIGITS).all()):
+            return None
+
+        values = mantissa / 10.0 ** n_frac
+        values[negative] *= -1
+        return values, n_dots == 0
+
+
+def recode(uniques: Sequence[str], inverse: np.ndarray, valid: Sequence[str],
+           error: str) -> np.ndarray:
+    """Index in `valid` of `uniques[inverse]`, see `CsvTable.codes`."""
+    lut = np.empty(len(uniques), dtype=np.int64)
+    valid = {value: i for i, value in enumerate(valid)}
+    for i, value in enumerate(uniques):
+        if value not in valid:
+            raise ValueError(error.format(value))
+        lut[i] = valid[value]
+
+    return lut[inverse]
+
+
+def tag_codes(table, key, valid: Sequence[str]) -> np.ndarray:
+    """`codes` of the tag `key` in a `CsvTable` or `ContainerTable`.
+
+    Files written before `INTERPOLATED` was always saved have no such column,
+    and instances added without it are saved with an empty value: both are
+    keyframes.
+    """
+    error = f"Problem with tags of key: {key}, val: {{}}"
+    if key != INTERPOLATED:
+        return table.codes(key, valid, error)
+    if key not in table.header:
+        return np.full(len(table), valid.index("false"), dtype=np.int64)
+    uniques, inverse = table.factorized(key)
+    return recode([value or "false" for value in uniques], inverse, valid, error)
+
+
+def check_tags(tags: Dict[str, Optional[str]], valid: Dict[str, Sequence[str]]):
+    """Raise if `tags` has a key or a value the meta file does not declare.
+
+    A `None` value of a declared key is an unset tag.
+    """
+    for key, value in tags.items():
+        if key not in valid:
+            raise ValueError(f"Problem with tags of key: {key}, not in the meta file")
+        if value is not None and value not in valid[key]:
+            raise ValueError(f"Problem with tags of key: {key}, val: {value}")
+
+
+def python_numbers(values: np.ndarray, is_int: np.ndarray) -> list:
+    """`int` or `float` values as they were written."""
+    if is_int.all():
+        return values.astype(np.int64).tolist()
+    if not is_int.any():
+        return values.tolist()
+    return np.where(is_int, values.astype(np.int64).astype(object),
+                    values.astype(object)).tolist()
+
+
+def first_appearance_ids(track_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Renumber `track_ids` `0..n-1` in order of first appearance.
+
+    Returns the new id of every row and the row where each track appears first.
+    """
+    uniques, first, inverse = np.unique(track_ids, return_index=True,
+                                        return_inverse=True)
+    rank = np.empty(len(uniques), dtype=np.int64)
+    rank[np.argsort(first, kind="stable")] = np.arange(len(uniques))
+
+    return rank[inverse], np.sort(first)
@@ -0,0 +1,61 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from Masa.core.data import Instance
+from Masa.core.utils import GridIndex
+from Masa.core.utils.spatial_index import auto_cell_size
+
+
+def _by_position(instances: List[Instance]) -> List[Instance]:
+    return sorted(instances, key=lambda ins: (ins.track_id, ins.instance_id))
+
+
+class FrameIndex:
+    """`GridIndex` of the instances of one frame.
+
+    Instances are indexed by identity, not by `track_id` and `instance_id`:
+    those change when other instances are added or deleted. The cell size is
+    derived from the boxes of the frame when it is built.
+    """
+    def __init__(self, instances: List[Instance]):
+        boxes = np.array([(ins.x1, ins.y1, ins.x2, ins.y2) for ins in instances],
+                         dtype=np.float64).reshape(-1, 4)
+        self.grid = GridIndex(auto_cell_size(boxes))
+        self._instances: Dict[int, Instance] = {}
+        for instance in instances:
+            self.add(instance)
+
+    def add(self, instance: Instance):
+        self._instances[id(instance)] = instance
+        self.grid.insert(id(instance), instance.x1, instance.y1,
+                         instance.x2, instance.y2)
+
+    def remove(self, instance: Instance):
+        self.grid.remove(id(instance))
+        del self._instances[id(instance)]
+
+    def at(self, x, y) -> List[Instance]:
+        return _by_position([self._instances[key]
+                             for key in self.grid.query_point(x, y)])
+
+    def within(self, x1, y1, x2, y2) -> List[Instance]:
+        return _by_position([self._instances[key]
+                             for key in self.grid.query_rect(x1, y1, x2, y2)])
+
+    def iou(self, x1, y1, x2, y2, min_iou: float) -> List[Tuple[Instance, float]]:
+        ret = [(self._instances[key], overlap)
+               for key, overlap in self.grid.query_iou(x1, y1, x2, y2, min_iou)]
+        return sorted(ret, key=lambda r: (r[0].track_id, r[0].instance_id))
+
+    def overlaps(self, min_iou: float) -> List[Tuple[Instance, Instance, float]]:
+        ret = []
+        for key, other, overlap in self.grid.overlaps(min_iou):
+            pair = _by_position([self._instances[key], self._instances[other]])
+            ret.append((*pair, overlap))
+
+        return sorted(ret, key=lambda r: (r[0].track_id, r[0].instance_id,
+                                          r[1].track_id, r[1].instance_id))
+
+    def __len__(self):
+        return len(self.grid)
@@ -0,0 +1,202 @@
+from collections import OrderedDict, defaultdict
+from typing import Dict, List
+
+from Masa.core.data import Instance
+from Masa.core.utils import SignalPacket
+from .database import SQLiteDataHandler, TrackSummary
+from .datahandler import cached_view
+
+
+def _first_row(instances: List[Instance], track_id: int, lo: int = 0) -> int:
+    """Position of the first of `instances`, sorted by track, of the track
+    `track_id` or a following one."""
+    hi = len(instances)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if instances[mid].track_id < track_id:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+class WindowedDataHandler(SQLiteDataHandler):
+    """`SQLiteDataHandler` keeping only the frames around the buffer in memory.
+
+    Frames are loaded by pages of `page_size` frames. When the buffer index
+    moves (`propogate_curr_frame_data_sl`), the pages within `before` and
+    `after` frames of it are loaded and the other ones evicted. `from_frame`
+    outside of the window loads the page too, up to `max_pages` pages kept.
+    The rest of the data is only known by `track_summaries`, `frames` and
+    `object_class_mapping`, or read in a single pass by `iter_tracks` for the
+    views built once from every track.
+
+    Edits are committed to the database as they come, like with
+    `SQLiteDataHandler`: a page never holds unsaved changes. The loaded pages
+    are patched rather than read again: replacing an instance reads its frames
+    again, adding or deleting an instance reads the rows of its track in the
+    loaded pages (only its `instance_id` are renumbered) and adding or
+    deleting a track shifts the `track_id` of the following ones.
+
+    Parameters
+    ----------
+    before, after
+        Number of frames kept before and after the buffer index.
+    page_size
+        Number of frames per page.
+    max_pages
+        Number of pages kept, at least the pages of the window.
+    """
+    def __init__(self, input_file=None, input_str=None, before: int = 300,
+                 after: int = 300, page_size: int = 100, max_pages: int = None,
+                 **kwargs):
+        super().__init__(input_file, input_str, **kwargs)
+        self.before = before
+        self.after = after
+        self.page_size = page_size
+        n_window = (before + after) // page_size + 2
+        self.max_pages = max(max_pages or 0, n_window)
+        # Page -> frame_id -> instances of the frame, least recently used first.
+        self._pages: Dict[int, Dict[int, List[Instance]]] = OrderedDict()
+        self.window = range(0)
+        self.page_loads = 0
+
+    # Pages ###################################################################
+    def _page(self, page: int) -> Dict[int, List[Instance]]:
+        frames = self._pages.get(page)
+        if frames is None:
+            frames = defaultdict(list)
+            start = page * self.page_size
+            for instance in self.store.by_frames(start, start + self.page_size):
+                frames[instance.frame_id].append(instance)
+            self._pages[page] = frames
+            self.page_loads += 1
+            self._evict(self.max_pages)
+        else:
+            self._pages.move_to_end(page)
+
+        return frames
+
+    def _evict(self, n_kept: int):
+        """Evict the least recently used pages out of the window."""
+        for page in list(self._pages):
+            if len(self._pages) <= n_kept:
+                break
+            if page not in self.window:
+                del self._pages[page]
+
+    @property
+    def loaded_pages(self) -> List[int]:
+        return sorted(self._pages)
+
+    def move_window(self, index: int):
+        """Load the pages around the frame `index`, evict the others."""
+        first = max(index - self.before, 0) // self.page_size
+        last = (index + self.after) // self.page_size
+        self.window = range(first, last + 1)
+        self._evict(0)
+        for page in self.window:
+            self._page(page)
+
+    def _reload_track(self, track_id: int, old_frames=()):
+        """Read the rows of the track `track_id` in the loaded pages again,
+        `old_frames` being the frames it had before the edit."""
+        rows = defaultdict(list)
+        for instance in self.store.by_track(track_id):
+            rows[instance.frame_id].append(instance)
+        self._set_rows(track_id, {*old_frames, *rows}, rows)
+
+    def _track_deleted(self, track_id: int, frames):
+        """Remove the rows of the deleted track `track_id`, in `frames`, from
+        the loaded pages and shift the following tracks."""
+        self._set_rows(track_id, frames, {})
+        self._shift_loaded_tracks(track_id + 1, -1)
+
+    def _set_rows(self, track_id: int, frames, rows: Dict[int, List[Instance]]):
+        """Replace the loaded rows of the track `track_id` in `frames` with
+        `rows`, by frame."""
+        for frame_id in frames:
+            page = self._pages.get(frame_id // self.page_size)
+            if page is not None:
+                instances = page[frame_id]
+                start = _first_row(instances, track_id)
+                instances[start:_first_row(instances, track_id + 1, start)] = \
+                    rows.get(frame_id, [])
+        self._invalidate("track_summaries")
+
+    def _shift_loaded_tracks(self, start: int, delta: int):
+        """Shift the `track_id` of the loaded rows from the track `start`."""
+        for frames in self._pages.values():
+            for instances in frames.values():
+                for i in range(_first_row(instances, start), len(instances)):
+                    instances[i].track_id += delta
+
+    def from_frame(self, frame_id, to: str = None) -> List[Instance]:
+        return list(self._page(frame_id // self.page_size).get(frame_id, ()))
+
+    def propogate_curr_frame_data_sl(self, packet: SignalPacket):
+        self.move_window(packet.data[1])
+        super().propogate_curr_frame_data_sl(packet)
+
+    # Summaries ###############################################################
+    @cached_view
+    def track_summaries(self) -> List[TrackSummary]:
+        return self.store.track_summaries()
+
+    @cached_view
+    def frames(self):
+        return self.store.frames()
+
+    @cached_view
+    def object_class_mapping(self):
+        obj_cls_map = {obj_cls: [] for obj_cls in self.object_classes}
+        for t_id, summary in enumerate(self.track_summaries):
+            obj_cls_map[summary.object_class].append(t_id)
+
+        return obj_cls_map
+
+    # Edits ###################################################################
+    def _add_instance(self, instance):
+        super()._add_instance(instance)
+        self._reload_track(instance.track_id)
+
+    def _add_tobj(self, tobj):
+        super()._add_tobj(tobj)
+        self._shift_loaded_tracks(tobj.track_id, 1)
+        self._reload_track(tobj.track_id)
+
+    def _track_frames(self, track_id: int) -> List[int]:
+        try:
+            return self.store.track_frames(track_id)
+        except KeyError:
+            # Raised as a `ValueError` by the edit.
+            return []
+
+    def _delete_tobj(self, tobj_idx: int):
+        frames = self._track_frames(tobj_idx)
+        super()._delete_tobj(tobj_idx)
+        self._track_deleted(tobj_idx, frames)
+
+    def _delete_instance(self, tobj_idx: int, instance_idx: int, update=True):
+        frames = self._track_frames(tobj_idx)
+        n_tracks = len(self)
+        super()._delete_instance(tobj_idx, instance_idx, update)
+        if len(self) < n_tracks:
+            self._track_deleted(tobj_idx, frames)
+        else:
+            self._reload_track(tobj_idx, frames)
+
+    def _replace_instance(self, instance):
+        old = self.store.instances("WHERE track_id = ? AND instance_id = ?",
+                                   (instance.track_id, instance.instance_id))
+        super()._replace_instance(instance)
+        if not old:
+            self._reload_track(instance.track_id)
+            return
+
+        # Nothing is renumbered, only the frames of the old and new box change.
+        self._invalidate("track_summaries")
+        for frame_id in {old[0].frame_id, instance.frame_id}:
+            frames = self._pages.get(frame_id // self.page_size)
+            if frames is not None:
+                frames[frame_id] = self.store.by_frame(frame_id)
@@ -0,0 +1,155 @@
+from pathlib import Path
+from typing import Callable, Iterable, List, NamedTuple, Optional, TextIO
+from collections import deque
+import csv
+import os
+import queue
+import shutil
+import threading
+
+from PySide2 import QtCore as qtc
+
+from Masa.core.utils import SignalPacket
+from .journal import EditJournal
+
+
+def write_csv(f: TextIO, header: List[str], rows: Iterable[Iterable]):
+    writer = csv.writer(f, lineterminator="\n")
+    writer.writerow(header)
+    writer.writerows(rows)
+
+
+class SaveJob(NamedTuple):
+    """A snapshot of the data to be written into `path`."""
+    path: Path
+    header: List[str]
+    # Only read from the writer thread, must not change after submitting.
+    rows: Iterable[Iterable]
+    n_backups: int
+    journal: Optional[EditJournal] = None
+    # `EditJournal.position` of the edits included in `rows`.
+    position: int = 0
+    # Called as `write(f, header, rows)`, `f` opened in binary if `binary`.
+    write: Callable = write_csv
+    binary: bool = False
+
+
+class CsvWriter(qtc.QThread):
+    """Thread saving data files without blocking the GUI.
+
+    Rows are streamed into a temporary file next to the target, which is
+    `fsync`-ed and then atomically renamed over the target: a crash leaves
+    either the old or the new file, never a partial one. The previous file
+    is kept as `.#{name}0` (the older ones shifted up to `n_backups`). When
+    several jobs are waiting, only the latest snapshot is written. Finished
+    jobs are put in `done` before `saved` is emitted. The thread only runs
+    while there are jobs.
+    """
+    saved = qtc.Signal(SignalPacket)
+    save_failed = qtc.Signal(SignalPacket)
+
+    def __init__(self, parent=None):
+        super().__init__(parent=parent)
+        self._jobs = queue.Queue()
+        self.done = deque()
+        self._active = False
+        self._lock = threading.Lock()
+
+    def submit(self, job: SaveJob):
+        with self._lock:
+            self._jobs.put(job)
+            if not self._active:
+                # `run` might still be returning.
+                self.wait()
+                self._active = True
+                self.start()
+
+    def flush(self):
+        """Block until every submitted job is written and the thread ended."""
+        self._jobs.join()
+        # Nothing left, `run` is returning.
+        self.wait()
+
+    stop = flush
+
+    def _take(self) -> List[SaveJob]:
+        jobs = []
+        with self._lock:
+            while True:
+                try:
+                    jobs.append(self._jobs.get_nowait())
+                except queue.Empty:
+                    break
+            if not jobs:
+                self._active = False
+        return jobs
+
+    def run(self):
+        while True:
+            jobs = self._take()
+            if not jobs:
+                return
+            try:
+                self._save(jobs[-1])
+            finally:
+                for _ in jobs:
+                    self._jobs.task_done()
+
+    def _save(self, job: SaveJob):
+        tmp_path = job.path.parent / f".#{job.path.name}.tmp"
+        try:
+            with tmp_path.open("wb" if job.binary else "w",
+                               newline=None if job.binary else "") as f:
+                job.write(f, job.header, job.rows)
+                f.flush()
+                os.fsync(f.fileno())
+            self._backup(job.path, job.n_backups)
+            if job.journal is not None:
+                job.journal.mark_saved(job.position, tmp_path)
+            os.replace(tmp_path, job.path)
+            self._sync_dir(job.path.parent)
+        except Exception as e:
+            # The target is untouched, only the temporary file is dropped.
+            if tmp_path.exists():
+                tmp_path.unlink()
+            self.save_failed.emit(
+                SignalPacket(sender=[self.__class__.__name__], data=str(e))
+            )
+            return
+
+        self.done.append(job)
+        self.saved.emit(
+            SignalPacket(sender=[self.__class__.__name__], data=str(job.path))
+        )
+
+    @staticmethod
+    def _backup(path: Path, n_backups: int):
+        if n_backups < 1 or not path.exists():
+            return
+        for i in range(n_backups - 1, 0, -1):
+            b_file = path.parent / f".#{path.name}{i - 1}"
+            if b_file.exists():
+                os.replace(b_file, path.parent / f".#{path.name}{i}")
+        b_file = path.parent / f".#{path.name}0"
+        if b_file.exists():
+            b_file.unlink()
+        try:
+            # The current file becomes the backup without being copied, the
+            # new data replaces it with another inode.
+            os.link(path, b_file)
+        except OSError:
+            shutil.copyfile(path, b_file)
+
+    @staticmethod
+    def _sync_dir(directory: Path):
+        # Make the rename durable, not supported everywhere (e.g. Windows).
+        try:
+            fd = os.open(directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
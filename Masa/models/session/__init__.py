@@ -1 +1,2 @@
 from .bb_session import BBSession
+from .propagation import Proposal, Propagation, Propagator, match_box
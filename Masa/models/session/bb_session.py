@@ -1,58 +1,117 @@
+from copy import deepcopy
+from typing import Optional
+
 from PySide2 import QtCore as qtc
-import cv2
+import numpy as np
 
 try:
     from .session import Session
+    from .propagation import Propagation, Propagator
 except:
     import sys; from pathlib import Path
     _dir = Path(__file__).parent
     sys.path.append(str(_dir))
     from session import Session
-from Masa.core.utils import SignalPacket
+    from propagation import Propagation, Propagator
+from Masa.core.data import TrackedObject
+from Masa.core.utils import SignalPacket, DataUpdateInfo
 
 
 class BBSession(Session):
+    """Propose the boxes of the next frames of a track by template matching.
+
+    `propagate` takes the box of an instance and its frame. Of the frames
+    the session is then called with (by `Buffer` while playing), the ones a
+    propagation needs are copied and matched on the `Propagator` thread, and
+    the proposals of each batch are added to the `DataHandler` in a single
+    `DataUpdateInfo`. Proposals scoring under
+    `min_score`, or on a frame where the track already has a box, are left
+    out.
+
+    Signal:
+    `proposed`: every `Proposal` of a batch, with its score, added or not.
+    """
     added_tobj = qtc.Signal(SignalPacket)
     added_instance = qtc.Signal(SignalPacket)
     request_tobj = qtc.Signal(SignalPacket)
+    proposed = qtc.Signal(SignalPacket)
 
-    def __init__(self, data_handler=None, backward: bool = True):
+    def __init__(self, data_handler=None, backward: bool = False,
+                 n_frames: int = 30, margin: float = 1.0, min_score: float = 0.5,
+                 normalized: bool = True, batch_size: int = 10):
         super().__init__()
         self._dh = data_handler
+        self.backward = backward
+        self.n_frames = n_frames
+        self.margin = margin
+        self.min_score = min_score
+        self.normalized = normalized
+
+        self.worker = Propagator(min_score, batch_size)
+        self.worker.proposed.connect(self._proposed_sl)
 
     def set_data_handler(self, data_handler):
         self._dh = data_handler
 
     def __call__(self, frame, index):
-        self.run(frame, idx)
+        self.run(frame, index)
 
     def add_tobj_sl(self, packet: SignalPacket):
-        self._dh.append(packet.data)
+        self._dh.add(packet.data)
 
     def add_instance_sl(self, packet: SignalPacket):
-        self._dh.append(packet.data)
-        
+        """Add an `Instance`, or the instances of a `TrackedObject`, to their
+        already existing track."""
+        data = packet.data
+        instances = data[:] if isinstance(data, TrackedObject) else [data]
+        for instance in instances:
+            self._dh.add(deepcopy(instance))
+
+    def propagate(self, instance, frame: np.ndarray, n_frames: Optional[int] = None):
+        """Follow `instance`, whose frame is `frame`, in the next `n_frames`
+        frames (the previous ones if `backward`)."""
+        n_frames = self.n_frames if n_frames is None else n_frames
+        self.worker.add(Propagation(
+            instance, frame, n_frames, step=-1 if self.backward else 1,
+            normalized=self.normalized, margin=self.margin,
+            track_uid=self._dh.track_uid(instance.track_id)
+        ))
 
     def run(self, frame, idx):
-        height, width = frame.shape[:2]
+        # Called with every frame played, most are not needed.
+        if self.worker.wants(idx):
+            self.worker.submit((frame.copy(), idx))
+
+    def run_sl(self, packet: SignalPacket):
+        self.run(*packet.data)
+
+    def _proposed_sl(self, packet: SignalPacket):
+        self.proposed.emit(
+            SignalPacket(sender=[*packet.sender, self.__class__.__name__],
+                         data=packet.data)
+        )
+
+        added = set()
+        changes = []
+        for instance, score, track_uid in packet.data:
+            key = (track_uid, instance.frame_id)
+            if score < self.min_score or key in added:
+                continue
+            # Tracks might have been added or deleted since the propagation
+            # started.
+            track_id = self._dh.track_id_of(track_uid)
+            if track_id is None:
+                continue
+            instance.track_id = track_id
+            if any(ins.frame_id == instance.frame_id for ins in self._dh[track_id]):
+                continue
+            added.add(key)
+            changes.append(DataUpdateInfo(added=instance))
+
+        if changes:
+            self._dh.data_update_sl(SignalPacket(
+                sender=[self.__class__.__name__], data=DataUpdateInfo(batch=changes)
+            ))
 
     def get_tobj(self, track_id):
         return self._dh[track_id]
-
-if __name__ == "__main__":
-    vid = cv2.VideoCapture("/home/hilman_dayo/Documents/epipolar_track/video.mp4")
-    algo = BBSession()
-
-    while True:
-        _, frame = vid.read()
-        for tl in algo.tl_line_orig:
-            tl = tuple(tl)
-            cv2.circle(frame, tl, 1, (0, 0, 255), 1)
-        for br in algo.br_line_orig:
-            br = tuple(br)
-            cv2.circle(frame, br, 1, (0, 0, 255), 1)
-
-        cv2.imshow("vid", frame)
-        key = cv2.waitKey(0)
-        if key == ord("q"):
-            break
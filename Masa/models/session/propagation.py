@@ -0,0 +1,239 @@
+"""Follow a box from frame to frame by template matching."""
+from typing import List, NamedTuple, Optional, Tuple
+import queue
+import threading
+
+from PySide2 import QtCore as qtc
+import cv2
+import numpy as np
+
+from Masa.core.data import Instance
+from Masa.core.utils import SignalPacket
+
+Box = Tuple[int, int, int, int]
+
+
+class Proposal(NamedTuple):
+    """A box found by a `Propagation`, `score` being the matching score
+    (`cv2.TM_CCOEFF_NORMED`, 1 for a perfect match). `track_uid` is the one
+    given to the `Propagation`, the `track_id` of `instance` might be out of
+    date."""
+    instance: Instance
+    score: float
+    track_uid: Optional[int]
+
+
+def match_box(frame: np.ndarray, template: np.ndarray, box: Box,
+              margin: float = 1.0) -> Tuple[Box, float]:
+    """Best match of `template` in `frame`, searched around `box`.
+
+    The search window is `box` grown by `margin` times the size of the
+    template on every side, clipped to the frame. Boxes are in pixels.
+    Returns `box` with a score of 0 if the window is smaller than the
+    template.
+    """
+    height, width = template.shape[:2]
+    frame_height, frame_width = frame.shape[:2]
+    x1, y1 = box[:2]
+    wx1 = max(x1 - int(margin * width), 0)
+    wy1 = max(y1 - int(margin * height), 0)
+    wx2 = min(x1 + width + int(margin * width), frame_width)
+    wy2 = min(y1 + height + int(margin * height), frame_height)
+    if wx2 - wx1 < width or wy2 - wy1 < height:
+        return box, 0.0
+
+    scores = cv2.matchTemplate(frame[wy1:wy2, wx1:wx2], template, cv2.TM_CCOEFF_NORMED)
+    _, score, _, (dx, dy) = cv2.minMaxLoc(scores)
+    x1, y1 = wx1 + dx, wy1 + dy
+    # A flat template or window has no correlation.
+    score = float(score) if np.isfinite(score) else 0.0
+    return (x1, y1, x1 + width, y1 + height), score
+
+
+class Propagation:
+    """The box of `instance`, followed `n_frames` frames from its frame.
+
+    The template is the box in `frame`, the frame of `instance`. Each
+    `advance` matches it in a later frame (`step` frames away, -1 to go
+    backward, or further if frames were skipped), around the last box found.
+
+    Parameters
+    ----------
+    track_uid
+        Key of the track of `instance` (`DataHandler.track_uid`), passed on
+        to the proposals.
+    normalized
+        Whether the coordinates of the instances are fractions of the frame
+        size (as drawn by `BufferRenderView`) or pixels.
+    margin
+        See `match_box`.
+    """
+    def __init__(self, instance: Instance, frame: np.ndarray, n_frames: int,
+                 step: int = 1, normalized: bool = True, margin: float = 1.0,
+                 track_uid: Optional[int] = None):
+        height, width = frame.shape[:2]
+        self.scale = (width, height) if normalized else (1, 1)
+        sx, sy = self.scale
+        self.box: Box = (int(round(instance.x1 * sx)), int(round(instance.y1 * sy)),
+                         int(round(instance.x2 * sx)), int(round(instance.y2 * sy)))
+        x1, y1, x2, y2 = self.box
+        self.template = frame[y1:y2, x1:x2].copy()
+        if self.template.shape[0] != y2 - y1 or self.template.shape[1] != x2 - x1 \
+                or self.template.size == 0:
+            raise ValueError(f"Box {self.box} is not within the frame {(width, height)}")
+
+        self.track_id = instance.track_id
+        self.track_uid = track_uid
+        self.object_class = instance.object_class
+        self.tags = instance.tags.copy()
+        self.frame_id = instance.frame_id
+        self.remaining = n_frames
+        self.step = step
+        self.margin = margin
+        # Every frame it might be advanced in.
+        self.frames = range(self.frame_id + step,
+                            self.frame_id + step * (n_frames + 1), step)
+        # Furthest frame `Propagator.wants` it in, it might still be queued.
+        self.wanted: Optional[int] = None
+
+    @property
+    def next_frame(self) -> int:
+        return self.frame_id + self.step
+
+    def due(self, frame_id: int) -> bool:
+        """Whether `frame_id` is one of the frames left to advance in."""
+        return frame_id in self.frames and (frame_id - self.frame_id) * self.step > 0
+
+    def passed(self, frame_id: int) -> bool:
+        """Whether `frame_id` is beyond the last frame and no wanted frame is
+        left to advance in, the propagation cannot be advanced anymore."""
+        if self.wanted is not None and (self.wanted - self.frame_id) * self.step > 0:
+            return False
+        return not self.frames or (frame_id - self.frames[-1]) * self.step > 0
+
+    def advance(self, frame: np.ndarray, frame_id: Optional[int] = None) -> Proposal:
+        """Match the box in `frame`, whose id is `frame_id` (`next_frame` by
+        default)."""
+        frame_id = self.next_frame if frame_id is None else frame_id
+        self.box, score = match_box(frame, self.template, self.box, self.margin)
+        self.remaining -= (frame_id - self.frame_id) // self.step
+        self.frame_id = frame_id
+
+        sx, sy = self.scale
+        x1, y1, x2, y2 = self.box
+        if self.scale != (1, 1):
+            x1, y1, x2, y2 = x1 / sx, y1 / sy, x2 / sx, y2 / sy
+        instance = Instance(self.track_id, self.object_class, -1, x1, y1, x2, y2,
+                            self.frame_id, self.tags.copy())
+        return Proposal(instance, score, self.track_uid)
+
+
+class Propagator(qtc.QThread):
+    """Thread advancing the `Propagation` in the frames it is fed.
+
+    Propagations are started with `add`, frames are submitted as jobs and
+    handled in order. A frame skipped by the player is skipped by the
+    propagations too. A propagation stops after its last frame, on a proposal
+    scoring less than `min_score`, or once a frame beyond its last one is
+    seen. `proposed` is emitted with the `Proposal` of every `batch_size`
+    frames, and of the last ones once there is no job left. As `CsvWriter`,
+    the thread only runs while there are jobs.
+    """
+    proposed = qtc.Signal(SignalPacket)
+
+    def __init__(self, min_score: float = 0.5, batch_size: int = 10, parent=None):
+        super().__init__(parent=parent)
+        self.min_score = min_score
+        self.batch_size = batch_size
+        # Read by `wants` from the other threads, under `_propagations_lock`.
+        self.propagations: List[Propagation] = []
+        self._propagations_lock = threading.Lock()
+        self._jobs = queue.Queue()
+        self._active = False
+        self._lock = threading.Lock()
+
+    def add(self, propagation: Propagation):
+        with self._propagations_lock:
+            self.propagations.append(propagation)
+
+    def wants(self, frame_id: int) -> bool:
+        """Whether a propagation might be advanced in `frame_id`."""
+        with self._propagations_lock:
+            self._prune(frame_id)
+            wanted = False
+            for propagation in self.propagations:
+                if propagation.due(frame_id):
+                    if propagation.wanted is None \
+                            or (frame_id - propagation.wanted) * propagation.step > 0:
+                        propagation.wanted = frame_id
+                    wanted = True
+            return wanted
+
+    def _prune(self, frame_id: int):
+        # Called under `_propagations_lock`.
+        self.propagations = [propagation for propagation in self.propagations
+                             if not propagation.passed(frame_id)]
+
+    def submit(self, job: Tuple[np.ndarray, int]):
+        """Match the propagations waiting for a `(frame, frame_id)`."""
+        with self._lock:
+            self._jobs.put(job)
+            if not self._active:
+                # `run` might still be returning.
+                self.wait()
+                self._active = True
+                self.start()
+
+    def flush(self):
+        """Block until every submitted job is handled and the thread ended."""
+        self._jobs.join()
+        self.wait()
+
+    def _take(self) -> Optional[Tuple[np.ndarray, int]]:
+        with self._lock:
+            try:
+                return self._jobs.get_nowait()
+            except queue.Empty:
+                self._active = False
+                return None
+
+    def run(self):
+        proposals, n_frames = [], 0
+        while True:
+            job = self._take()
+            if job is None:
+                break
+            try:
+                proposals.extend(self._match(*job))
+                n_frames += 1
+            finally:
+                self._jobs.task_done()
+            if n_frames >= self.batch_size:
+                self._emit(proposals)
+                proposals, n_frames = [], 0
+
+        if proposals:
+            self._emit(proposals)
+
+    def _match(self, frame: np.ndarray, frame_id: int) -> List[Proposal]:
+        with self._propagations_lock:
+            self._prune(frame_id)
+            matched = [propagation for propagation in self.propagations
+                       if propagation.due(frame_id)]
+
+        proposals, done = [], []
+        for propagation in matched:
+            proposal = propagation.advance(frame, frame_id)
+            proposals.append(proposal)
+            if propagation.remaining <= 0 or proposal.score < self.min_score:
+                done.append(propagation)
+
+        with self._propagations_lock:
+            self.propagations = [propagation for propagation in self.propagations
+                                 if propagation not in done]
+        return proposals
+
+    def _emit(self, proposals: List[Proposal]):
+        self.proposed.emit(
+            SignalPacket(sender=[self.__class__.__name__], data=proposals)
+        )
@@ -0,0 +1,141 @@
+from typing import List, Optional, Union
+
+import numpy as np
+
+from Masa.core.data import Instance, TrackedObject
+from Masa.core.utils import SignalPacket, DataUpdateInfo
+
+
+class Trajectories:
+    """Box-centre paths of every track.
+
+    Each track is kept as an array of `(frame_id, cx, cy)` rows ordered the
+    same way as `TrackedObject.instances`, so a `DataUpdateInfo` can be applied
+    by position without asking `DataHandler` for anything. The paths are built
+    once and then patched on every `data_updated`, which keeps querying a frame
+    window independent of the size of the dataset.
+    """
+    def __init__(self):
+        self._tracks: List[np.ndarray] = []
+        self._sorted: List[Optional[np.ndarray]] = []
+        self._spans: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_data_handler(cls, data_handler):
+        trajectories = cls()
+        for track_id, _, instances in data_handler.iter_tracks():
+            trajectories._insert_track(track_id, instances)
+
+        return trajectories
+
+    @staticmethod
+    def _rows(instances: List[Instance]) -> np.ndarray:
+        return np.array(
+            [(ins.frame_id, (ins.x1 + ins.x2) / 2, (ins.y1 + ins.y2) / 2)
+             for ins in instances],
+            dtype=np.float64
+        ).reshape(-1, 3)
+
+    def __len__(self):
+        return len(self._tracks)
+
+    def __getitem__(self, track_id) -> np.ndarray:
+        return self._tracks[track_id]
+
+    def _changed(self, track_id):
+        self._sorted[track_id] = None
+        self._spans = None
+
+    def _insert_track(self, track_id, instances: List[Instance]):
+        self._tracks.insert(track_id, self._rows(instances))
+        self._sorted.insert(track_id, None)
+        self._spans = None
+
+    def _delete_track(self, track_id):
+        del self._tracks[track_id]
+        del self._sorted[track_id]
+        self._spans = None
+
+    def _add_instance(self, instance: Instance):
+        t_id = instance.track_id
+        self._tracks[t_id] = np.insert(
+            self._tracks[t_id], instance.instance_id, self._rows([instance]), axis=0
+        )
+        self._changed(t_id)
+
+    def _delete(self, track_id, instance_id=None):
+        if instance_id is None:
+            self._delete_track(track_id)
+            return
+
+        self._tracks[track_id] = np.delete(self._tracks[track_id], instance_id, axis=0)
+        if len(self._tracks[track_id]) == 0:
+            # Mirror `DataHandler`, an empty `TrackedObject` is removed.
+            self._delete_track(track_id)
+        else:
+            self._changed(track_id)
+
+    def _add(self, obj: Union[Instance, TrackedObject]):
+        if isinstance(obj, TrackedObject):
+            self._insert_track(obj.track_id, obj[:])
+        else:
+            self._add_instance(obj)
+
+    def data_update(self, dui: DataUpdateInfo):
+        if dui.batch:
+            for change in dui.batch:
+                self.data_update(change)
+        elif dui.added:
+            self._add(dui.added)
+        elif dui.deleted:
+            self._delete(*dui.deleted)
+        elif dui.replaced:
+            ins = dui.replaced
+            self._tracks[ins.track_id][ins.instance_id] = self._rows([ins])[0]
+            self._changed(ins.track_id)
+        elif dui.moved:
+            self._delete(*dui.moved[0])
+            self._add(dui.moved[1])
+
+    def data_update_sl(self, packet: SignalPacket):
+        self.data_update(packet.data)
+
+    def _sorted_track(self, track_id) -> np.ndarray:
+        path = self._sorted[track_id]
+        if path is None:
+            track = self._tracks[track_id]
+            path = track[np.argsort(track[:, 0], kind="stable")]
+            self._sorted[track_id] = path
+
+        return path
+
+    @property
+    def spans(self) -> np.ndarray:
+        """`(first_frame, last_frame)` of every track."""
+        if self._spans is None:
+            self._spans = np.array(
+                [(t[:, 0].min(), t[:, 0].max()) for t in self._tracks],
+                dtype=np.float64
+            ).reshape(-1, 2)
+
+        return self._spans
+
+    def window(self, frame_id, before=30, after=30):
+        """Return `(track_id, path)` of every track crossing the window.
+
+        `path` is the frame sorted `(frame_id, cx, cy)` rows that are within
+        `[frame_id - before, frame_id + after]`.
+        """
+        start, end = frame_id - before, frame_id + after
+        spans = self.spans
+        crossing = np.flatnonzero((spans[:, 0] <= end) & (spans[:, 1] >= start))
+
+        ret = []
+        for t_id in crossing.tolist():
+            path = self._sorted_track(t_id)
+            lo = np.searchsorted(path[:, 0], start, side="left")
+            hi = np.searchsorted(path[:, 0], end, side="right")
+            if hi > lo:
+                ret.append((t_id, path[lo:hi]))
+
+        return ret
@@ -54,6 +54,8 @@ def data_handler(s_anno_rf):
 # TODO: Change track_id and object
 TRACKED_OBJECT_CONSTANT_VARS = "track_id object".split()
 INSTANT_CONSTANT_VARS = "frame_id x1 y1 x2 y2".split()
+# Saved on every row but read as `DataHandler.scene`, not as a tag.
+FILE_CONSTANT_VARS = "scene".split()
 def tracked_objects_per_instance():
     head, data = simple_anno.head, simple_anno.data_per_instance
     tobjs = []
@@ -68,7 +70,7 @@ def tracked_objects_per_instance():
             for h in head:
                 if h in INSTANT_CONSTANT_VARS:
                     instance_dict[h] = instance[head.index(h)]
-                elif h not in TRACKED_OBJECT_CONSTANT_VARS:
+                elif h not in TRACKED_OBJECT_CONSTANT_VARS + FILE_CONSTANT_VARS:
                     tags[h] = instance[head.index(h)]
             instance_dict["tags"] = tags
 
@@ -93,7 +95,7 @@ def tracked_objects():
         for h in head:
             if h in INSTANT_CONSTANT_VARS:
                 instance_dict[h] = d[head.index(h)]
-            elif h not in TRACKED_OBJECT_CONSTANT_VARS:
+            elif h not in TRACKED_OBJECT_CONSTANT_VARS + FILE_CONSTANT_VARS:
                 tags[h] = d[head.index(h)]
         instance_dict["tags"] = tags
 
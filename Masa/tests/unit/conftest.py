@@ -0,0 +1,37 @@
+"""Fixtures shared by the tests of the `DataHandler` backends."""
+import pytest
+
+from Masa.models import SQLiteDataHandler
+
+
+def pytest_generate_tests(metafunc):
+    # The backends `dhs` is made with, listed by the test module.
+    if "dhs" in metafunc.fixturenames:
+        backends = metafunc.module.BACKENDS
+        metafunc.parametrize("dhs", backends, indirect=True,
+                             ids=[backend.__name__ for backend in backends])
+
+
+@pytest.fixture(name="dhs")
+def data_handlers(request, data_handler):
+    """`data_handler` and a handler of the same file by `request.param`, one
+    of the `BACKENDS` of the test module: a class or a callable taking the
+    file."""
+    other = request.param(data_handler.input_file)
+    yield data_handler, other
+    if isinstance(other, SQLiteDataHandler):
+        other.store.close()
+
+
+def same(dhs) -> bool:
+    """Whether both handlers of `dhs` answer the same annotations."""
+    dh, other = dhs
+    return all([
+        len(dh) == len(other),
+        dh.instances == other.instances,
+        dh.frames == other.frames,
+        # Frames without instances included.
+        all(dh.from_frame(f) == other.from_frame(f) for f in range(max(dh.frames, default=0) + 2)),
+        dh.object_class_mapping == other.object_class_mapping,
+        dh._data_as_text() == other._data_as_text(),
+    ])
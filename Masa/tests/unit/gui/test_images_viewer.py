@@ -1,5 +1,8 @@
 from collections import defaultdict, namedtuple
-from Masa.gui import ImagesViewerView
+
+import numpy as np
+from PySide2 import QtCore as qtc
+from Masa.gui.views.images_viewer_view import ImagesViewerView
 from Masa.core.data import TrackedObject
 import pytest
 from Masa.tests.utils import DummyAnnotationsFactory
@@ -68,10 +71,10 @@ class TestInitImagesViewerView():
             for (label, t_obj_id), tobj in zip(labels_map, self.tobjs)
         ])
 
-    def test_image_buttons_length(self):
+    def test_thumbnails_length(self):
         labels_map = self.ivv.labels_mapping()
         assert all([
-            len(self.ivv._grid_map[label]["image_buttons"]) == len(tobj)
+            len(self.ivv[label]["thumbnails"]) == len(tobj)
             for (label, t_id), tobj in zip(labels_map, self.tobjs)
         ])
         
@@ -219,3 +222,19 @@ class TestDeleteTrackedObject:
             all([t1[1] == t2[1] for t1, t2 in zip(prev_lm[:del_label], curr_lm[:del_label])]),
             all([prev_lm[i + 1][1] - 1 == curr_lm[i][1] for i in range(del_label, len(curr_lm))])
         ])
+
+
+def test_empty_crop_asked_once(ivv):
+    ivv, _ = ivv
+    # Out of the 64x64 frame.
+    ivv.init_data([TrackedObject(0, ivv.name, {"x1": 100, "y1": 10, "x2": 120, "y2": 20,
+                                               "frame_id": 2, "tags": {}})])
+    changed = []
+    ivv.model.dataChanged.connect(lambda *args: changed.append(args))
+    ivv.set_frames([(2, np.zeros((64, 64, 3), np.uint8))])
+    assert all([
+        not changed,
+        ivv.frame_cached(2),
+        ivv.model.index(0, 0).data(qtc.Qt.DecorationRole).cacheKey()
+        == ivv.cache.placeholder.cacheKey(),
+    ])
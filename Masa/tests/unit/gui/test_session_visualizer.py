@@ -1,6 +1,7 @@
 from copy import deepcopy
+import numpy as np
 import pytest
-from Masa.gui import SessionVisualizer, ImagesViewerView
+from Masa.gui.widgets.session_visualizer import SessionVisualizer
 from Masa.core.utils import SignalPacket, DataUpdateInfo
 
 
@@ -12,7 +13,7 @@ def session_visualizer_view_not_init(qtbot):
 
 @pytest.fixture(name="svv", scope="function")
 def session_visualizer_view(qtbot, _svv, buff, data_handler):
-    _svv.init_data(data_handler[:])
+    _svv.init_data(data_handler)
     for iv in _svv:
         iv.req_frames.connect(buff.get_frames_sl)
         buff.pass_frames.connect(iv.set_frames_sl)
@@ -31,12 +32,39 @@ def buff(m_buffer, ocv_video, data_handler):
 class TestInit:
     def test_recieve_frames_upon_init(self, buff, _svv, data_handler):
         """Frames should be request and passed after `init_data` is called."""
-        _svv.init_data(data_handler[:])
+        _svv.init_data(data_handler)
         for iv in _svv:
             # TODO: How to connect through _svv directly?
             iv.req_frames.connect(buff.get_frames_sl)
             buff.pass_frames.connect(iv.set_frames_sl)
 
+class TestProgressiveLoading:
+    @pytest.fixture(name="requested")
+    def requested_frames(self, _svv):
+        requested = []
+        _svv.req_frames.connect(lambda packet: requested.append(packet.data))
+        return requested
+
+    def test_batches(self, qtbot, _svv, requested, data_handler):
+        _svv.batch_size = 2
+        _svv.init_data(data_handler)
+        frames = set(data_handler.frames)
+
+        qtbot.waitUntil(lambda: not _svv.load_timer.isActive())
+        assert all([
+            all(len(batch) <= 2 for batch in requested),
+            set().union(*requested) == frames,
+        ])
+
+    def test_visible_first(self, qtbot, _svv, requested, data_handler):
+        _svv.init_data(data_handler)
+        visible = sorted(data_handler.frames)[-2:]
+        _svv.request_frames_sl(SignalPacket(sender=["dummy"], data=visible))
+
+        qtbot.waitUntil(lambda: len(requested) > 0)
+        assert requested[0][:2] == visible
+
+
 class TestAddInstance:
     def test_append_one_instance(self, data_handler, svv, s_tobj_l, qtbot):
         instance = deepcopy(s_tobj_l[0])
@@ -52,7 +80,7 @@ class TestAddInstance:
                 break
 
         # since basically `data_handler` used `s_tobj_l`
-        img_btns = iv[idx]["image_buttons"]
+        img_btns = iv[idx]["thumbnails"]
         assert all([
             len(img_btns) == len(data_handler[instance.track_id]) + 1,
             img_btns[instance.instance_id].x1 == instance.x1,
@@ -76,14 +104,14 @@ class TestAddInstance:
                 break
 
         # since basically `data_handler` used `s_tobj_l`
-        img_btns = iv[idx]["image_buttons"]
+        img_btns = iv[idx]["thumbnails"]
         assert all([
             len(img_btns) == len(data_handler[instance.track_id]) + 1,
             img_btns[instance.instance_id].x1 == instance.x1,
             img_btns[instance.instance_id].y1 == instance.y1,
             img_btns[instance.instance_id].x2 == instance.x2,
             img_btns[instance.instance_id].y2 == instance.y2,
-            img_btns[instance.instance_id].track_id == instance.track_id,
+            iv.model.track_id(idx) == instance.track_id,
         ])
 
 
@@ -102,7 +130,7 @@ class TestAddTrackedObject:
                 break
 
         # since basically `data_handler` used `s_tobj_l`
-        img_btns = iv[idx]["image_buttons"]
+        img_btns = iv[idx]["thumbnails"]
         assert all([
             len(img_btns) == 1,
             img_btns[tobj[0].instance_id].x1 == tobj[0].x1,
@@ -131,7 +159,7 @@ class TestAddTrackedObject:
                 break
 
         # since basically `data_handler` used `s_tobj_l`
-        img_btns = iv[idx]["image_buttons"]
+        img_btns = iv[idx]["thumbnails"]
         assert all([
             len(img_btns) == 1,
             img_btns[tobj[0].instance_id].x1 == tobj[0].x1,
@@ -148,7 +176,7 @@ class TestDelete:
         iv = svv.get(s_tobj_instance_l.object_class)
         prev_lm = iv.labels_mapping()
         prev_label = iv.labels_mapping(delete[0])
-        prev_len = len(iv[prev_label]["image_buttons"])
+        prev_len = len(iv[prev_label]["thumbnails"])
 
         dui = DataUpdateInfo(deleted=delete)
         svv.data_update_sl(
@@ -158,7 +186,7 @@ class TestDelete:
         curr_lm = iv.labels_mapping()
         curr_label = iv.labels_mapping(delete[0])
         if prev_len != 1:
-            curr_len = len(iv[prev_label]["image_buttons"])
+            curr_len = len(iv[prev_label]["thumbnails"])
 
         if prev_len == 1:
             # Deleted a row...
@@ -192,6 +220,44 @@ class TestDelete:
         ])
         
 
+class TestFrameIndex:
+    @staticmethod
+    def _row_frame_ids(svv):
+        return {thumb.frame_id
+                for iv in svv.images_viewers
+                for row in iv.model.rows
+                for thumb in row["thumbnails"]}
+
+    def test_frame_ids(self, svv, data_handler):
+        assert sorted(svv.frame_ids) == sorted(set(data_handler.frames))
+
+    def test_frame_ids_after_delete(self, svv, s_tobj_instance_l):
+        dui = DataUpdateInfo(deleted=(s_tobj_instance_l.track_id, None))
+        svv.data_update_sl(
+            SignalPacket(sender="dummy", data=dui)
+        )
+
+        assert sorted(svv.frame_ids) == sorted(self._row_frame_ids(svv))
+
+
+class TestThumbnailCache:
+    def test_shared(self, svv):
+        assert all([iv.cache is svv.thumbnail_cache for iv in svv.images_viewers])
+
+    def test_invalidate_on_box_change(self, svv, s_tobj_instance_l):
+        iv = svv.get(s_tobj_instance_l.object_class)
+        old = iv.thumbnail(s_tobj_instance_l.track_id, 0)
+        svv.thumbnail_cache.put(old.key, np.full((8, 8, 3), 144, np.uint8))
+
+        instance = deepcopy(s_tobj_instance_l[0])
+        instance.x2 += 1
+        svv.data_update_sl(
+            SignalPacket(sender="dummy", data=DataUpdateInfo(replaced=instance))
+        )
+
+        assert old.key not in svv.thumbnail_cache
+
+
 class TestReplace:
     def test_replace_instance(self, svv, s_tobj_instance_l):
         pass
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from Masa.gui.views.thumbnail_cache import ThumbnailCache
+
+
+def crop(height=64, width=32):
+    return np.full((height, width, 3), 144, np.uint8)
+
+
+@pytest.fixture(name="cache")
+def thumbnail_cache(qtbot):
+    # Room for two 32x16 thumbnails.
+    return ThumbnailCache(edge=32, max_bytes=2 * 32 * 16 * 4)
+
+
+def test_resized_to_edge(cache):
+    pixmap = cache.put((0, 0, 0, 10, 10), crop())
+    assert (pixmap.height(), pixmap.width()) == (32, 16)
+
+
+def test_lru_eviction(cache):
+    for frame_id in range(2):
+        cache.put((frame_id, 0, 0, 10, 10), crop())
+    # Touch frame 0 so frame 1 becomes the least recently used.
+    cache.get((0, 0, 0, 10, 10))
+    cache.put((2, 0, 0, 10, 10), crop())
+
+    assert all([
+        len(cache) == 2,
+        (0, 0, 0, 10, 10) in cache,
+        (1, 0, 0, 10, 10) not in cache,
+        cache.nbytes <= cache.max_bytes,
+    ])
+
+
+def test_discard(cache):
+    key = (0, 0, 0, 10, 10)
+    cache.put(key, crop())
+    cache.discard(key)
+    assert all([key not in cache, cache.nbytes == 0])
+
+
+def test_empty_crop(cache):
+    key = (0, 0, 0, 0, 0)
+    assert cache.put(key, crop(0, 0)) is None
+    assert all([len(cache) == 0, key in cache, cache.get(key) is cache.placeholder])
+    cache.discard(key)
+    assert key not in cache
@@ -0,0 +1,65 @@
+import pytest
+from PySide2 import QtCore as qtc
+
+from Masa.gui.views.thumbnails_model import Thumbnail, ThumbnailsModel
+
+
+def thumbnails(track_id, n):
+    return [Thumbnail(i, 10, 10, 20, 20) for i in range(n)]
+
+
+@pytest.fixture(name="model")
+def thumbnails_model(qtbot):
+    model = ThumbnailsModel()
+    for track_id, n in enumerate([3, 1, 2]):
+        model.insert_row(track_id, track_id, thumbnails(track_id, n))
+    return model
+
+
+def test_dims(model):
+    assert all([
+        model.rowCount() == 3,
+        model.columnCount() == 3,
+        model.thumbnail(1, 1) is None,
+        model.thumbnail(0, 2).frame_id == 2,
+        model.track_id(2) == 2,
+    ])
+
+
+def test_columns_follow_longest_row(model):
+    model.remove_row(0)
+    assert model.columnCount() == 2
+
+    model.insert_thumbnail(1, 0, Thumbnail(5, 1, 1, 2, 2))
+    assert all([
+        model.columnCount() == 3,
+        [t.frame_id for t in model.row(1)["thumbnails"]] == [5, 0, 1],
+        model.index(1, 1).data() == "Instance ID: 1",
+    ])
+
+
+def test_remove_thumbnail_renumber(model):
+    model.remove_thumbnail(0, 0)
+    assert all([
+        [t.frame_id for t in model.row(0)["thumbnails"]] == [1, 2],
+        model.index(0, 0).data() == "Instance ID: 0",
+    ])
+
+
+def test_shift_track_ids(model):
+    model.shift_track_ids(1, -1)
+    assert all([
+        model.track_ids.tolist() == [0, 0, 1],
+        model.headerData(2, qtc.Qt.Vertical) == "2\nTrack ID: 1",
+    ])
+
+
+def test_label(model):
+    model.remove_row(1)
+    assert all([
+        model.label(0) == 0,
+        model.label(1) is None,
+        model.label(2) == 1,
+        model.insert_label(1) == 1,
+        model.insert_label(3) == 2,
+    ])
@@ -0,0 +1,64 @@
+from copy import deepcopy
+
+import numpy as np
+import pytest
+
+from Masa.models.annotation_density import AnnotationDensity
+
+
+N_FRAMES = 10
+
+
+@pytest.fixture(name="density")
+def annotation_density(data_handler):
+    density = AnnotationDensity.from_data_handler(data_handler, N_FRAMES)
+    data_handler.data_updated.connect(density.data_update_sl)
+    return density
+
+
+def same_as_rebuilt(density, data_handler):
+    rebuilt = AnnotationDensity.from_data_handler(data_handler, density.n_frames)
+    return all(np.array_equal(density.histogram(key)[1], rebuilt.histogram(key)[1])
+               for key in density.group_keys)
+
+
+def test_init(density, data_handler):
+    _, counts = density.histogram()
+    frame_id = data_handler.frames[0]
+    assert all([
+        density.n_frames == max(N_FRAMES, data_handler.frames[-1] + 1),
+        counts.sum() == len(data_handler.instances),
+        counts[:, frame_id].sum() == len(data_handler.from_frame(frame_id)),
+    ])
+
+
+def test_tags(density, data_handler):
+    for key in data_handler.tags:
+        labels, counts = density.histogram(key)
+        assert all([
+            labels == data_handler.tags[key],
+            counts.sum() == len(data_handler.instances),
+        ])
+
+
+def test_add_instance(density, data_handler, s_tobj_l):
+    instance = deepcopy(s_tobj_l[0])
+    instance.frame_id += 1
+    data_handler.add(instance)
+    assert same_as_rebuilt(density, data_handler)
+
+
+def test_delete_tobj(density, data_handler, s_tobj_l):
+    version = density.version
+    data_handler.delete(s_tobj_l.track_id)
+    assert all([
+        same_as_rebuilt(density, data_handler),
+        density.version == version + 1,
+    ])
+
+
+def test_replace_instance(density, data_handler, s_tobj_l):
+    instance = deepcopy(data_handler[s_tobj_l.track_id][0])
+    instance.frame_id += 3
+    data_handler.replace(instance)
+    assert same_as_rebuilt(density, data_handler)
@@ -1,6 +1,11 @@
 from copy import deepcopy
+from dataclasses import replace
+
+import numpy as np
 import pytest
-from Masa.models.session import BBSession
+
+from Masa.core.data import Instance
+from Masa.models.session import BBSession, match_box
 from Masa.models.datahandler import DataHandler
 from Masa.core.utils import SignalPacket
 
@@ -36,14 +41,128 @@ def test_init_session_tobj(edh, s_tobj_l):
 
 
 def test_add_instance(bbs, s_tobj_l):
+    # Instances are inserted at their `instance_id`, `-1` appends them.
+    tobj = deepcopy(s_tobj_l)
+    tobj[0].instance_id = -1
     prev_len = len(bbs.get_tobj(s_tobj_l.track_id))
-    bbs.add_instance_sl(SignalPacket(sender="dummy", data=s_tobj_l))
+    bbs.add_instance_sl(SignalPacket(sender="dummy", data=tobj))
 
     assert all([
         len(bbs.get_tobj(s_tobj_l.track_id)) == prev_len + 1,
-        bbs.get_tobj(s_tobj_l.track_id)[-1] == s_tobj_l[0]
+        bbs.get_tobj(s_tobj_l.track_id)[-1] == replace(s_tobj_l[0], instance_id=prev_len)
     ])
 
 
 def test_get_tobj(bbs, s_tobj_instance_l):
     bbs.get_tobj(s_tobj_instance_l.track_id)
+
+
+def shifted(frame, dx, dy):
+    return np.roll(frame, (dy, dx), axis=(0, 1))
+
+
+@pytest.fixture(name="noise")
+def noise_frame():
+    return np.random.default_rng(0).integers(0, 256, (60, 80, 3), dtype=np.uint8)
+
+
+def test_match_box(noise):
+    template = noise[10:20, 10:20]
+    box, score = match_box(shifted(noise, 3, -2), template, (10, 10, 20, 20))
+    assert all([box == (13, 8, 23, 18), score == pytest.approx(1)])
+
+
+def test_match_box_outside(noise):
+    assert match_box(noise[:5, :5], noise[10:20, 10:20], (10, 10, 20, 20)) \
+        == ((10, 10, 20, 20), 0.0)
+
+
+@pytest.fixture(name="track")
+def single_instance_track(bbs, s_tobj_l):
+    """The `track_id` of a track left with its first instance, on frame 1."""
+    tobj = bbs.get_tobj(s_tobj_l.track_id)
+    while len(tobj) > 1:
+        bbs._dh.delete(tobj.track_id, len(tobj) - 1)
+    bbs._dh.replace(Instance(tobj.track_id, tobj.object_class, 0,
+                             10, 10, 20, 20, 1, deepcopy(tobj[0].tags)))
+    bbs.normalized = False
+    return tobj.track_id
+
+
+def propagate(qtbot, bbs, frame, frames, track_id, n_frames=3):
+    bbs.propagate(bbs.get_tobj(track_id)[0], frame, n_frames)
+    with qtbot.waitSignal(bbs.proposed):
+        for frame_id, frame in enumerate(frames, start=2):
+            bbs(frame, frame_id)
+    bbs.worker.flush()
+    qtbot.wait(10)
+
+
+def test_propagate(qtbot, bbs, track, noise):
+    frames = [shifted(noise, 2 * i, i) for i in range(1, 5)]
+    propagate(qtbot, bbs, noise, frames, track)
+    tobj = bbs.get_tobj(track)
+    assert [(ins.frame_id, ins.x1, ins.y1, ins.x2, ins.y2) for ins in tobj] == [
+        (1, 10, 10, 20, 20), (2, 12, 11, 22, 21), (3, 14, 12, 24, 22),
+        (4, 16, 13, 26, 23),
+    ]
+
+
+def test_propagate_lost(qtbot, bbs, track, noise):
+    other = np.random.default_rng(1).integers(0, 256, noise.shape, dtype=np.uint8)
+    propagate(qtbot, bbs, noise, [shifted(noise, 1, 0), other, noise], track)
+    assert [ins.frame_id for ins in bbs.get_tobj(track)] == [1, 2]
+
+
+def test_propagate_shifted_track(qtbot, bbs, track, noise, s_tobj_l):
+    bbs.propagate(bbs.get_tobj(track)[0], noise, 1)
+    # Inserted before the track while it is propagated.
+    tobj = deepcopy(s_tobj_l)
+    tobj.change_track_id(0)
+    bbs._dh.add(tobj)
+    with qtbot.waitSignal(bbs.proposed):
+        bbs(shifted(noise, 1, 1), 2)
+    bbs.worker.flush()
+    qtbot.wait(10)
+    assert all([
+        [ins.frame_id for ins in bbs.get_tobj(track + 1)] == [1, 2],
+        len(bbs.get_tobj(0)) == len(s_tobj_l),
+    ])
+
+
+def test_propagate_deleted_track(qtbot, bbs, track, noise):
+    bbs.propagate(bbs.get_tobj(track)[0], noise, 1)
+    n_instances = len(bbs._dh.instances)
+    bbs._dh.delete(track)
+    with qtbot.waitSignal(bbs.proposed):
+        bbs(shifted(noise, 1, 1), 2)
+    bbs.worker.flush()
+    qtbot.wait(10)
+    assert len(bbs._dh.instances) == n_instances - 1
+
+
+def test_unneeded_frames(bbs, track, noise):
+    bbs(noise, 2)
+    bbs.propagate(bbs.get_tobj(track)[0], noise, 3)
+    bbs(noise, 5)
+    assert all([bbs.worker._jobs.empty(), not bbs.worker.isRunning()])
+
+
+def test_propagate_skipped_frame(qtbot, bbs, track, noise):
+    bbs.propagate(bbs.get_tobj(track)[0], noise, 3)
+    with qtbot.waitSignal(bbs.proposed):
+        bbs(shifted(noise, 4, 2), 3)
+        bbs.worker.flush()
+    qtbot.wait(10)
+    tobj = bbs.get_tobj(track)
+    assert [(ins.frame_id, ins.x1, ins.y1) for ins in tobj] == [(1, 10, 10), (3, 14, 12)]
+    assert [bbs.worker.wants(2), bbs.worker.wants(4)] == [False, True]
+
+
+def test_propagate_jumped_past(bbs, track, noise):
+    bbs.propagate(bbs.get_tobj(track)[0], noise, 3)
+    assert not bbs.worker.wants(10)
+    assert bbs.worker.propagations == []
+    assert not bbs.worker.wants(2)
+    bbs(noise, 2)
+    assert all([bbs.worker._jobs.empty(), not bbs.worker.isRunning()])
@@ -0,0 +1,184 @@
+"""`ColumnarDataHandler` must behave exactly like `DataHandler`."""
+from copy import deepcopy
+
+import pytest
+
+from Masa.models import DataHandler, ColumnarDataHandler
+from Masa.tests.unit.conftest import same
+
+
+BACKENDS = [ColumnarDataHandler]
+
+
+def test_init(dhs):
+    assert same(dhs)
+
+
+def test_tracked_objs(dhs):
+    dh, cdh = dhs
+    assert all([
+        list(cdh.tracked_objs) == list(dh.tracked_objs),
+        all(cdh[t_id][:] == dh[t_id][:] for t_id in dh.tracked_objs),
+        [tobj[:] for tobj in cdh] == [tobj[:] for tobj in dh],
+    ])
+
+
+def test_iter_tracks(dhs):
+    dh, cdh = dhs
+    assert list(cdh.iter_tracks()) == [
+        (tobj.track_id, tobj.object_class, tobj[:]) for tobj in dh
+    ]
+
+
+def test_add_instance(dhs, s_tobj_l):
+    instance = deepcopy(s_tobj_l[0])
+    instance.frame_id = 1000
+    for dh in dhs:
+        dh.add(deepcopy(instance))
+    assert same(dhs)
+
+
+def test_insert_tobj(dhs, s_tobj_l):
+    tobj = deepcopy(s_tobj_l)
+    tobj.change_track_id(0)
+    for dh in dhs:
+        dh.add(deepcopy(tobj))
+    assert same(dhs)
+
+
+def test_delete(dhs, s_tobj_l):
+    for dh in dhs:
+        dh.delete(s_tobj_l.track_id, 0)
+        dh.delete(0)
+    assert same(dhs)
+
+
+def test_unknown_tag_rejected(dhs):
+    instance = deepcopy(dhs[0][0][0])
+    instance.frame_id = 1000
+    instance.tags["weather"] = "rain"
+    for dh in dhs:
+        with pytest.raises(ValueError, match="weather"):
+            dh.add(deepcopy(instance))
+    assert same(dhs)
+
+
+def test_delete_missing(dhs):
+    with pytest.raises(ValueError):
+        dhs[1].delete(len(dhs[1]))
+
+
+def test_replace(dhs, s_tobj_l):
+    instance = deepcopy(dhs[0][s_tobj_l.track_id][0])
+    instance.frame_id += 1000
+    instance.x1 += 0.5
+    for dh in dhs:
+        dh.replace(deepcopy(instance))
+    assert same(dhs)
+
+
+def test_move(dhs):
+    instance = deepcopy(dhs[0][0][0])
+    instance.track_id = 1
+    for dh in dhs:
+        dh.move((0, 0), deepcopy(instance))
+    assert same(dhs)
+
+
+def test_undo_redo(dhs, s_tobj_l):
+    text = dhs[0]._data_as_text()
+    undone = []
+    for dh in dhs:
+        tobj = deepcopy(s_tobj_l)
+        tobj.change_track_id(len(dh))
+        dh.add(tobj)
+        dh.delete(len(dh) - 1, 0)
+        dh.delete(0)
+        dh.replace({"track_id": 0, "instance_id": 0, "x1": 3})
+        while dh.undo():
+            pass
+        undone.append(dh._data_as_text())
+        for _ in range(3):
+            dh.redo()
+    assert all([undone == [text, text], same(dhs)])
+
+
+def test_views_invalidated(dhs, s_tobj_l):
+    for dh in dhs:
+        same(dhs)
+        dh.delete(s_tobj_l.track_id, 0)
+        same(dhs)
+        dh.delete(0)
+    assert same(dhs)
+
+
+def test_queries(dhs):
+    dh, cdh = dhs
+    object_class = dh[0].object_class
+    view = dh[0][0].tags["view"]
+    assert all([
+        cdh.store.instances(cdh.store.by_class(object_class))
+        == [ins for ins in dh.instances if ins.object_class == object_class],
+        cdh.store.instances(cdh.store.by_tag("view", view))
+        == [ins for ins in dh.instances if ins.tags["view"] == view],
+        cdh.store.instances(cdh.store.by_track(1)) == dh[1][:],
+    ])
+
+
+def test_smaller(dhs):
+    dh, cdh = dhs
+    # One structured row per instance.
+    assert cdh.store.nbytes == len(dh.instances) * cdh.store.dtype.itemsize
+
+
+def test_spatial_queries(dhs, s_tobj_l):
+    dh, cdh = dhs
+    queries = []
+    for handler in dhs:
+        handler.instances_at(44, 15, 15)
+        handler.delete(s_tobj_l.track_id, 0)
+        handler.replace({"track_id": 1, "instance_id": 0, "x1": 3})
+        queries.append([(handler.instances_at(f, 5, 15), handler.overlaps(f, 0.5))
+                        for f in handler.frames])
+    assert queries[0] == queries[1]
+
+
+def test_interpolate(dhs):
+    uids = [[dh.track_uid(t_id) for t_id in range(len(dh))] for dh in dhs]
+    counts = [dh.interpolate(method="cubic") for dh in dhs]
+    assert all([counts[0] == counts[1], same(dhs),
+                [[dh.track_uid(t_id) for t_id in range(len(dh))] for dh in dhs] == uids])
+
+
+def track_uid_moves(dh, s_tobj_l):
+    """`track_id_of` a track, once another is inserted before it and once it
+    is deleted, and whether the `track_uid` of a deleted track is given again."""
+    tobj = deepcopy(s_tobj_l)
+    tobj.change_track_id(0)
+    uid, last = dh.track_uid(s_tobj_l.track_id), dh.track_uid(len(dh) - 1)
+    dh.add(deepcopy(tobj))
+    moved = dh.track_id_of(uid)
+    dh.delete(moved)
+    dh.delete(len(dh) - 1)
+    tobj.change_track_id(len(dh))
+    dh.add(tobj)
+    uids = [dh.track_uid(t_id) for t_id in range(len(dh))]
+    return moved, dh.track_id_of(uid), uid in uids or last in uids
+
+
+def test_track_uid(dhs, s_tobj_l):
+    moves = [track_uid_moves(dh, s_tobj_l) for dh in dhs]
+    assert all([moves[0] == moves[1], moves[0] == (s_tobj_l.track_id + 1, None, False)])
+
+
+def test_undo_track_uid(dhs):
+    uids = [[dh.track_uid(t_id) for t_id in range(len(dh))] for dh in dhs]
+    for dh in dhs:
+        dh.delete(1)
+        # Emptied instance by instance.
+        with dh.batch():
+            for _ in range(len(dh[0])):
+                dh.delete(0, 0)
+        dh.undo()
+        dh.undo()
+    assert [[dh.track_uid(t_id) for t_id in range(len(dh))] for dh in dhs] == uids
@@ -0,0 +1,137 @@
+"""Binary container against the CSV it was converted from.
+
+Set `MASA_BENCH_ROWS` (e.g. to 1000000) to compare opening a bigger file as
+CSV and as container, `-s` shows the timings and peak memory.
+"""
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from Masa.models import DataHandler
+from Masa.models.datahandler import (AnnotationContainer, csv_to_container,
+                                     container_to_csv)
+
+
+N_ROWS = int(os.environ.get("MASA_BENCH_ROWS", 20000))
+HEADER = "track_id,frame_id,x1,y1,x2,y2,scene,object_class,view"
+
+
+@pytest.fixture(name="container_file")
+def converted_container(data_handler):
+    container_file = data_handler.input_file.with_suffix(".masa")
+    csv_to_container(data_handler.input_file, container_file)
+    return container_file
+
+
+def test_round_trip(data_handler, container_file):
+    csv_file = container_file.with_name("back.csv")
+    container_to_csv(container_file, csv_file)
+    assert csv_file.read_text() == data_handler.input_file.read_text()
+
+
+def test_values(tmp_path):
+    csv_file = tmp_path / "annotations.csv"
+    csv_file.write_text(f"{HEADER}\n3,7,1,2.5,0.1,4,road,car,small\n"
+                        "1,2,-1.25,2,3,4,road,bus,\n3,6,10,20,30,40,road,car,far\n")
+    csv_to_container(csv_file, tmp_path / "annotations.masa")
+    container = AnnotationContainer(tmp_path / "annotations.masa")
+    rows = list(container.table().rows())
+    assert all([
+        rows == [(3, 7, 1, 2.5, 0.1, 4, "road", "car", "small"),
+                 (1, 2, -1.25, 2, 3, 4, "road", "bus", ""),
+                 (3, 6, 10, 20, 30, 40, "road", "car", "far")],
+        container.frames.tolist() == [2, 6, 7],
+        list(container.window(6, 100).rows()) == [rows[0], rows[2]],
+        list(container.window(3, 6).rows()) == [],
+    ])
+
+
+def test_window(data_handler, container_file):
+    container = AnnotationContainer(container_file)
+    start, stop = 3, 8
+    expected = [ins for ins in data_handler.instances if start <= ins.frame_id < stop]
+    window = container.window(start, stop)
+    assert all([
+        len(window) == len(expected),
+        window.numbers("frame_id")[0].tolist() == [ins.frame_id for ins in expected],
+        window.text("view").tolist() == [ins.tags["view"] for ins in expected],
+    ])
+
+
+def test_data_handler(data_handler, container_file):
+    dh = DataHandler(container_file)
+    same_as_csv = dh.instances == data_handler.instances
+    n_loaded = len(dh.instances)
+    dh.delete(0)
+    dh.save(block=True)
+    dh.close()
+
+    backup = AnnotationContainer(container_file.with_name(".#annotations.masa0"))
+    data_handler.delete(0)
+    assert all([
+        same_as_csv,
+        DataHandler(container_file).instances == data_handler.instances,
+        len(backup) == n_loaded,
+    ])
+
+
+def test_not_a_container(tmp_path):
+    f = tmp_path / "annotations.masa"
+    f.write_text(HEADER)
+    with pytest.raises(ValueError, match="not a Masa container"):
+        AnnotationContainer(f)
+
+
+BENCH = """
+import json, resource, sys, time
+start = time.perf_counter()
+from Masa.models.datahandler import AnnotationContainer
+from Masa.models.datahandler.loader import CsvTable
+path = sys.argv[1]
+if path.endswith(".masa"):
+    container = AnnotationContainer(path)
+    opened = time.perf_counter() - start
+    n_rows = len(container.window(100, 200))
+else:
+    table = CsvTable.from_file(path)
+    opened = time.perf_counter() - start
+    frames = table.numbers("frame_id")[0]
+    n_rows = int(((frames >= 100) & (frames < 200)).sum())
+print(json.dumps({"open": opened, "rows": n_rows,
+                  "rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+"""
+
+
+@pytest.fixture(name="big_file")
+def big_annotations_file(data_handler):
+    rng = np.random.default_rng(0)
+    views = ["small", "middle", "large", "far"]
+    rows = [HEADER]
+    for i in range(N_ROWS):
+        rows.append(f"{i // 50},{i % 5000},{i % 640},10,{i % 640 + 20},"
+                    f"{rng.uniform(0, 480):.1f},road_scene,red_traffic_light,"
+                    f"{views[i % 4]}")
+    data_handler.input_file.write_text("\n".join(rows) + "\n")
+    return data_handler.input_file
+
+
+def test_open_benchmark(big_file):
+    pytest.importorskip("resource")
+    container_file = big_file.with_suffix(".masa")
+    csv_to_container(big_file, container_file)
+
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    results = {}
+    for f in [big_file, container_file]:
+        out = subprocess.run([sys.executable, "-c", BENCH, str(f)], env=env,
+                             check=True, capture_output=True, text=True).stdout
+        results[f.suffix] = json.loads(out.splitlines()[-1])
+    print(f"\n{N_ROWS} rows, open time and peak RSS (KiB): "
+          + ", ".join(f"{suffix} {r['open']:.3f}s {r['rss']}"
+                      for suffix, r in results.items()))
+
+    assert results[".csv"]["rows"] == results[".masa"]["rows"]
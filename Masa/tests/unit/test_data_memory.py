@@ -0,0 +1,124 @@
+"""Memory taken by `Instance` and `TrackedObject`.
+
+The default run uses a small synthetic dataset. Set `MASA_BENCH_BOXES` (e.g.
+to 1000000) to benchmark a bigger one, `-s` shows the bytes per instance.
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Union
+import os
+import tracemalloc
+
+import pytest
+
+from Masa.core.data import TrackedObject, Instance
+from Masa.core.data.data import Tags
+
+
+N_BOXES = int(os.environ.get("MASA_BENCH_BOXES", 20000))
+BOXES_PER_TRACK = 50
+VIEWS = ["small", "middle", "large", "far"]
+
+
+@dataclass(order=True)
+class LegacyInstance:
+    """`Instance` as it was before `__slots__` and `Tags`."""
+    track_id: int
+    object_class: str
+    instance_id: int
+    x1: Union[int, float]
+    y1: Union[int, float]
+    x2: Union[int, float]
+    y2: Union[int, float]
+    frame_id: int
+    tags: Dict[str, List[str]]
+
+
+@dataclass
+class LegacyTrackedObject:
+    """The attributes `TrackedObject` used to carry."""
+    track_id: int
+    object_class: str
+    instance: LegacyInstance = field(repr=False)
+    _fixed: tuple = ("track_id", "object_class")
+    instances: list = field(default_factory=list, init=False)
+    _tags: dict = field(init=False, default_factory=lambda: defaultdict(set))
+
+    def __post_init__(self):
+        self.instances.append(self.instance)
+        self._tags["view"].add(self.instance.tags["view"])
+        self._iter = iter(self.instances)
+        self._iter_idx = None
+
+    def add_instance(self, instance):
+        self.instances.append(instance)
+        self._tags["view"].add(instance.tags["view"])
+
+
+def synthetic(instance_cls, tobj_cls, n_boxes):
+    tobjs = []
+    for i in range(n_boxes):
+        t_id, ins_id = divmod(i, BOXES_PER_TRACK)
+        x = float(i % 640)
+        instance = instance_cls(t_id, "car", ins_id, x, 10.0, x + 20.0, 30.0, i,
+                                {"view": VIEWS[i % len(VIEWS)]})
+        if ins_id == 0:
+            tobjs.append(tobj_cls(t_id, "car", instance))
+        else:
+            tobjs[-1].add_instance(instance)
+
+    return tobjs
+
+
+def bytes_per_instance(instance_cls, tobj_cls, n_boxes=N_BOXES) -> float:
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        tobjs = synthetic(instance_cls, tobj_cls, n_boxes)
+        used = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    assert sum(len(tobj.instances) for tobj in tobjs) == n_boxes
+
+    return used / n_boxes
+
+
+def test_tags_shared():
+    a = Instance(0, "car", 0, 1, 2, 3, 4, 0, {"view": "small"})
+    b = Instance(1, "car", 0, 1, 2, 3, 4, 0, {"view": "small"})
+    b.tags["view"] = "large"
+    assert all([
+        isinstance(a.tags, Tags),
+        a.tags == {"view": "small"},
+        b.tags == {"view": "large"},
+        a.tags._keys is b.tags._keys,
+    ])
+
+
+def test_tags_copy():
+    tags = Tags({"view": "small", "scene": "road"})
+    copied = tags.copy()
+    copied["view"] = "large"
+    assert all([
+        tags == {"view": "small", "scene": "road"},
+        copied == {"view": "large", "scene": "road"},
+        tags.copy() == tags,
+        Tags({"scene": "road", "view": "small"}) == tags,
+    ])
+
+
+def test_no_dict():
+    tobj = TrackedObject(0, "car", {"x1": 1, "y1": 2, "x2": 3, "y2": 4,
+                                    "frame_id": 0, "tags": {"view": "small"}})
+    for obj in [tobj, tobj[0], tobj[0].tags]:
+        with pytest.raises(AttributeError):
+            obj.__dict__
+
+
+def test_bytes_per_instance():
+    legacy = bytes_per_instance(LegacyInstance, LegacyTrackedObject)
+    compact = bytes_per_instance(Instance, TrackedObject)
+    print(f"\n{N_BOXES} boxes, bytes per instance: "
+          f"legacy {legacy:.0f}, compact {compact:.0f}")
+
+    assert compact < 0.6 * legacy
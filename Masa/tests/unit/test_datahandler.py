@@ -11,7 +11,7 @@ import pytest
 from copy import deepcopy
 from Masa.models import DataHandler
 from Masa.core.data import  TrackedObject, Instance
-from Masa.core.utils import  SignalPacket
+from Masa.core.utils import  SignalPacket, DataUpdateInfo
 from Masa.tests.utils import DummyAnnotationsFactory
 
 
@@ -264,3 +264,557 @@ class TestMove:
         ])
 
 
+
+
+class TestChangeLog:
+    def test_one_line_per_update(self, qtbot, data_handler, s_tobj_l):
+        instance = s_tobj_l[0]
+        dui = DataUpdateInfo(deleted=(instance.track_id, instance.instance_id))
+        with qtbot.wait_signal(data_handler.change_logged) as blocker:
+            data_handler.data_update_sl(SignalPacket(sender=["dummy"], data=dui))
+
+        line = blocker.args[0].data
+        assert all([
+            "\n" not in line,
+            line == f"deleted Instance ({instance.track_id}, {instance.instance_id})",
+        ])
+
+    def test_describe_added(self, data_handler, s_tobj_l):
+        line = data_handler.describe_change(DataUpdateInfo(added=s_tobj_l))
+        assert line == (f"added TrackedObject ({s_tobj_l.track_id}, "
+                        f"{s_tobj_l.object_class}) of 1 instance(s)")
+
+    def test_describe_dict_replaced(self, qtbot, data_handler, s_tobj_l):
+        dui = DataUpdateInfo(replaced=dict(track_id=s_tobj_l.track_id, instance_id=0,
+                                           x1=1, y1=2, x2=3, y2=4))
+        line = data_handler.describe_change(dui)
+        with qtbot.wait_signal(data_handler.change_logged) as blocker:
+            data_handler.data_update_sl(SignalPacket(sender=["dummy"], data=dui))
+
+        instance = data_handler[s_tobj_l.track_id][0]
+        assert all([
+            line == (f"replaced Instance ({s_tobj_l.track_id}, 0) "
+                     "{'x1': 1, 'y1': 2, 'x2': 3, 'y2': 4}"),
+            blocker.args[0].data == (
+                f"replaced Instance ({s_tobj_l.track_id}, 0) frame {instance.frame_id} "
+                "[1, 2, 3, 4]"
+            ),
+        ])
+
+    def test_pages(self, qtbot, data_handler):
+        data_handler.page_size = 2
+        with qtbot.wait_signal(data_handler.pass_page) as blocker:
+            data_handler.get_page_sl(SignalPacket(sender=["dummy"], data=100))
+
+        page, n_pages, text = blocker.args[0].data
+        pages = "\n".join(data_handler.page(p) for p in range(n_pages))
+        assert all([
+            n_pages == -(-len(data_handler) // 2),
+            page == n_pages - 1,
+            text == data_handler.page(page),
+            str(data_handler).split("\n", 1)[1] == pages,
+        ])
+
+
+def scanned_frame(data_handler, frame_id):
+    return [ins for tobj in data_handler.tracked_objs.values()
+            for ins in tobj[:] if ins.frame_id == frame_id]
+
+
+def frame_index_ok(data_handler):
+    frames = sorted({ins.frame_id for ins in data_handler.instances})
+    return all([
+        data_handler.frames == frames,
+        all(data_handler.from_frame(f) == scanned_frame(data_handler, f)
+            for f in frames),
+    ])
+
+
+class TestFrameIndex:
+    def test_init(self, data_handler):
+        assert frame_index_ok(data_handler)
+
+    def test_add_instance(self, data_handler, s_tobj_l):
+        instance = deepcopy(s_tobj_l[0])
+        instance.frame_id = max(data_handler.frames) + 1
+        data_handler.add(instance)
+        assert frame_index_ok(data_handler)
+
+    def test_insert_tobj(self, data_handler, s_tobj_l):
+        tobj = deepcopy(s_tobj_l)
+        tobj.change_track_id(0)
+        data_handler.add(tobj)
+        assert frame_index_ok(data_handler)
+
+    def test_delete(self, data_handler, s_tobj_l):
+        data_handler.delete(s_tobj_l.track_id, 0)
+        data_handler.delete(0)
+        assert frame_index_ok(data_handler)
+
+    def test_replace_frame(self, data_handler, s_tobj_l):
+        instance = deepcopy(data_handler[s_tobj_l.track_id][0])
+        instance.frame_id += 1000
+        data_handler.replace(instance)
+        assert frame_index_ok(data_handler)
+
+
+def journaled_edits(data_handler, s_tobj_l):
+    """Edit through the slot, as the GUI does."""
+    instance = deepcopy(data_handler[s_tobj_l.track_id][0])
+    instance.frame_id += 1000
+    tobj = deepcopy(s_tobj_l)
+    tobj.change_track_id(0)
+    for dui in [DataUpdateInfo(replaced=instance), DataUpdateInfo(added=tobj),
+                DataUpdateInfo(deleted=(len(data_handler), None))]:
+        data_handler.data_update_sl(SignalPacket(sender=["dummy"], data=dui))
+
+
+class TestJournal:
+    def test_file_untouched(self, data_handler, s_tobj_l):
+        text = data_handler.input_file.read_text()
+        journaled_edits(data_handler, s_tobj_l)
+        assert all([
+            data_handler.input_file.read_text() == text,
+            len(data_handler.journal) == 3,
+        ])
+
+    def test_replay(self, data_handler, s_tobj_l):
+        journaled_edits(data_handler, s_tobj_l)
+        # As if the application crashed.
+        recovered = DataHandler(data_handler.input_file)
+        assert all([
+            recovered.instances == data_handler.instances,
+            len(recovered.journal) == 3,
+        ])
+
+    def test_dict_replace(self, data_handler, s_tobj_l):
+        # Sent by `VideoBufferScene` when a box is dragged.
+        dui = DataUpdateInfo(replaced=dict(track_id=s_tobj_l.track_id, instance_id=0,
+                                           x1=1, y1=2, x2=3, y2=4))
+        data_handler.data_update_sl(SignalPacket(sender=["dummy"], data=dui))
+        recovered = DataHandler(data_handler.input_file)
+        instance = recovered[s_tobj_l.track_id][0]
+        assert all([
+            len(data_handler.journal) == 1,
+            (instance.x1, instance.y1, instance.x2, instance.y2) == (1, 2, 3, 4),
+            recovered.instances == data_handler.instances,
+        ])
+
+    def test_save(self, data_handler, s_tobj_l):
+        journaled_edits(data_handler, s_tobj_l)
+        data_handler.save(manual_call=True, block=True)
+        reloaded = DataHandler(data_handler.input_file)
+        assert all([
+            data_handler.input_file.read_text() == data_handler._data_as_text(),
+            len(data_handler.journal) == 0,
+            len(reloaded.journal) == 0,
+            reloaded._data_as_text() == data_handler._data_as_text(),
+        ])
+
+    def test_stale_journal(self, data_handler, s_tobj_l):
+        text = data_handler.input_file.read_text()
+        journaled_edits(data_handler, s_tobj_l)
+        # Rewritten by something else, the journal does not apply anymore.
+        data_handler.input_file.write_text(text + "\n")
+        reloaded = DataHandler(data_handler.input_file)
+        assert len(reloaded.journal) == 0
+
+
+class TestSave:
+    def test_backup(self, data_handler, s_tobj_l):
+        text = data_handler.input_file.read_text()
+        journaled_edits(data_handler, s_tobj_l)
+        data_handler.save(block=True)
+        backup = data_handler.input_file.parent / f".#{data_handler.input_file.name}0"
+        assert backup.read_text() == text
+
+    def test_edit_during_save(self, data_handler, s_tobj_l):
+        snapshot = data_handler._data_as_text()
+        data_handler.save()
+        journaled_edits(data_handler, s_tobj_l)
+        data_handler.writer.flush()
+        data_handler._saved_sl()
+        recovered = DataHandler(data_handler.input_file)
+        assert all([
+            data_handler.input_file.read_text() == snapshot,
+            len(data_handler.journal) == 3,
+            recovered.instances == data_handler.instances,
+        ])
+
+    def test_crash_before_rebase(self, data_handler, s_tobj_l):
+        journaled_edits(data_handler, s_tobj_l)
+        data_handler.save()
+        # Written, but the journal was not told yet.
+        data_handler.writer.flush()
+        recovered = DataHandler(data_handler.input_file)
+        assert all([
+            len(recovered.journal) == 0,
+            recovered._data_as_text() == data_handler._data_as_text(),
+        ])
+
+    def test_failed_save(self, qtbot, data_handler):
+        text = data_handler.input_file.read_text()
+
+        def broken_rows():
+            yield (0, 1, 2, 3, 4, 5, "scene", "class", "view")
+            raise ValueError("snapshot failed")
+
+        data_handler._snapshot = broken_rows
+        with qtbot.wait_signal(data_handler.save_failed) as blocker:
+            data_handler.save(block=True)
+        parent = data_handler.input_file.parent
+        assert all([
+            data_handler.input_file.read_text() == text,
+            not (parent / f".#{data_handler.input_file.name}.tmp").exists(),
+            blocker.args[0].data == "snapshot failed",
+        ])
+
+    def test_saved_once(self, qtbot, capsys, data_handler, s_tobj_l):
+        journaled_edits(data_handler, s_tobj_l)
+        data_handler.save(block=True)
+        # The `saved` signal of the writer comes after.
+        qtbot.wait(10)
+        assert all([
+            capsys.readouterr().out.count("Saved.") == 1,
+            len(data_handler.journal) == 0,
+        ])
+
+
+class TestStableIds:
+    def test_delete_leaves_others(self, data_handler):
+        later = data_handler[1:]
+        uids = [tobj.uid for tobj in later]
+        instances = [tobj[:] for tobj in later]
+        data_handler.delete(0)
+        assert all([
+            [tobj.uid for tobj in data_handler] == uids,
+            [tobj[:] for tobj in data_handler] == instances,
+            all(ins.track_id == t_id for t_id, tobj in enumerate(data_handler)
+                for ins in tobj),
+        ])
+
+    def test_uid_not_reused(self, data_handler, s_tobj_l):
+        used = {tobj.uid for tobj in data_handler}
+        data_handler.delete(0)
+        tobj = deepcopy(s_tobj_l)
+        tobj.change_track_id(0)
+        data_handler.add(tobj)
+        assert all([
+            tobj.uid not in used,
+            data_handler.tracked_objs.by_uid[tobj.uid] is data_handler[0],
+            data_handler[0].track_id == 0,
+        ])
+
+    def test_undo_gives_uid_back(self, data_handler, s_tobj_l):
+        uids = [tobj.uid for tobj in data_handler]
+        data_handler.delete(0)
+        data_handler.undo()
+        tobj = deepcopy(s_tobj_l)
+        tobj.change_track_id(len(data_handler))
+        data_handler.add(tobj)
+        added = tobj.uid
+        data_handler.undo()
+        data_handler.redo()
+        assert all([
+            [tobj.uid for tobj in data_handler][:-1] == uids,
+            data_handler[-1].uid == added,
+            added not in uids,
+        ])
+
+    def test_detached_copy(self, data_handler):
+        tobj = deepcopy(data_handler[1])
+        tobj.change_track_id(5)
+        with pytest.raises(AttributeError):
+            data_handler[1].track_id = 5
+        assert all([
+            tobj.uid is None,
+            [ins.track_id for ins in tobj] == [5] * len(tobj),
+            [ins.track_id for ins in data_handler[1]] == [1] * len(tobj),
+        ])
+
+
+def history_edits(data_handler, s_tobj_l):
+    """Edit with every operation, returns the data before each edit and after."""
+    instance = deepcopy(data_handler[1][0])
+    instance.frame_id += 1000
+    instance.instance_id = -1
+    single = TrackedObject.from_instances(len(data_handler), instance.object_class,
+                                          [deepcopy(data_handler[2][0])])
+    tobj = deepcopy(s_tobj_l)
+    tobj.change_track_id(0)
+    moved = deepcopy(data_handler[0][0])
+    moved.track_id = 1
+    edits = [
+        lambda: data_handler.delete(s_tobj_l.track_id, 0),
+        lambda: data_handler.delete(0),
+        lambda: data_handler.add(instance),
+        lambda: data_handler.add(tobj),
+        lambda: data_handler.add(single),
+        lambda: data_handler.delete(len(data_handler) - 1, 0),
+        lambda: data_handler.replace({"track_id": 1, "instance_id": 0, "x1": 3,
+                                      "tags": {"view": "far"}}),
+        lambda: data_handler.move((0, 0), moved),
+    ]
+    states = [data_handler._data_as_text()]
+    for edit in edits:
+        edit()
+        states.append(data_handler._data_as_text())
+    return states
+
+
+class TestHistory:
+    def test_undo_redo(self, data_handler, s_tobj_l):
+        states = history_edits(data_handler, s_tobj_l)
+        undone = []
+        while data_handler.undo():
+            undone.append(data_handler._data_as_text())
+        redone = []
+        while data_handler.redo():
+            redone.append(data_handler._data_as_text())
+        assert all([
+            undone == states[-2::-1],
+            redone == states[1:],
+            states[0] != states[-1],
+        ])
+
+    def test_signals(self, qtbot, data_handler, s_tobj_l):
+        instances = deepcopy(data_handler[s_tobj_l.track_id][:])
+        data_handler.delete(s_tobj_l.track_id)
+        with qtbot.wait_signal(data_handler.change_logged):
+            with qtbot.wait_signal(data_handler.data_updated) as blocker:
+                data_handler.undo()
+        assert all([
+            blocker.args[0].data.added.track_id == s_tobj_l.track_id,
+            data_handler[s_tobj_l.track_id][:] == instances,
+            data_handler.change_count == 1,
+        ])
+
+    def test_journaled(self, data_handler, s_tobj_l):
+        journaled_edits(data_handler, s_tobj_l)
+        data_handler.undo()
+        data_handler.undo()
+        data_handler.redo()
+        # As if the application crashed.
+        assert DataHandler(data_handler.input_file).instances == data_handler.instances
+
+    def test_new_edit_clears_redo(self, data_handler):
+        data_handler.delete(0)
+        data_handler.undo()
+        data_handler.delete(1)
+        assert all([not data_handler.redo(), data_handler.undo(),
+                    not data_handler.undo()])
+
+    def test_bounded(self, data_handler):
+        data_handler.history.max_count = 2
+        for _ in range(3):
+            data_handler.delete(0)
+        nbytes = data_handler.history.nbytes
+        data_handler.history.max_bytes = nbytes - 1
+        data_handler.delete(0)
+        assert all([
+            len(data_handler.history) == 1,
+            data_handler.history.nbytes < nbytes,
+        ])
+
+
+class TestBatch:
+    def test_one_signal(self, data_handler):
+        n_tracks = len(data_handler)
+        updates = []
+        data_handler.data_updated.connect(lambda packet: updates.append(packet.data))
+        with data_handler.batch():
+            for _ in range(3):
+                data_handler.delete(0)
+            applied = len(data_handler) == n_tracks - 3
+        assert all([
+            applied,
+            updates == [DataUpdateInfo(batch=[DataUpdateInfo(deleted=(0, None))] * 3)],
+        ])
+
+    def test_received(self, qtbot, data_handler, s_tobj_l):
+        changes = [DataUpdateInfo(deleted=(0, None)), DataUpdateInfo(deleted=(0, 0))]
+        with qtbot.wait_signal(data_handler.change_logged) as blocker:
+            data_handler.data_update_sl(
+                SignalPacket(sender=["dummy"], data=DataUpdateInfo(batch=changes))
+            )
+        assert all([
+            blocker.args[0].data == "2 changes: 2 deleted",
+            DataHandler(data_handler.input_file).instances == data_handler.instances,
+        ])
+
+    def test_one_command(self, data_handler, s_tobj_l):
+        text = data_handler._data_as_text()
+        with data_handler.batch():
+            history_edits(data_handler, s_tobj_l)
+        edited = data_handler._data_as_text()
+        data_handler.undo()
+        undone = data_handler._data_as_text()
+        data_handler.redo()
+        assert all([undone == text, data_handler._data_as_text() == edited,
+                    len(data_handler.history) == 1])
+
+
+def recomputed_views(data_handler):
+    instances = [ins for tobj in data_handler for ins in tobj]
+    mapping = {oc: [] for oc in data_handler.object_classes}
+    for t_id, tobj in enumerate(data_handler):
+        mapping[tobj.object_class].append(t_id)
+    return instances, sorted({ins.frame_id for ins in instances}), mapping
+
+
+class TestCachedViews:
+    def test_same_object(self, data_handler):
+        assert all([
+            data_handler.instances is data_handler.instances,
+            data_handler.frames is data_handler.frames,
+            data_handler.object_class_mapping is data_handler.object_class_mapping,
+        ])
+
+    def test_invalidated(self, data_handler, s_tobj_l):
+        views = []
+        for _ in history_edits(data_handler, s_tobj_l):
+            views.append(((data_handler.instances, data_handler.frames,
+                           data_handler.object_class_mapping)
+                          == recomputed_views(data_handler)))
+            data_handler.undo()
+        assert all(views)
+
+    def test_precise(self, data_handler):
+        mapping = data_handler.object_class_mapping
+        instances = data_handler.instances
+        replaced = deepcopy(data_handler[1][0])
+        replaced.x1 += 1
+        data_handler.replace(replaced)
+        assert all([
+            data_handler.object_class_mapping is mapping,
+            data_handler.instances is not instances,
+            data_handler.invalidations == {"instances": 1},
+        ])
+
+
+def spatial_ok(data_handler):
+    """Every instance is found back by the spatial queries of its frame."""
+    return all(
+        data_handler.instances_within(frame_id, -1e6, -1e6, 1e6, 1e6)
+        == data_handler.from_frame(frame_id)
+        and all(ins in data_handler.instances_at(frame_id, ins.x1, ins.y1)
+                for ins in data_handler.from_frame(frame_id))
+        for frame_id in data_handler.frames
+    )
+
+
+class TestSpatialQueries:
+    def test_queries(self, data_handler):
+        frame = data_handler.from_frame(44)
+        assert all([
+            data_handler.instances_at(44, 15, 15) == frame,
+            data_handler.instances_at(44, 25, 15) == [],
+            data_handler.instances_within(44, 18, 0, 30, 12) == frame,
+            data_handler.instances_iou(44, 10, 10, 20, 15, 0.5)
+            == [(ins, 0.5) for ins in frame],
+            data_handler.instances_iou(44, 10, 10, 20, 15, 0.6) == [],
+            len(data_handler.overlaps(44, 0.9)) == len(frame) * (len(frame) - 1) / 2,
+            data_handler.overlaps(1) == [],
+        ])
+
+    def test_maintained(self, data_handler, s_tobj_l):
+        indexes = {f: data_handler.spatial_index(f) for f in data_handler.frames}
+        history_edits(data_handler, s_tobj_l)
+        edited = spatial_ok(data_handler)
+        while data_handler.undo():
+            pass
+        assert all([
+            edited,
+            spatial_ok(data_handler),
+            # Kept up to date, not built again.
+            all(data_handler.spatial_index(f) is indexes[f] for f in data_handler.frames),
+            data_handler.instances_at(44, 5, 15) == [],
+        ])
+
+    def test_replaced(self, data_handler):
+        data_handler.instances_at(44, 5, 15)
+        data_handler.replace({"track_id": 1, "instance_id": 0, "x1": 3})
+        assert data_handler.instances_at(44, 5, 15) == [data_handler[1][0]]
+
+
+def interpolated(tobj):
+    return [ins.frame_id for ins in tobj if ins.tags.get("interpolated") == "true"]
+
+
+class TestInterpolate:
+    def test_filled(self, data_handler):
+        keyframes = deepcopy(data_handler[0][:])
+        n = data_handler.interpolate()
+        assert all([
+            n == 20,
+            [ins.frame_id for ins in data_handler[0]] == list(range(33, 38)),
+            interpolated(data_handler[0]) == [34, 36],
+            interpolated(data_handler[3]) == list(range(34, 46)) + [47],
+            [ins for ins in data_handler[0] if ins.frame_id in (33, 35, 37)]
+            == [ins for ins in data_handler[0] if ins.tags["interpolated"] == "false"],
+            sorted(ins.frame_id for ins in keyframes) == [33, 35, 37],
+            len(data_handler[7]) == 2,
+        ])
+
+    def test_regenerated(self, data_handler):
+        data_handler.interpolate()
+        moved = [ins for ins in data_handler[0] if ins.frame_id == 37][0]
+        data_handler.replace({"track_id": 0, "instance_id": moved.instance_id, "x1": 14})
+        data_handler.interpolate([0])
+        n_edits = len(data_handler.history)
+        data_handler.interpolate()
+        assert all([
+            [ins.x1 for ins in data_handler[0]] == [10, 10.0, 10, 12.0, 14],
+            interpolated(data_handler[0]) == [34, 36],
+            # Nothing changed.
+            len(data_handler.history) == n_edits,
+        ])
+
+    def test_one_change(self, data_handler):
+        text = data_handler._data_as_text()
+        updates = []
+        data_handler.data_updated.connect(lambda packet: updates.append(packet.data))
+        n = data_handler.interpolate(method="cubic")
+        edited = data_handler._data_as_text()
+        n_updates = len(updates)
+        data_handler.undo()
+        assert all([
+            n_updates == 1,
+            # Every interpolated instance added, none there before, the
+            # keyframes put in order.
+            len([dui for dui in updates[0].batch if dui.added]) == n,
+            all(dui.added or dui.replaced for dui in updates[0].batch),
+            data_handler._data_as_text() == text,
+            edited != text,
+        ])
+
+    def test_same_tracks(self, data_handler):
+        uids = [data_handler.track_uid(t_id) for t_id in range(len(data_handler))]
+        tobj = data_handler[0]
+        data_handler.interpolate()
+        data_handler.replace({"track_id": 0, "instance_id": 4, "x1": 14})
+        data_handler.interpolate()
+        assert all([
+            [data_handler.track_uid(t_id) for t_id in range(len(data_handler))] == uids,
+            data_handler[0] is tobj,
+            [ins.x1 for ins in data_handler[0]] == [10, 10.0, 10, 12.0, 14],
+        ])
+
+    def test_journaled(self, data_handler):
+        data_handler.interpolate()
+        reloaded = DataHandler(data_handler.input_file)
+        assert all([
+            reloaded._data_as_text() == data_handler._data_as_text(),
+            interpolated(reloaded[0]) == [34, 36],
+        ])
+
+    def test_saved(self, data_handler):
+        # The meta file does not declare the tag.
+        data_handler.interpolate()
+        data_handler.save(block=True)
+        reloaded = DataHandler(data_handler.input_file)
+        assert all([
+            "interpolated" in data_handler.input_file.read_text().split("\n", 1)[0],
+            reloaded.instances == data_handler.instances,
+            interpolated(reloaded[3]) == list(range(34, 46)) + [47],
+        ])
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from Masa.models.datahandler.interpolation import interpolate
+
+
+@pytest.fixture(name="keyframes")
+def keyframes_of_tracks():
+    """Three tracks: two gaps, one gap of a single frame and no gap."""
+    track_ids = [0, 0, 0, 1, 1, 2]
+    frame_ids = [0, 4, 6, 10, 12, 5]
+    boxes = [[0, 0, 10, 10], [4, 4, 14, 14], [4, 4, 14, 14],
+             [0, 0, 1, 1], [2, 2, 3, 3], [9, 9, 9, 9]]
+    return track_ids, frame_ids, boxes
+
+
+def test_linear(keyframes):
+    track_ids, frame_ids, boxes, sources = interpolate(*keyframes)
+    assert all([
+        track_ids.tolist() == [0, 0, 0, 0, 1],
+        frame_ids.tolist() == [1, 2, 3, 5, 11],
+        boxes.tolist() == [[1, 1, 11, 11], [2, 2, 12, 12], [3, 3, 13, 13],
+                           [4, 4, 14, 14], [1, 1, 2, 2]],
+        sources.tolist() == [0, 0, 0, 1, 3],
+    ])
+
+
+def test_cubic(keyframes):
+    _, frame_ids, boxes, _ = interpolate(*keyframes, method="cubic")
+    linear = interpolate(*keyframes)[2]
+    assert all([
+        frame_ids.tolist() == [1, 2, 3, 5, 11],
+        # Eases into the flat segment, without overshooting it.
+        np.all(np.diff(boxes[:4, 0]) > 0),
+        boxes[3].tolist() == [4, 4, 14, 14],
+        np.allclose(boxes[4], linear[4]),
+    ])
+
+
+def test_no_gap():
+    out = interpolate([0, 0, 1], [3, 4, 3], [[0, 0, 1, 1]] * 3)
+    assert all(len(a) == 0 for a in out)
+
+
+def test_unknown_method(keyframes):
+    with pytest.raises(ValueError):
+        interpolate(*keyframes, method="spline")
@@ -0,0 +1,119 @@
+"""Vectorised CSV parsing of `CsvTable` against Python's own parsing.
+
+Set `MASA_BENCH_ROWS` (e.g. to 1000000) to time the loading of a bigger file,
+`-s` shows the timings.
+"""
+import os
+import random
+import time
+
+import numpy as np
+import pytest
+
+from Masa.models import DataHandler, ColumnarDataHandler
+from Masa.models.datahandler.loader import CsvTable
+
+
+N_ROWS = int(os.environ.get("MASA_BENCH_ROWS", 20000))
+HEADER = "track_id,frame_id,x1,y1,x2,y2,scene,object_class,view,interpolated"
+
+
+def test_decimals():
+    random.seed(0)
+    written = ["0", "-0", "7", "-12", "+3", "10.5", "-0.25", "1.", ".5",
+               "123456.789012", "0.1", "0.30000000000000004"]
+    written += [repr(random.uniform(-1e4, 1e4)) for _ in range(1000)]
+    written += [str(random.randint(-10 ** 9, 10 ** 9)) for _ in range(1000)]
+    table = CsvTable("\n".join(["x1", *written]).encode())
+    values, is_int = table.numbers("x1")
+    assert all([
+        values.tolist() == [float(w) for w in written],
+        is_int.tolist() == ["." not in w for w in written],
+    ])
+
+
+def test_fallbacks():
+    # Exponent, spaces and quotes are not handled by the fast path.
+    table = CsvTable(b'x1,object_class\n1e3,"car"\n 2 ,"big, car"\n')
+    values, is_int = table.numbers("x1")
+    assert all([
+        values.tolist() == [1000.0, 2.0],
+        is_int.tolist() == [False, True],
+        table.text("object_class").tolist() == ["car", "big, car"],
+    ])
+
+
+def test_blank_lines_and_crlf():
+    table = CsvTable(b"\r\nx1,y1\r\n1,2\r\n\r\n3,4")
+    assert all([
+        len(table) == 2,
+        table.numbers("y1")[0].tolist() == [2, 4],
+    ])
+
+
+def test_codes():
+    table = CsvTable(b"view\nsmall\nlarge\nsmall\n")
+    codes = table.codes("view", ["large", "small"], "bad {}")
+    with pytest.raises(ValueError, match="bad small"):
+        table.codes("view", ["large"], "bad {}")
+    assert codes.tolist() == [1, 0, 1]
+
+
+def test_swapped_header(data_handler):
+    f_csv = data_handler.input_file
+    head, body = f_csv.read_text().split("\n", 1)
+    swapped = head.replace("track_id,frame_id", "frame_id,track_id")
+    f_csv.write_text(swapped + "\n" + body)
+    dh = DataHandler(f_csv)
+    assert all([
+        dh.instances == data_handler.instances,
+        f_csv.read_text().startswith(swapped),
+    ])
+
+
+def test_invalid_class(data_handler):
+    f_csv = data_handler.input_file
+    f_csv.write_text(f_csv.read_text().replace("red_traffic_light", "blue_traffic_light"))
+    with pytest.raises(ValueError, match="blue_traffic_light"):
+        DataHandler(f_csv)
+
+
+def test_without_interpolated(data_handler):
+    f_csv = data_handler.input_file
+    text = f_csv.read_text()
+    # Written before the tag was always saved.
+    f_csv.write_text(text.replace(",interpolated\n", "\n").replace(",false\n", "\n"))
+    dh = DataHandler(f_csv)
+    assert all([
+        dh.instances == data_handler.instances,
+        dh._data_as_text() == text,
+    ])
+
+
+@pytest.fixture(name="big_file")
+def big_annotations_file(data_handler):
+    rng = np.random.default_rng(0)
+    views = ["small", "middle", "large", "far"]
+    interpolated = ["false", "true"]
+    rows = [HEADER]
+    for i in range(N_ROWS):
+        y2 = f"{rng.uniform(0, 480):.1f}" if i % 3 else str(int(rng.integers(480)))
+        rows.append(f"{i // 50},{i % 5000},{i % 640},10,{i % 640 + 20},{y2},"
+                    f"road_scene,red_traffic_light,{views[i % 4]},{interpolated[i % 2]}")
+    data_handler.input_file.write_text("\n".join(rows))
+    return data_handler.input_file
+
+
+def test_big_file(big_file):
+    timings = {}
+    for dh_cls in [DataHandler, ColumnarDataHandler]:
+        start = time.perf_counter()
+        dh = dh_cls(big_file)
+        timings[dh_cls.__name__] = time.perf_counter() - start
+    print(f"\n{N_ROWS} rows loaded in: "
+          + ", ".join(f"{name} {t:.2f}s" for name, t in timings.items()))
+
+    assert all([
+        len(dh.instances) == N_ROWS,
+        dh._data_as_text() == big_file.read_text() + "\n",
+    ])
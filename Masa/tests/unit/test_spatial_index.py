@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from Masa.core.utils import GridIndex
+from Masa.core.utils.spatial_index import iou
+
+
+@pytest.fixture(name="grid")
+def grid_index():
+    boxes = np.array([
+        [0, 0, 10, 10],
+        [5, 5, 50, 50],
+        [100, 100, 120, 140],
+    ])
+    return GridIndex.from_boxes(boxes, cell_size=16)
+
+
+def test_query_point(grid):
+    assert all([
+        sorted(grid.query_point(7, 7)) == [0, 1],
+        grid.query_point(40, 40) == [1],
+        grid.query_point(110, 139) == [2],
+        grid.query_point(80, 80) == [],
+    ])
+
+
+def test_query_rect(grid):
+    assert all([
+        sorted(grid.query_rect(45, 45, 105, 105)) == [1, 2],
+        grid.query_rect(60, 0, 90, 30) == [],
+    ])
+
+
+def test_insert_remove(grid):
+    grid.remove(1)
+    grid.insert("new", 30, 30, 35, 35)
+    assert all([
+        grid.query_point(7, 7) == [0],
+        grid.query_point(32, 32) == ["new"],
+        len(grid) == 3,
+        1 not in grid,
+    ])
+
+
+def test_remove_unknown(grid):
+    with pytest.raises(ValueError):
+        grid.remove("unknown")
+
+
+def test_query_iou(grid):
+    assert all([
+        grid.query_iou(0, 0, 10, 10, 0.5) == [(0, 1.0)],
+        sorted(key for key, _ in grid.query_iou(0, 0, 10, 10, 0.0)) == [0, 1],
+        grid.query_iou(100, 100, 120, 120, 0.5) == [(2, 0.5)],
+        grid.query_iou(60, 0, 90, 30, 0.0) == [],
+    ])
+
+
+def test_overlaps(grid):
+    grid.insert("copy", 101, 100, 120, 140)
+    assert all([
+        grid.overlaps(0.9) == [(2, "copy", 0.95)],
+        [pair[:2] for pair in grid.overlaps(0.01)] == [(0, 1), (2, "copy")],
+    ])
+
+
+def test_iou():
+    assert all([
+        iou((0, 0, 10, 10), (0, 0, 10, 10)) == 1.0,
+        iou((0, 0, 10, 10), (5, 0, 15, 10)) == 1 / 3,
+        iou((0, 0, 10, 10), (10, 0, 20, 10)) == 0.0,
+    ])
+
+
+def test_query_large_rect(grid):
+    assert sorted(grid.query_rect(-1e9, -1e9, 1e9, 1e9)) == [0, 1, 2]
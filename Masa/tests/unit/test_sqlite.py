@@ -0,0 +1,234 @@
+"""`SQLiteDataHandler` must behave like `DataHandler` and commit every change."""
+from copy import deepcopy
+
+import pytest
+
+from Masa.core.utils import SignalPacket, DataUpdateInfo
+from Masa.models import DataHandler, SQLiteDataHandler
+from Masa.models.datahandler import datahandler
+from Masa.tests.unit.conftest import same
+
+
+BACKENDS = [SQLiteDataHandler]
+
+
+def slot_edits(dh, s_tobj_l):
+    """Edit through the slot, as the GUI does."""
+    instance = deepcopy(dh[s_tobj_l.track_id][0])
+    instance.frame_id += 1000
+    instance.x1 += 0.5
+    tobj = deepcopy(s_tobj_l)
+    tobj.change_track_id(0)
+    for dui in [DataUpdateInfo(replaced=instance), DataUpdateInfo(added=tobj),
+                DataUpdateInfo(deleted=(len(dh), None))]:
+        dh.data_update_sl(SignalPacket(sender=["dummy"], data=dui))
+
+
+def test_init(dhs):
+    assert same(dhs)
+
+
+def test_tracked_objs(dhs):
+    dh, sdh = dhs
+    assert all([
+        list(sdh.tracked_objs) == list(dh.tracked_objs),
+        all(sdh[t_id][:] == dh[t_id][:] for t_id in dh.tracked_objs),
+    ])
+
+
+def test_add_instance(dhs, s_tobj_l):
+    instance = deepcopy(s_tobj_l[0])
+    instance.frame_id = 1000
+    for dh in dhs:
+        dh.add(deepcopy(instance))
+    assert same(dhs)
+
+
+def test_delete(dhs, s_tobj_l):
+    for dh in dhs:
+        dh.delete(s_tobj_l.track_id, 0)
+        dh.delete(0)
+    assert same(dhs)
+
+
+def test_move(dhs):
+    instance = deepcopy(dhs[0][0][0])
+    instance.track_id = 1
+    for dh in dhs:
+        dh.move((0, 0), deepcopy(instance))
+    assert same(dhs)
+
+
+def test_undo_redo(dhs, s_tobj_l):
+    text = dhs[0]._data_as_text()
+    undone = []
+    for dh in dhs:
+        tobj = deepcopy(s_tobj_l)
+        tobj.change_track_id(len(dh))
+        dh.add(tobj)
+        dh.delete(len(dh) - 1, 0)
+        dh.delete(0)
+        dh.replace({"track_id": 0, "instance_id": 0, "x1": 3})
+        while dh.undo():
+            pass
+        undone.append(dh._data_as_text())
+        for _ in range(3):
+            dh.redo()
+    assert all([undone == [text, text], same(dhs)])
+
+
+def test_slot_edits(dhs, s_tobj_l):
+    for dh in dhs:
+        slot_edits(dh, s_tobj_l)
+    assert same(dhs)
+
+
+def test_failed_change_rolled_back(dhs):
+    dh, sdh = dhs
+    instance = deepcopy(dh[0][0])
+    instance.tags["view"] = "sideways"
+    position = sdh.store.position
+    with pytest.raises(ValueError, match="sideways"):
+        sdh.data_update_sl(SignalPacket(sender=["dummy"],
+                                        data=DataUpdateInfo(replaced=instance)))
+    assert all([same(dhs), sdh.store.position == position])
+
+
+def test_unknown_tag_rejected(dhs):
+    instance = deepcopy(dhs[0][0][0])
+    instance.frame_id = 1000
+    instance.tags["weather"] = "rain"
+    for dh in dhs:
+        with pytest.raises(ValueError, match="weather"):
+            dh.add(deepcopy(instance))
+    assert same(dhs)
+
+
+def test_failed_batch_rolled_back(dhs):
+    dh, sdh = dhs
+    instance = deepcopy(dh[0][0])
+    instance.tags["view"] = "sideways"
+    with pytest.raises(ValueError, match="sideways"):
+        with sdh.batch():
+            sdh.delete(1)
+            sdh.replace(instance)
+    assert all([same(dhs), len(sdh.history) == 0])
+
+
+def test_queries(dhs):
+    dh, sdh = dhs
+    object_class = dh[0].object_class
+    view = dh[0][0].tags["view"]
+    assert all([
+        sdh.store.by_class(object_class)
+        == [ins for ins in dh.instances if ins.object_class == object_class],
+        sdh.store.by_tag("view", view)
+        == [ins for ins in dh.instances if ins.tags["view"] == view],
+        sdh.store.by_track(1) == dh[1][:],
+    ])
+
+
+def test_rows_not_renumbered(data_handler):
+    sdh = SQLiteDataHandler(data_handler.input_file)
+    n_rows, n_tracks = len(sdh[0]), len(sdh)
+    changes = sdh.store.conn.total_changes
+    sdh.delete(0)
+    n_deleted = sdh.store.conn.total_changes - changes
+    sdh.undo()
+    assert all([
+        # The rows and the track, the `track_id` of the next tracks and `position`.
+        n_deleted == n_rows + 1 + (n_tracks - 1) + 1,
+        sdh.instances == data_handler.instances,
+    ])
+
+
+def test_committed(data_handler, s_tobj_l):
+    sdh = SQLiteDataHandler(data_handler.input_file)
+    text = data_handler.input_file.read_text()
+    slot_edits(sdh, s_tobj_l)
+    # As if the application crashed.
+    recovered = SQLiteDataHandler(data_handler.input_file)
+    assert all([
+        data_handler.input_file.read_text() == text,
+        len(recovered.journal) == 3,
+        recovered.instances == sdh.instances,
+    ])
+
+
+def test_not_encoded(monkeypatch, data_handler, s_tobj_l):
+    encoded = []
+    monkeypatch.setattr(datahandler, "encode_change",
+                        lambda dui: encoded.append(dui) or "{}")
+    sdh = SQLiteDataHandler(data_handler.input_file)
+    slot_edits(sdh, s_tobj_l)
+    n_encoded = len(encoded)
+    slot_edits(data_handler, s_tobj_l)
+    assert all([
+        # Committed by the store, nothing to journal.
+        n_encoded == 0,
+        len(sdh.journal) == 3,
+        len(encoded) == 3,
+    ])
+
+
+def test_save(data_handler, s_tobj_l):
+    sdh = SQLiteDataHandler(data_handler.input_file)
+    slot_edits(sdh, s_tobj_l)
+    sdh.close()
+    slot_edits(data_handler, s_tobj_l)
+
+    reopened = SQLiteDataHandler(data_handler.input_file)
+    assert all([
+        DataHandler(data_handler.input_file).instances == data_handler.instances,
+        reopened.instances == data_handler.instances,
+        len(reopened.journal) == 0,
+    ])
+
+
+def test_rebuilt_on_outside_change(data_handler):
+    SQLiteDataHandler(data_handler.input_file).delete(0)
+    # Written by something else than Masa.
+    f_csv = data_handler.input_file
+    f_csv.write_text(f_csv.read_text() + "\n")
+    assert SQLiteDataHandler(f_csv).instances == data_handler.instances
+
+
+def test_interpolate(dhs):
+    uids = [[dh.track_uid(t_id) for t_id in range(len(dh))] for dh in dhs]
+    counts = [dh.interpolate() for dh in dhs]
+    assert all([counts[0] == counts[1], same(dhs),
+                [[dh.track_uid(t_id) for t_id in range(len(dh))] for dh in dhs] == uids])
+
+
+def track_uid_moves(dh, s_tobj_l):
+    """`track_id_of` a track, once another is inserted before it and once it
+    is deleted, and whether the `track_uid` of a deleted track is given again."""
+    tobj = deepcopy(s_tobj_l)
+    tobj.change_track_id(0)
+    uid, last = dh.track_uid(s_tobj_l.track_id), dh.track_uid(len(dh) - 1)
+    dh.add(deepcopy(tobj))
+    moved = dh.track_id_of(uid)
+    dh.delete(moved)
+    dh.delete(len(dh) - 1)
+    tobj.change_track_id(len(dh))
+    dh.add(tobj)
+    uids = [dh.track_uid(t_id) for t_id in range(len(dh))]
+    return moved, dh.track_id_of(uid), uid in uids or last in uids
+
+
+def test_track_uid(dhs, s_tobj_l):
+    moves = [track_uid_moves(dh, s_tobj_l) for dh in dhs]
+    assert all([moves[0] == moves[1], moves[0] == (s_tobj_l.track_id + 1, None, False)])
+
+
+def test_undo_track_uid(dhs):
+    uids = [[dh.track_uid(t_id) for t_id in range(len(dh))] for dh in dhs]
+    for dh in dhs:
+        dh.delete(1)
+        # Emptied instance by instance.
+        with dh.batch():
+            for _ in range(len(dh[0])):
+                dh.delete(0, 0)
+        dh.undo()
+        dh.undo()
+    assert [[dh.track_uid(t_id) for t_id in range(len(dh))] for dh in dhs] == uids
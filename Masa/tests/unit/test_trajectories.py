@@ -0,0 +1,68 @@
+from copy import deepcopy
+
+import numpy as np
+import pytest
+
+from Masa.models.trajectories import Trajectories
+
+
+@pytest.fixture(name="traj")
+def trajectories(data_handler):
+    traj = Trajectories.from_data_handler(data_handler)
+    data_handler.data_updated.connect(traj.data_update_sl)
+    return traj
+
+
+def same_as_rebuilt(traj, data_handler):
+    rebuilt = Trajectories.from_data_handler(data_handler)
+    return (len(traj) == len(rebuilt) and
+            all(np.array_equal(traj[i], rebuilt[i]) for i in range(len(traj))))
+
+
+def test_init(traj, data_handler):
+    assert all([
+        len(traj) == len(data_handler),
+        all(len(traj[t]) == len(tobj) for t, tobj in enumerate(data_handler)),
+    ])
+
+
+def test_add_instance(traj, data_handler, s_tobj_l):
+    instance = deepcopy(s_tobj_l[0])
+    instance.x1 += 5
+    data_handler.add(instance)
+    assert same_as_rebuilt(traj, data_handler)
+
+
+def test_delete_tobj(traj, data_handler, s_tobj_l):
+    data_handler.delete(s_tobj_l.track_id)
+    assert same_as_rebuilt(traj, data_handler)
+
+
+def test_replace_instance(traj, data_handler, s_tobj_l):
+    instance = deepcopy(data_handler[s_tobj_l.track_id][0])
+    instance.x2 += 10
+    data_handler.replace(instance)
+    assert same_as_rebuilt(traj, data_handler)
+
+
+def test_batch(traj, data_handler, s_tobj_l):
+    instance = deepcopy(data_handler[1][0])
+    instance.x1 += 5
+    instance.instance_id = len(data_handler[1])
+    replaced = deepcopy(data_handler[s_tobj_l.track_id][0])
+    replaced.x2 += 10
+    with data_handler.batch():
+        data_handler.replace(replaced)
+        data_handler.add(instance)
+        data_handler.delete(1, 0)
+        data_handler.delete(0)
+    assert same_as_rebuilt(traj, data_handler)
+
+
+def test_window(traj, data_handler):
+    frame_id = data_handler.frames[0]
+    paths = traj.window(frame_id, before=0, after=0)
+    assert all([
+        sum(len(path) for _, path in paths) == len(data_handler.from_frame(frame_id)),
+        all(np.all(path[:, 0] == frame_id) for _, path in paths),
+    ])
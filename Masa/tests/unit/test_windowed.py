@@ -0,0 +1,121 @@
+"""`WindowedDataHandler` must answer like `DataHandler`, from a few pages."""
+from copy import deepcopy
+
+import pytest
+
+from Masa.core.utils import SignalPacket, DataUpdateInfo
+from Masa.models import WindowedDataHandler
+from Masa.models.annotation_density import AnnotationDensity
+from Masa.models.trajectories import Trajectories
+from Masa.tests.unit.conftest import same
+
+
+def windowed(input_file) -> WindowedDataHandler:
+    """A few pages of 8 tracks, enough to move out of them."""
+    return WindowedDataHandler(input_file, before=8, after=8, page_size=8)
+
+
+BACKENDS = [windowed]
+
+
+def move_to(dh, index):
+    dh.propogate_curr_frame_data_sl(SignalPacket(sender=["dummy"], data=(None, index)))
+
+
+def test_init(dhs):
+    assert all([same(dhs), dhs[1].page_loads > 0])
+
+
+def test_window(dhs):
+    _, wdh = dhs
+    move_to(wdh, 20)
+    loaded = wdh.loaded_pages
+    move_to(wdh, 22)
+    page_loads = wdh.page_loads
+    move_to(wdh, 40)
+    assert all([
+        loaded == [1, 2, 3],
+        page_loads == 3,
+        wdh.loaded_pages == [4, 5, 6],
+    ])
+
+
+def test_bounded(dhs):
+    dh, wdh = dhs
+    move_to(wdh, 20)
+    for frame_id in dh.frames:
+        wdh.from_frame(frame_id)
+    assert all([
+        len(wdh.loaded_pages) <= wdh.max_pages,
+        set(wdh.window) <= set(wdh.loaded_pages),
+    ])
+
+
+def test_track_summaries(dhs):
+    dh, wdh = dhs
+    assert wdh.track_summaries == [
+        (tobj.object_class, len(tobj), min(ins.frame_id for ins in tobj),
+         max(ins.frame_id for ins in tobj)) for tobj in dh
+    ]
+
+
+def test_iter_tracks(dhs):
+    dh, wdh = dhs
+    page_loads = wdh.page_loads
+    trajectories = Trajectories.from_data_handler(wdh)
+    density = AnnotationDensity.from_data_handler(wdh, 10)
+    assert all([
+        list(wdh.iter_tracks()) == list(dh.iter_tracks()),
+        len(trajectories) == len(dh),
+        density.histogram()[1].sum() == len(dh.instances),
+        wdh.page_loads == page_loads,
+    ])
+
+
+def test_edits(dhs, s_tobj_l):
+    instance = deepcopy(dhs[0][s_tobj_l.track_id][0])
+    instance.frame_id += 1
+    instance.x1 += 0.5
+    for dh in dhs:
+        move_to(dh, instance.frame_id)
+        dh.from_frame(instance.frame_id)
+        for dui in [DataUpdateInfo(replaced=deepcopy(instance)),
+                    DataUpdateInfo(deleted=(0, None)),
+                    DataUpdateInfo(deleted=(0, 0))]:
+            dh.data_update_sl(SignalPacket(sender=["dummy"], data=dui))
+    assert all([same(dhs), dhs[1].track_summaries == dhs[1].store.track_summaries()])
+
+
+def test_replace_keeps_pages(dhs, s_tobj_l):
+    dh, wdh = dhs
+    instance = deepcopy(dh[s_tobj_l.track_id][0])
+    instance.frame_id += 1
+    move_to(wdh, instance.frame_id)
+    page_loads = wdh.page_loads
+    for handler in dhs:
+        handler.replace(deepcopy(instance))
+    assert all([wdh.page_loads == page_loads, same(dhs)])
+
+
+def test_edits_keep_pages(dhs, s_tobj_l):
+    dh, wdh = dhs
+    frame_id = dh[s_tobj_l.track_id][0].frame_id
+    move_to(wdh, frame_id)
+    page_loads = wdh.page_loads
+    window = [f for page in wdh.window
+              for f in range(page * wdh.page_size, (page + 1) * wdh.page_size)]
+    for handler in dhs:
+        instance = deepcopy(handler[1][0])
+        instance.instance_id = 0
+        handler.add(instance)
+        handler.delete(s_tobj_l.track_id, 0)
+        handler.delete(0)
+        tobj = deepcopy(s_tobj_l)
+        tobj.change_track_id(1)
+        handler.add(tobj)
+        handler.undo()
+    assert all([
+        all(dh.from_frame(f) == wdh.from_frame(f) for f in window),
+        wdh.page_loads == page_loads,
+        same(dhs),
+    ])
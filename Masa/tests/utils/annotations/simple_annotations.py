@@ -36,7 +36,7 @@ class SimpleAnnotationsF:
 
         This mocks the header of a CSV file.
         """
-        return "track_id frame_id x1 y1 x2 y2 scene object view".split()
+        return "track_id frame_id x1 y1 x2 y2 scene object view interpolated".split()
 
     @staticmethod
     def data(increase_track_id=None) -> List[List[Union[int, str]]]:
@@ -46,23 +46,23 @@ class SimpleAnnotationsF:
         """
         # TODO: Make it better
         retval =  [
-            [0, 35, 10, 10, 20, 20, "road_scene", "red_traffic_light", "small"],
-            [0, 37, 10, 10, 20, 20, "road_scene", "red_traffic_light", "middle"],
-            [0, 33, 10, 10, 20, 20, "road_scene", "red_traffic_light", "large"],
-            [1, 44, 10, 10, 20, 20, "road_scene", "yellow_traffic_light", "far"],
-            [2, 45, 10, 10, 20, 20, "road_scene", "red_traffic_light", "small"],
-            [2, 48, 10, 10, 20, 20, "road_scene", "red_traffic_light", "middle"],
-            [2, 50, 10, 10, 20, 20, "road_scene", "red_traffic_light", "large"],
-            [3, 46, 10, 10, 20, 20, "road_scene", "red_traffic_light", "small"],
-            [3, 33, 10, 10, 20, 20, "road_scene", "red_traffic_light", "middle"],
-            [3, 48, 10, 10, 20, 20, "road_scene", "red_traffic_light", "large"],
-            [4, 55, 10, 10, 20, 20, "road_scene", "red_traffic_light", "far"],
-            [4, 58, 10, 10, 20, 20, "road_scene", "red_traffic_light", "far"],
-            [5, 1, 10, 10, 20, 20, "road_scene", "red_traffic_light", "far"],
-            [6, 44, 10, 10, 20, 20, "road_scene", "yellow_traffic_light", "far"],
-            [7, 44, 10, 10, 20, 20, "road_scene", "yellow_traffic_light", "far"],
-            [7, 44, 10, 10, 20, 20, "road_scene", "yellow_traffic_light", "far"],
-            [8, 44, 10, 10, 20, 20, "road_scene", "green_traffic_light", "far"],
+            [0, 35, 10, 10, 20, 20, "road_scene", "red_traffic_light", "small", "false"],
+            [0, 37, 10, 10, 20, 20, "road_scene", "red_traffic_light", "middle", "false"],
+            [0, 33, 10, 10, 20, 20, "road_scene", "red_traffic_light", "large", "false"],
+            [1, 44, 10, 10, 20, 20, "road_scene", "yellow_traffic_light", "far", "false"],
+            [2, 45, 10, 10, 20, 20, "road_scene", "red_traffic_light", "small", "false"],
+            [2, 48, 10, 10, 20, 20, "road_scene", "red_traffic_light", "middle", "false"],
+            [2, 50, 10, 10, 20, 20, "road_scene", "red_traffic_light", "large", "false"],
+            [3, 46, 10, 10, 20, 20, "road_scene", "red_traffic_light", "small", "false"],
+            [3, 33, 10, 10, 20, 20, "road_scene", "red_traffic_light", "middle", "false"],
+            [3, 48, 10, 10, 20, 20, "road_scene", "red_traffic_light", "large", "false"],
+            [4, 55, 10, 10, 20, 20, "road_scene", "red_traffic_light", "far", "false"],
+            [4, 58, 10, 10, 20, 20, "road_scene", "red_traffic_light", "far", "false"],
+            [5, 1, 10, 10, 20, 20, "road_scene", "red_traffic_light", "far", "false"],
+            [6, 44, 10, 10, 20, 20, "road_scene", "yellow_traffic_light", "far", "false"],
+            [7, 44, 10, 10, 20, 20, "road_scene", "yellow_traffic_light", "far", "false"],
+            [7, 44, 10, 10, 20, 20, "road_scene", "yellow_traffic_light", "far", "false"],
+            [8, 44, 10, 10, 20, 20, "road_scene", "green_traffic_light", "far", "false"],
             ]
 
         if increase_track_id is not None:
@@ -128,27 +128,42 @@ class SimpleAnnotations(DummyAnnotations):
 
     @property
     def data_str(self):
+        # `DataHandler` reads the object class from `object_class`.
+        head = ["object_class" if h == "object" else h for h in self.head]
         data_str = ""
-        data_str += f"{','.join(self.head)}\n"
+        data_str += f"{','.join(head)}\n"
         for data in self.data:
             data = [str(d) for d in data]
             data_str += f"{','.join(data)}\n"
 
         return data_str
 
+    @property
+    def meta_str(self):
+        """The meta file of the data, as read by `DataHandler`."""
+        h = self.head
+        object_classes = sorted({d[h.index("object")] for d in self.data})
+        views = sorted({d[h.index("view")] for d in self.data})
+        return (f'scene = "{self.data[0][h.index("scene")]}"\n'
+                f"object_classes = {object_classes}\n"
+                f"view = {views}\n")
+
     def create_file(self, empty_annotations_dir: Path,
                     file_name: str = "annotations.csv") -> Path:
         """Write data into the empty annotations directory.
 
         If the provided `file_name` in `empty_annotations_dir` is already
         created, it will be overwritten. This is to mock a file (mainly CSV)
-        written on the disk.
+        written on the disk. Its meta file is written along with it.
         """
         data_file = empty_annotations_dir / file_name
         if data_file.exists(): data_file.unlink()
 
         with data_file.open("w") as f:
             f.write(self.data_str)
+        meta_file = empty_annotations_dir / f".meta_{data_file.stem}.toml"
+        with meta_file.open("w") as f:
+            f.write(self.meta_str)
 
         return data_file
 
@@ -1,4 +1,4 @@
-from .image_button import ImageButton
+from Masa.gui.widgets.image_button import ImageButton
 
 class GUIFactory:
     @staticmethod
@@ -5,10 +5,22 @@ from pathlib import Path
 from PySide2 import QtWidgets as qtw
 from Masa.gui.widgets.video_player import VideoPlayer
 from Masa.apps.default import ImageExtractorApp
+from Masa.models import (DataHandler, ColumnarDataHandler, SQLiteDataHandler,
+                         WindowedDataHandler)
 
 
+DATA_HANDLERS = {
+    "objects": DataHandler,
+    "columnar": ColumnarDataHandler,
+    "sqlite": SQLiteDataHandler,
+    # Only the frames around the buffer are kept in memory.
+    "windowed": WindowedDataHandler,
+}
+
 parser = argparse.ArgumentParser()
 parser.add_argument("dataid")
+parser.add_argument("--data-handler", choices=DATA_HANDLERS, default="objects",
+                    help="How the annotations are kept, `windowed` for the large ones.")
 args = vars(parser.parse_args())
 
 if __name__ == "__main__":
@@ -17,7 +29,7 @@ if __name__ == "__main__":
         raise ValueError(f"Cannot found {path}.")
 
     app = qtw.QApplication(sys.argv)
-    iea = ImageExtractorApp(path)
+    iea = ImageExtractorApp(path, data_handler_cls=DATA_HANDLERS[args["data_handler"]])
     iea.show()
 
     sys.exit(app.exec_())